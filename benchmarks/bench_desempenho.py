@@ -0,0 +1,221 @@
+# benchmarks/bench_desempenho.py
+# Benchmarks de importação, consultas, analytics e exportação com dados sintéticos (benchmarks/sintetico.py).
+# Rodar da raiz do projeto:
+#   python -m benchmarks.bench_desempenho --saida resultados.json
+#   python -m benchmarks.bench_desempenho --linhas 10000 100000 1000000 --arquivos-dicom 2000 --saida antes.json
+#   python -m benchmarks.bench_desempenho --comparar antes.json depois.json
+# Os bancos sintéticos ficam em --dados e são reaproveitados entre execuções (mesma semente, mesmo conteúdo).
+import argparse
+import datetime
+import json
+import os
+import platform
+import shutil
+import statistics
+import subprocess
+import sys
+import tempfile
+import time
+from config import state
+from core import analytics
+from core import database as db
+from benchmarks import sintetico
+
+# Cenários de filtro, na ordem de db.CAMPOS_FILTRO (chaves ausentes ficam vazias)
+CENARIOS = {
+    "sem_filtro": {},
+    "mes": {"data_inicio": "2024-05-01", "data_fim": "2024-05-31"},
+    "ano_medico": {"data_inicio": "2024-01-01", "data_fim": "2024-12-31", "medico": sintetico.MEDICOS[0]},
+    "medicos_sala": {"medico": ";".join(sintetico.MEDICOS[:3]), "sala": sintetico.SALAS[0]},
+}
+
+FUNCOES_ANALYTICS = [
+    "calcular_agregados", "calcular_evolucao_temporal", "calcular_media_medico",
+    "calcular_media_tempo_medico", "calcular_media_exame", "calcular_media_tempo_exame",
+]
+
+def _filtros(cenario):
+    valores = CENARIOS[cenario]
+    return [valores.get(campo, "") for campo in db.CAMPOS_FILTRO]
+
+def _esfriar_caches():
+    """Descarta contagens e resultados em cache, como depois de uma escrita: cada repetição mede a consulta de verdade."""
+    db._dados_alterados()
+
+def medir(funcao, repeticoes, preparar=_esfriar_caches):
+    """Roda funcao repeticoes vezes (preparar antes de cada uma) e devolve as estatísticas em segundos."""
+    tempos = []
+    for _ in range(repeticoes):
+        if preparar: preparar()
+        inicio = time.perf_counter()
+        funcao()
+        tempos.append(time.perf_counter() - inicio)
+    return {"mediana": statistics.median(tempos), "min": min(tempos), "max": max(tempos), "repeticoes": repeticoes}
+
+def _medir_paginacao(filtros, repeticoes, paginas=20):
+    resultados = {}
+    resultados["primeira_pagina"] = medir(lambda: db.carregar_dados_banco(*filtros, limit=state.bloco_tabela, offset=0), repeticoes)
+
+    total = db.carregar_dados_banco(*filtros, limit=1, offset=0)[1]
+    offset_fundo = max(0, total - state.bloco_tabela)
+    resultados["ultima_pagina_offset"] = medir(lambda: db.carregar_dados_banco(*filtros, limit=state.bloco_tabela, offset=offset_fundo), repeticoes)
+
+    def folhear_cursor():
+        cursor_pagina = None
+        for _ in range(paginas):
+            dados, _ = db.carregar_pagina_cursor(*filtros, limit=state.bloco_tabela, cursor_pagina=cursor_pagina)
+            if not dados: break
+            cursor_pagina = (dados[-1][1], dados[-1][0])
+    resultados[f"cursor_{paginas}_paginas"] = medir(folhear_cursor, repeticoes)
+    resultados["total_registros"] = total
+    return resultados
+
+def _medir_exportacoes(filtros, repeticoes, diretorio, pular):
+    from reports.csv_export import exportar_csv_arquivo
+    resultados = {}
+    inputs_filtros = dict(zip(["min_d", "max_d", "med", "exm", "min_t", "max_t", "min_dap", "max_dap", "sala", "sexo", "id_pac"], filtros[2:]))
+
+    caminho_csv = os.path.join(diretorio, "bench.csv")
+    def csv_filtrado():
+        # Mesmo caminho do botão de exportar: cursor em blocos gravado em arquivo
+        state.data_inicio, state.data_final = filtros[0], filtros[1]
+        exportar_csv_arquivo(caminho_csv, apenas_filtrados=True, inputs_filtros=inputs_filtros)
+    resultados["exportar_csv_arquivo"] = medir(csv_filtrado, repeticoes)
+
+    if "pdf" not in pular:
+        from reports.pdf_export import gerar_relatorio_pdf
+        caminho = os.path.join(diretorio, "bench.pdf")
+        resultados["gerar_relatorio_pdf"] = medir(lambda: gerar_relatorio_pdf(caminho, filtros), repeticoes)
+        # Segunda chamada sem esfriar: agregados e gráficos vêm do cache
+        resultados["gerar_relatorio_pdf_cache"] = medir(lambda: gerar_relatorio_pdf(caminho, filtros), repeticoes, preparar=None)
+    return resultados
+
+def bench_banco(linhas, args):
+    caminho = os.path.join(args.dados, f"exames_{linhas}_{args.semente}.db")
+    inicio = time.perf_counter()
+    sintetico.gerar_banco(caminho, linhas, semente=args.semente)
+    resultado = {"linhas": linhas, "geracao_s": time.perf_counter() - inicio, "cenarios": {}}
+    print(f"[{linhas} linhas] banco pronto em {resultado['geracao_s']:.1f}s")
+
+    for cenario in args.cenarios:
+        filtros = _filtros(cenario)
+        medidas = {"paginacao": _medir_paginacao(filtros, args.repeticoes)}
+        medidas["analytics"] = {
+            nome: medir(lambda funcao=getattr(analytics, nome): funcao(*filtros), args.repeticoes)
+            for nome in FUNCOES_ANALYTICS
+        }
+        if analytics.filtros_na_janela(filtros):
+            medidas["analytics"]["calcular_base_janela"] = medir(lambda: analytics.calcular_base_janela(filtros[0], filtros[1]), args.repeticoes)
+        if "exportacao" not in args.pular:
+            medidas["exportacao"] = _medir_exportacoes(filtros, args.repeticoes, args.dados, args.pular)
+        resultado["cenarios"][cenario] = medidas
+        print(f"[{linhas} linhas] {cenario}: " + ", ".join(
+            f"{nome} {m['mediana'] * 1000:.1f}ms" for nome, m in medidas["analytics"].items()
+        ))
+
+    db.fechar_conexoes()
+    return resultado
+
+def bench_importacao(args):
+    """processar_diretorio_dicom numa pasta sintética, em banco vazio, com e sem processos auxiliares."""
+    pasta = os.path.join(args.dados, f"rdsr_{args.arquivos_dicom}_{args.eventos}_{args.semente}")
+    if not os.path.isdir(pasta):
+        inicio = time.perf_counter()
+        sintetico.gerar_pasta_rdsr(pasta, args.arquivos_dicom, semente=args.semente, eventos=args.eventos, fracao_outros=0.1)
+        print(f"[importação] {args.arquivos_dicom} arquivos gerados em {time.perf_counter() - inicio:.1f}s")
+
+    from core import dicom_parser
+    resultados = {"arquivos": args.arquivos_dicom, "eventos_por_exame": args.eventos}
+    for workers in sorted({1, state.workers_importacao}):
+        tempos = []
+        for _ in range(args.repeticoes_importacao):
+            caminho = os.path.join(args.dados, "importacao.db")
+            for sufixo in ("", "-wal", "-shm"):
+                if os.path.exists(caminho + sufixo): os.remove(caminho + sufixo)
+            db.abrir_banco(caminho)
+            db.preparar_banco()
+            inicio = time.perf_counter()
+            sucessos, erros = dicom_parser.processar_diretorio_dicom(pasta, workers=workers)
+            tempos.append(time.perf_counter() - inicio)
+            db.fechar_conexoes()
+        mediana = statistics.median(tempos)
+        resultados[f"workers_{workers}"] = {
+            "mediana": mediana, "min": min(tempos), "max": max(tempos), "repeticoes": len(tempos),
+            "sucessos": sucessos, "erros": erros, "arquivos_por_segundo": args.arquivos_dicom / mediana,
+        }
+        print(f"[importação] workers={workers}: {mediana:.2f}s ({args.arquivos_dicom / mediana:.0f} arquivos/s)")
+    return resultados
+
+def _versao_codigo():
+    try:
+        return subprocess.run(["git", "rev-parse", "--short", "HEAD"], capture_output=True, text=True,
+                              cwd=os.path.dirname(os.path.dirname(os.path.abspath(__file__)))).stdout.strip() or None
+    except OSError:
+        return None
+
+def comparar(arquivo_antes, arquivo_depois):
+    """Imprime a razão depois/antes das medianas com o mesmo caminho nos dois JSON."""
+    def folhas(no, prefixo=""):
+        if isinstance(no, dict):
+            if "mediana" in no:
+                yield prefixo, no["mediana"]
+                return
+            for chave, valor in no.items():
+                yield from folhas(valor, f"{prefixo}/{chave}" if prefixo else str(chave))
+        elif isinstance(no, list):
+            for item in no:
+                yield from folhas(item, f"{prefixo}/{item.get('linhas', '?')}" if isinstance(item, dict) else prefixo)
+
+    with open(arquivo_antes, encoding="utf-8") as f: antes = dict(folhas(json.load(f)))
+    with open(arquivo_depois, encoding="utf-8") as f: depois = dict(folhas(json.load(f)))
+    for caminho in sorted(antes.keys() & depois.keys()):
+        razao = depois[caminho] / antes[caminho] if antes[caminho] else float("inf")
+        marca = "  <- mais lento" if razao > 1.2 else ""
+        print(f"{caminho:<90} {antes[caminho] * 1000:10.1f}ms {depois[caminho] * 1000:10.1f}ms  x{razao:5.2f}{marca}")
+
+def _argumentos():
+    parser = argparse.ArgumentParser(description="Benchmarks do OpenZoe com dados sintéticos.")
+    parser.add_argument("--linhas", type=int, nargs="+", default=[10_000, 100_000, 1_000_000], help="tamanhos do banco sintético")
+    parser.add_argument("--cenarios", nargs="+", choices=list(CENARIOS), default=list(CENARIOS))
+    parser.add_argument("--repeticoes", type=int, default=3)
+    parser.add_argument("--arquivos-dicom", type=int, default=1000, help="arquivos da pasta sintética (0 = não mede a importação)")
+    parser.add_argument("--eventos", type=int, default=5, help="eventos de irradiação por RDSR sintético")
+    parser.add_argument("--repeticoes-importacao", type=int, default=1)
+    parser.add_argument("--pular", nargs="*", choices=["exportacao", "pdf"], default=[], help="partes lentas a não medir")
+    parser.add_argument("--semente", type=int, default=sintetico.SEMENTE)
+    parser.add_argument("--dados", default=os.path.join(tempfile.gettempdir(), "openzoe_bench"), help="pasta dos bancos e arquivos sintéticos")
+    parser.add_argument("--limpar", action="store_true", help="apaga --dados antes de começar")
+    parser.add_argument("--saida", help="grava os resultados em JSON")
+    parser.add_argument("--comparar", nargs=2, metavar=("ANTES", "DEPOIS"), help="compara dois JSON gerados com --saida")
+    return parser.parse_args()
+
+def main():
+    args = _argumentos()
+    if args.comparar:
+        comparar(*args.comparar)
+        return 0
+
+    if args.limpar and os.path.isdir(args.dados):
+        shutil.rmtree(args.dados)
+    os.makedirs(args.dados, exist_ok=True)
+
+    resultado = {
+        "data": datetime.datetime.now().isoformat(timespec="seconds"),
+        "codigo": _versao_codigo(),
+        "python": sys.version.split()[0],
+        "plataforma": platform.platform(),
+        "cpus": os.cpu_count(),
+        "semente": args.semente,
+        "bancos": [bench_banco(linhas, args) for linhas in args.linhas],
+    }
+    if args.arquivos_dicom:
+        resultado["importacao"] = bench_importacao(args)
+
+    if args.saida:
+        with open(args.saida, "w", encoding="utf-8") as f:
+            json.dump(resultado, f, ensure_ascii=False, indent=2)
+        print(f"Resultados gravados em {args.saida}")
+    return 0
+
+if __name__ == "__main__":
+    raise SystemExit(main())
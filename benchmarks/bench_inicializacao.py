@@ -0,0 +1,118 @@
+# benchmarks/bench_inicializacao.py
+# Tempo de partida do OpenZoe: custo dos imports de main.py e, com --app, tempo até a primeira tela.
+#   python benchmarks/bench_inicializacao.py
+#   python benchmarks/bench_inicializacao.py --repeticoes 10 --limite-ms 600 --saida inicio.json
+#   python benchmarks/bench_inicializacao.py --app
+# Cada medição roda num processo novo (cache de import frio dentro do interpretador).
+# Sai com código 1 se a mediana passar de --limite-ms ou se um módulo pesado for importado na partida.
+import argparse
+import json
+import os
+import statistics
+import subprocess
+import sys
+import time
+
+RAIZ = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+# Só devem ser carregados no primeiro uso (importação DICOM, exportação PNG/PDF, dashboard, séries do gráfico)
+MODULOS_TARDIOS = ["flet_charts", "matplotlib", "pydicom", "fpdf", "numpy"]
+# Mostrados no relatório, carregados ou não
+MODULOS_OBSERVADOS = ["flet", "sqlite3", *MODULOS_TARDIOS]
+
+def medir_imports(modulo="main"):
+    """
+    Roda `python -X importtime -c "import <modulo>"` e devolve
+    (total_ms, {módulo: ms acumulado}). Cada módulo aparece uma vez só, na primeira
+    importação, e o acumulado de um pacote já inclui os submódulos.
+    """
+    resultado = subprocess.run(
+        [sys.executable, "-X", "importtime", "-c", f"import {modulo}"],
+        cwd=RAIZ, capture_output=True, text=True
+    )
+    if resultado.returncode != 0:
+        raise RuntimeError(f"import {modulo} falhou:\n{resultado.stderr[-2000:]}")
+
+    custos, total = {}, 0.0
+    for linha in resultado.stderr.splitlines():
+        if not linha.startswith("import time:") or "|" not in linha: continue
+        partes = linha[len("import time:"):].split("|")
+        try:
+            acumulado = int(partes[1]) / 1000
+        except ValueError:
+            continue  # cabeçalho
+        nome = partes[2].strip()
+        custos[nome] = acumulado
+        if nome == modulo:
+            total = acumulado
+    return total, custos
+
+def medir_primeira_tela(timeout=60):
+    """
+    Abre o app com OPENZOE_TEMPO_INICIO e espera main.py imprimir OPENZOE_PRIMEIRA_TELA_MS.
+    Precisa de ambiente gráfico; devolve None se a janela não abrir dentro do timeout.
+    """
+    ambiente = dict(os.environ, OPENZOE_TEMPO_INICIO=repr(time.time()))
+    processo = subprocess.Popen([sys.executable, "main.py"], cwd=RAIZ, env=ambiente,
+                                stdout=subprocess.PIPE, stderr=subprocess.DEVNULL, text=True)
+    limite = time.time() + timeout
+    try:
+        for linha in processo.stdout:
+            if linha.startswith("OPENZOE_PRIMEIRA_TELA_MS="):
+                return float(linha.split("=", 1)[1])
+            if time.time() > limite: break
+        return None
+    finally:
+        processo.kill()
+        processo.wait()
+
+def _argumentos():
+    parser = argparse.ArgumentParser(description="Mede o tempo de partida do OpenZoe.")
+    parser.add_argument("--repeticoes", type=int, default=5)
+    parser.add_argument("--limite-ms", type=float, default=None, help="falha se a mediana do import de main passar disso")
+    parser.add_argument("--app", action="store_true", help="mede também o tempo até a primeira tela (abre a janela)")
+    parser.add_argument("--saida", help="grava os resultados em JSON")
+    return parser.parse_args()
+
+def main():
+    args = _argumentos()
+    totais, por_modulo = [], {}
+    for _ in range(args.repeticoes):
+        total, custos = medir_imports()
+        totais.append(total)
+        for nome, ms in custos.items():
+            por_modulo.setdefault(nome, []).append(ms)
+
+    resultado = {
+        "python": sys.version.split()[0],
+        "repeticoes": args.repeticoes,
+        "import_main_ms": {"mediana": statistics.median(totais), "min": min(totais), "max": max(totais)},
+        "modulos_ms": {nome: statistics.median(por_modulo[nome]) for nome in MODULOS_OBSERVADOS if nome in por_modulo},
+        "tardios_carregados": [nome for nome in MODULOS_TARDIOS if nome in por_modulo],
+    }
+    if args.app:
+        resultado["primeira_tela_ms"] = medir_primeira_tela()
+
+    print(f"import main: mediana {resultado['import_main_ms']['mediana']:.0f} ms "
+          f"(min {resultado['import_main_ms']['min']:.0f}, max {resultado['import_main_ms']['max']:.0f})")
+    for nome, ms in sorted(resultado["modulos_ms"].items(), key=lambda item: -item[1]):
+        print(f"  {nome:<12} {ms:8.1f} ms")
+    if args.app:
+        tela = resultado["primeira_tela_ms"]
+        print(f"primeira tela: {'não abriu' if tela is None else f'{tela:.0f} ms'}")
+
+    if args.saida:
+        with open(args.saida, "w", encoding="utf-8") as f:
+            json.dump(resultado, f, ensure_ascii=False, indent=2)
+
+    codigo = 0
+    if resultado["tardios_carregados"]:
+        print(f"Regressão: carregados na partida: {', '.join(resultado['tardios_carregados'])}")
+        codigo = 1
+    if args.limite_ms is not None and resultado["import_main_ms"]["mediana"] > args.limite_ms:
+        print(f"Regressão: import main acima de {args.limite_ms:.0f} ms")
+        codigo = 1
+    return codigo
+
+if __name__ == "__main__":
+    raise SystemExit(main())
@@ -0,0 +1,225 @@
+# benchmarks/sintetico.py
+# Dados sintéticos e determinísticos para os benchmarks: mesma semente, mesmos arquivos e mesmo banco.
+#   gerar_pasta_rdsr: pasta de DICOM SR de dose (RDSR) no formato que core/dicom_parser lê
+#   gerar_banco: tabela exames preenchida direto por db.inserir_exames_lote
+import datetime
+import os
+import random
+from core import database as db
+
+SEMENTE = 20240501
+MEDICOS = [str(1000 + i) for i in range(12)]
+EXAMES = ["CATETERISMO", "ANGIOPLASTIA", "ARTERIOGRAFIA", "EMBOLIZACAO", "NEURO", "MARCAPASSO", "BIOPSIA", "DRENAGEM"]
+SALAS = ["Philips-A1", "Philips-A2", "Siemens-B1", "GE-C1"]
+DATA_INICIAL = "2023-01-01"
+DIAS = 730
+
+# Raiz de UID só para dados de teste (2.25 = UID derivado de número inteiro)
+RAIZ_UID = "2.25."
+SOP_CLASS_RDSR = "1.2.840.10008.5.1.4.1.1.88.67"   # X-Ray Radiation Dose SR
+SOP_CLASS_CT = "1.2.840.10008.5.1.4.1.1.2"          # CT Image
+
+def _uid(semente, indice):
+    return f"{RAIZ_UID}{semente}{indice:09d}"
+
+def _data(rng, data_inicial, dias):
+    return datetime.date.fromisoformat(data_inicial) + datetime.timedelta(days=rng.randrange(dias))
+
+def _exame_sintetico(rng, medicos, exames, salas, data_inicial, dias):
+    """Valores de um exame: dose (Gy), DAP (Gy.m²) e tempo de fluoroscopia (s) com cauda longa, como no serviço real."""
+    exame = rng.choice(exames)
+    peso = 1 + exames.index(exame) % 4
+    return {
+        "data": _data(rng, data_inicial, dias),
+        "medico": rng.choice(medicos),
+        "exame": exame,
+        "sala": rng.choice(salas),
+        "sexo": rng.choice("FFMMN"),
+        "paciente": str(rng.randrange(1, 10 ** 7)),
+        "dose": round(rng.lognormvariate(-1.2, 0.7) * peso, 6),
+        "dap": round(rng.lognormvariate(-4.2, 0.8) * peso, 8),
+        "tempo": round(rng.lognormvariate(5.5, 0.8), 1),
+    }
+
+# --- RDSR ---
+
+def _conceito(codigo, significado, esquema="DCM"):
+    from pydicom.dataset import Dataset
+    item = Dataset()
+    item.CodeValue = codigo
+    item.CodingSchemeDesignator = esquema
+    item.CodeMeaning = significado
+    return item
+
+def _item(tipo, codigo, significado):
+    from pydicom.dataset import Dataset
+    from pydicom.sequence import Sequence
+    item = Dataset()
+    item.RelationshipType = "CONTAINS"
+    item.ValueType = tipo
+    item.ConceptNameCodeSequence = Sequence([_conceito(codigo, significado)])
+    return item
+
+def _num(codigo, significado, valor, unidade):
+    from pydicom.dataset import Dataset
+    from pydicom.sequence import Sequence
+    item = _item("NUM", codigo, significado)
+    medida = Dataset()
+    medida.NumericValue = f"{valor:.6g}"
+    medida.MeasurementUnitsCodeSequence = Sequence([_conceito(unidade, unidade, "UCUM")])
+    item.MeasuredValueSequence = Sequence([medida])
+    return item
+
+def _container(codigo, significado, filhos):
+    from pydicom.sequence import Sequence
+    item = _item("CONTAINER", codigo, significado)
+    item.ContinuityOfContent = "SEPARATE"
+    item.ContentSequence = Sequence(filhos)
+    return item
+
+def _eventos(rng, exame, quantidade):
+    """Contêineres 113706 (Irradiation Event X-Ray Data) cuja soma bate com os totais do exame."""
+    from pydicom.sequence import Sequence
+    pesos = [rng.random() + 0.1 for _ in range(quantidade)]
+    soma = sum(pesos)
+    inicio = datetime.datetime.combine(exame["data"], datetime.time(8)) + datetime.timedelta(minutes=rng.randrange(600))
+    eventos = []
+    for ordem, peso in enumerate(pesos):
+        fracao = peso / soma
+        item_tipo = _item("CODE", "113721", "Irradiation Event Type")
+        item_tipo.ConceptCodeSequence = Sequence([_conceito("P56-76000", "Fluoroscopy", "SRT")])
+        dt = _item("DATETIME", "111526", "DateTime Started")
+        dt.DateTime = (inicio + datetime.timedelta(seconds=30 * ordem)).strftime("%Y%m%d%H%M%S")
+        eventos.append(_container("113706", "Irradiation Event X-Ray Data", [
+            dt,
+            item_tipo,
+            _num("113738", "Dose (RP)", exame["dose"] * fracao, "Gy"),
+            _num("122130", "Dose Area Product", exame["dap"] * fracao, "Gy.m2"),
+            _num("113742", "Irradiation Duration", exame["tempo"] * fracao, "s"),
+            _num("113733", "KVP", rng.randrange(60, 110), "kV"),
+            _num("113734", "X-Ray Tube Current", rng.randrange(5, 800), "mA"),
+            _num("112011", "Positioner Primary Angle", rng.randrange(-90, 91), "deg"),
+            _num("112012", "Positioner Secondary Angle", rng.randrange(-45, 46), "deg"),
+        ]))
+    return eventos
+
+def gerar_rdsr(caminho, indice, semente=SEMENTE, eventos=5, medicos=MEDICOS, exames=EXAMES, salas=SALAS,
+               data_inicial=DATA_INICIAL, dias=DIAS):
+    """Grava em caminho um RDSR de fluoroscopia com eventos de irradiação; devolve os valores usados."""
+    from pydicom.dataset import Dataset, FileMetaDataset
+    from pydicom.sequence import Sequence
+    from pydicom.uid import ExplicitVRLittleEndian
+
+    rng = random.Random(f"{semente}-{indice}")
+    exame = _exame_sintetico(rng, medicos, exames, salas, data_inicial, dias)
+    fabricante, serie = exame["sala"].split("-", 1)
+
+    meta = FileMetaDataset()
+    meta.MediaStorageSOPClassUID = SOP_CLASS_RDSR
+    meta.MediaStorageSOPInstanceUID = _uid(semente, indice)
+    meta.TransferSyntaxUID = ExplicitVRLittleEndian
+
+    ds = Dataset()
+    ds.file_meta = meta
+    ds.SOPClassUID = SOP_CLASS_RDSR
+    ds.SOPInstanceUID = meta.MediaStorageSOPInstanceUID
+    ds.Modality = "SR"
+    ds.StudyDate = exame["data"].strftime("%Y%m%d")
+    ds.PatientID = exame["paciente"]
+    ds.PatientSex = exame["sexo"] if exame["sexo"] != "N" else "O"
+    ds.PerformingPhysicianName = f"DR^CRM^{exame['medico']}"
+    ds.StudyDescription = exame["exame"]
+    ds.Manufacturer = fabricante
+    ds.DeviceSerialNumber = serie
+    ds.ValueType = "CONTAINER"
+    ds.ConceptNameCodeSequence = Sequence([_conceito("113701", "X-Ray Radiation Dose Report")])
+    ds.ContentSequence = Sequence([
+        _container("113702", "Accumulated X-Ray Dose Data", [
+            _num("113722", "Dose Area Product Total", exame["dap"], "Gy.m2"),
+            _num("113725", "Dose (RP) Total", exame["dose"], "Gy"),
+            _num("113730", "Total Fluoro Time", exame["tempo"], "s"),
+        ]),
+        *_eventos(rng, exame, eventos),
+    ])
+    ds.save_as(caminho, enforce_file_format=True)
+    return exame
+
+def gerar_imagem_ct(caminho, indice, semente=SEMENTE):
+    """Arquivo DICOM que não é SR (descartado pelo pré-filtro da importação)."""
+    from pydicom.dataset import Dataset, FileMetaDataset
+    from pydicom.uid import ExplicitVRLittleEndian
+
+    meta = FileMetaDataset()
+    meta.MediaStorageSOPClassUID = SOP_CLASS_CT
+    meta.MediaStorageSOPInstanceUID = _uid(semente, indice)
+    meta.TransferSyntaxUID = ExplicitVRLittleEndian
+    ds = Dataset()
+    ds.file_meta = meta
+    ds.SOPClassUID = SOP_CLASS_CT
+    ds.SOPInstanceUID = meta.MediaStorageSOPInstanceUID
+    ds.Modality = "CT"
+    ds.Rows = ds.Columns = 64
+    ds.BitsAllocated = ds.BitsStored = 16
+    ds.HighBit = 15
+    ds.SamplesPerPixel = 1
+    ds.PixelRepresentation = 0
+    ds.PhotometricInterpretation = "MONOCHROME2"
+    ds.PixelData = bytes(64 * 64 * 2)
+    ds.save_as(caminho, enforce_file_format=True)
+
+def gerar_pasta_rdsr(pasta, quantidade, semente=SEMENTE, eventos=5, fracao_outros=0.0, **opcoes):
+    """
+    Cria quantidade arquivos em pasta (em subpastas de 1000), dos quais fracao_outros
+    são imagens CT e o resto RDSRs com `eventos` eventos cada. opcoes vai para gerar_rdsr
+    (medicos, exames, salas, data_inicial, dias). Retorna a quantidade de RDSRs.
+    """
+    rng = random.Random(semente)
+    rdsr = 0
+    for indice in range(quantidade):
+        subpasta = os.path.join(pasta, f"{indice // 1000:04d}")
+        os.makedirs(subpasta, exist_ok=True)
+        caminho = os.path.join(subpasta, f"IM{indice:07d}.dcm")
+        if rng.random() < fracao_outros:
+            gerar_imagem_ct(caminho, indice, semente)
+        else:
+            gerar_rdsr(caminho, indice, semente, eventos, **opcoes)
+            rdsr += 1
+    return rdsr
+
+# --- BANCO ---
+
+def _registros(linhas, semente, medicos, exames, salas, data_inicial, dias):
+    rng = random.Random(semente)
+    for _ in range(linhas):
+        exame = _exame_sintetico(rng, medicos, exames, salas, data_inicial, dias)
+        m, s = divmod(exame["tempo"], 60)
+        h, m = divmod(m, 60)
+        yield (
+            exame["data"].isoformat(), exame["medico"], exame["exame"], round(exame["dose"] * 1000, 2),
+            "{:02d}:{:02d}:{:02d}".format(int(h), int(m), int(s)), round(exame["dap"] * 1e6, 2),
+            exame["paciente"], exame["sexo"] if exame["sexo"] != "N" else "NI", exame["sala"],
+        )
+
+def gerar_banco(caminho, linhas, semente=SEMENTE, medicos=MEDICOS, exames=EXAMES, salas=SALAS,
+                data_inicial=DATA_INICIAL, dias=DIAS, tamanho_lote=20000):
+    """
+    Cria (ou completa) o banco em caminho com `linhas` exames sintéticos, nas mesmas
+    unidades da importação DICOM. Se o banco já tem essa quantidade, não grava nada.
+    Deixa o banco aberto (db.abrir_banco) e retorna a quantidade de linhas.
+    """
+    db.abrir_banco(caminho)
+    db.preparar_banco()
+    conn = db.conectar()
+    existentes = conn.execute("SELECT COUNT(*) FROM exames").fetchone()[0]
+    conn.close()
+    if existentes == linhas:
+        return linhas
+    if existentes:
+        raise ValueError(f"{caminho} já tem {existentes} exames (esperado 0 ou {linhas})")
+
+    inseridos, falhas, _ = db.inserir_exames_lote(
+        _registros(linhas, semente, medicos, exames, salas, data_inicial, dias), tamanho_lote=tamanho_lote
+    )
+    if falhas:
+        raise RuntimeError(f"{falhas} exames sintéticos não foram gravados")
+    return inseridos
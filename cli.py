@@ -0,0 +1,129 @@
+"""
+OpenZoe - Linha de comando
+Importação, estatísticas e exportação sem abrir a interface Flet.
+
+Uso:
+    python cli.py --banco exames.db ingest /pasta/dicom
+    python cli.py --banco exames.db stats --data-inicio 2024-05-01 --data-fim 2024-05-31 --por exame
+    python cli.py --banco exames.db export-csv saida.csv --sala A-1
+    python cli.py --banco exames.db export-pdf relatorio.pdf --medico "1;2"
+
+Os módulos pesados (pydicom, matplotlib, fpdf) só são importados pelo subcomando que precisa deles.
+"""
+
+import argparse
+import json
+import multiprocessing
+import sys
+from config import state
+from core import database as db
+from core import perfil
+
+def _filtros(args):
+    """Lista de argumentos de db.montar_query_filtros a partir das opções --data-inicio, --sala, ..."""
+    return [getattr(args, campo) or "" for campo in db.CAMPOS_FILTRO]
+
+def _progresso_importacao(evento):
+    if evento["fase"] == "varrendo":
+        print(f"\rProcurando arquivos... {evento['escaneados']}", end="", file=sys.stderr)
+    else:
+        print(f"\rLidos {evento['lidos']}/{evento['a_ler']} | gravados {evento['inseridos']} | "
+              f"erros {evento['falhas']} | {evento['arquivos_por_segundo']:.1f} arquivos/s", end="", file=sys.stderr)
+
+def cmd_ingest(args):
+    from core import dicom_parser
+    sucessos, erros = dicom_parser.processar_diretorio_dicom(args.pasta, workers=args.workers, progresso=_progresso_importacao)
+    print(file=sys.stderr)
+    print(f"{sucessos} exames importados, {erros} erros.")
+    return 1 if erros and not sucessos else 0
+
+def cmd_stats(args):
+    from core import analytics
+    agregados = analytics.calcular_agregados(*_filtros(args))
+    linhas = analytics.resumo_grupos(agregados, args.por)
+    total = sum(linha[1] for linha in linhas)
+
+    if args.json:
+        print(json.dumps({"total": total, "por": args.por, "grupos": [
+            {"chave": chave if not isinstance(chave, tuple) else list(chave), "qtd": qtd, "dose_media": media,
+             "dose_min": minimo, "dose_max": maximo, "tempo_medio_min": tempo}
+            for chave, qtd, media, minimo, maximo, tempo in linhas
+        ]}, ensure_ascii=False, indent=2))
+        return 0
+
+    def numero(valor, casas=1):
+        return "-" if valor is None else f"{valor:.{casas}f}".replace('.', ',')
+
+    print(f"Total de exames: {total}")
+    print(f"{args.por:<20} {'Qtd':>7} {'Dose média':>12} {'Dose mín':>10} {'Dose máx':>10} {'Tempo (min)':>12}")
+    for chave, qtd, media, minimo, maximo, tempo in linhas:
+        rotulo = " / ".join(str(c) for c in chave) if isinstance(chave, tuple) else str(chave)
+        print(f"{rotulo[:20]:<20} {qtd:>7} {numero(media):>12} {numero(minimo):>10} {numero(maximo):>10} {numero(tempo, 2):>12}")
+    return 0
+
+def cmd_export_csv(args):
+    from reports.csv_export import exportar_csv_arquivo
+    filtros = _filtros(args)
+    state.data_inicio, state.data_final = filtros[0], filtros[1]
+    inputs_filtros = {
+        'min_d': filtros[2], 'max_d': filtros[3], 'med': filtros[4], 'exm': filtros[5],
+        'min_t': filtros[6], 'max_t': filtros[7], 'min_dap': filtros[8], 'max_dap': filtros[9],
+        'sala': filtros[10], 'sexo': filtros[11], 'id_pac': filtros[12],
+    }
+    linhas = exportar_csv_arquivo(args.arquivo, apenas_filtrados=True, inputs_filtros=inputs_filtros)
+    if linhas is None: return 1
+    if linhas == 0:
+        print("Sem dados com esses filtros; nenhum arquivo gravado.")
+        return 0
+    print(f"{linhas} linhas gravadas em {args.arquivo}")
+    return 0
+
+def cmd_export_pdf(args):
+    from reports.pdf_export import gerar_relatorio_pdf
+    gerar_relatorio_pdf(args.arquivo, _filtros(args))
+    print(f"Relatório gravado em {args.arquivo}")
+    return 0
+
+def _argumentos(argv=None):
+    parser = argparse.ArgumentParser(prog="openzoe", description="OpenZoe sem interface: importação, estatísticas e exportação.")
+    parser.add_argument("--banco", required=True, help="arquivo .db do OpenZoe (criado se não existir)")
+    parser.add_argument("--perfil", help="grava tempos, SQL e planos de consulta neste JSON (ver core/perfil.py)")
+
+    filtros = argparse.ArgumentParser(add_help=False)
+    grupo = filtros.add_argument_group("filtros (os mesmos da interface)")
+    for campo in db.CAMPOS_FILTRO:
+        grupo.add_argument("--" + campo.replace("_", "-"), dest=campo, default="")
+
+    sub = parser.add_subparsers(dest="comando", required=True)
+
+    p = sub.add_parser("ingest", help="importa uma pasta de arquivos DICOM SR")
+    p.add_argument("pasta")
+    p.add_argument("--workers", type=int, default=None, help="processos de leitura (padrão: config)")
+    p.set_defaults(funcao=cmd_ingest)
+
+    p = sub.add_parser("stats", parents=[filtros], help="estatísticas de dose e tempo dos exames filtrados")
+    p.add_argument("--por", choices=["medico", "exame", "exame_medico", "dia"], default="medico")
+    p.add_argument("--json", action="store_true", help="saída em JSON")
+    p.set_defaults(funcao=cmd_stats)
+
+    p = sub.add_parser("export-csv", parents=[filtros], help="exporta os exames filtrados em CSV")
+    p.add_argument("arquivo")
+    p.set_defaults(funcao=cmd_export_csv)
+
+    p = sub.add_parser("export-pdf", parents=[filtros], help="gera o relatório PDF dos exames filtrados")
+    p.add_argument("arquivo")
+    p.set_defaults(funcao=cmd_export_pdf)
+
+    return parser.parse_args(argv)
+
+def main(argv=None):
+    args = _argumentos(argv)
+    if args.perfil or state.perfil_arquivo:
+        perfil.ativar(args.perfil)
+    db.abrir_banco(args.banco)
+    db.preparar_banco()
+    return args.funcao(args)
+
+if __name__ == "__main__":
+    multiprocessing.freeze_support()
+    raise SystemExit(main())
@@ -1,11 +1,41 @@
 # config.py
+import os
+
 class AppState:
     FILE_PATH = ""
     data_inicio = ""
     data_final = ""
-    pagina_atual = 1
-    itens_por_pagina = 15
+    # Tabela virtualizada (ui/tabela_ui.py): linhas visíveis (controles criados uma vez),
+    # linhas lidas do banco por consulta ao rolar e blocos guardados em memória
+    linhas_tabela = 20
+    bloco_tabela = 100
+    blocos_tabela = 4
     directory_path = ""
     upload_path = ""
+    # Processos usados para ler os DICOM na importação (1 = sem paralelismo)
+    workers_importacao = max(1, (os.cpu_count() or 1) - 1)
+    # Processos que desenham os gráficos do PDF ao mesmo tempo (um por gráfico, no máximo 5)
+    workers_graficos = min(5, max(1, (os.cpu_count() or 1) - 1))
+    # Processos que geram relatórios ao mesmo tempo no lote (reports/lote_pdf.py)
+    workers_relatorios = max(1, (os.cpu_count() or 1) - 1)
+    # Linhas gravadas por transação nas inserções em lote
+    tamanho_lote_insercao = 1000
+    # Pontos enviados ao gráfico de evolução (dias × séries); acima disso agrupa por semana ou mês
+    max_pontos_grafico = 500
+    # Resultados de consulta guardados por função no cache LRU de filtros
+    tamanho_cache = 64
+    # Instrumentação (core/perfil.py): arquivo JSON gravado ao sair; vazio = desligada
+    perfil_arquivo = os.environ.get("OPENZOE_PERFIL", "")
+    # Eventos guardados no trace (as somas por função/consulta continuam depois do limite)
+    perfil_max_eventos = 200000
+    # Pragmas aplicados ao abrir as conexões (journal_mode só na de escrita)
+    pragmas_sqlite = {
+        "journal_mode": "WAL",
+        "synchronous": "NORMAL",
+        "cache_size": -64000,
+        "mmap_size": 268435456,
+        "temp_store": "MEMORY",
+        "busy_timeout": 30000,
+    }
 
 state = AppState()
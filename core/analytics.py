@@ -1,131 +1,314 @@
 # core/analytics.py
-import datetime
 from core import database as db
+from core import perfil
+from core.cache import cache_filtros
 
-def calcular_evolucao_temporal(data_inicio, data_fim, min_d, max_d, n_medico, exm, min_tempo, max_tempo, min_dap, max_dap, sala, sexo, id_pac):
-    modo_multiplo = False
-    if n_medico and ";" in str(n_medico):
-        modo_multiplo = True
+# Posições das estatísticas acumuladas por grupo
+QTD, N_DOSE, SOMA_DOSE, MIN_DOSE, MAX_DOSE, N_TEMPO, SOMA_TEMPO, MIN_TEMPO, MAX_TEMPO = range(9)
 
+AGRUPAMENTOS = ("medico", "exame", "exame_medico", "dia", "dia_medico")
+
+def _novo_acumulador():
+    return [0, 0, 0.0, None, None, 0, 0.0, None, None]
+
+def _somar(acc, linha):
+    qtd, n_dose, soma_dose, min_dose, max_dose, n_tempo, soma_tempo, min_tempo, max_tempo = linha
+    acc[QTD] += qtd
+    acc[N_DOSE] += n_dose; acc[SOMA_DOSE] += soma_dose or 0.0
+    acc[N_TEMPO] += n_tempo; acc[SOMA_TEMPO] += soma_tempo or 0.0
+    if min_dose is not None and (acc[MIN_DOSE] is None or min_dose < acc[MIN_DOSE]): acc[MIN_DOSE] = min_dose
+    if max_dose is not None and (acc[MAX_DOSE] is None or max_dose > acc[MAX_DOSE]): acc[MAX_DOSE] = max_dose
+    if min_tempo is not None and (acc[MIN_TEMPO] is None or min_tempo < acc[MIN_TEMPO]): acc[MIN_TEMPO] = min_tempo
+    if max_tempo is not None and (acc[MAX_TEMPO] is None or max_tempo > acc[MAX_TEMPO]): acc[MAX_TEMPO] = max_tempo
+
+@cache_filtros
+def calcular_agregados(data_inicio, data_fim, min_d, max_d, n_medico, exm, min_tempo, max_tempo, min_dap, max_dap, sala, sexo, id_pac):
+    """
+    Varre as linhas filtradas uma única vez (agrupadas no SQL por dia, médico e exame)
+    e monta todos os agrupamentos do dashboard de uma vez. Se só período, médico,
+    exame, sala e sexo estão filtrados, lê de resumo_diario em vez de exames.
+    Retorna {agrupamento: {chave: acumulador}}, com os agrupamentos de AGRUPAMENTOS;
+    cada acumulador segue as posições QTD, N_DOSE, SOMA_DOSE, ... (tempo em segundos).
+    """
+    agregados = {nome: {} for nome in AGRUPAMENTOS}
     try:
         conn = db.conectar()
-        if conn is None: return [], modo_multiplo
+        if conn is None: return agregados
         cursor = conn.cursor()
-        sql_where, params = db.montar_query_filtros(data_inicio, data_fim, min_d, max_d, n_medico, exm, min_tempo, max_tempo, min_dap, max_dap, sala, sexo, id_pac)
-        
-        if modo_multiplo:
-            sql = f"SELECT date(data), medico, COUNT(*) {sql_where} GROUP BY date(data), medico ORDER BY date(data)"
+        filtros = (data_inicio, data_fim, min_d, max_d, n_medico, exm, min_tempo, max_tempo, min_dap, max_dap, sala, sexo, id_pac)
+        if filtros_na_janela(filtros):
+            # Só dimensões do resumo diário: soma os grupos prontos em vez das linhas
+            sql_where, params = db.montar_query_resumo(data_inicio, data_fim, n_medico, exm, sala, sexo)
+            sql = f"""
+                SELECT dia, medico, exam, SUM(qtd),
+                    SUM(n_dose), SUM(soma_dose), MIN(min_dose), MAX(max_dose),
+                    SUM(n_tempo), SUM(soma_tempo), MIN(min_tempo), MAX(max_tempo)
+                {sql_where} GROUP BY dia, medico, exam
+            """
         else:
-            sql = f"SELECT date(data), COUNT(*) {sql_where} GROUP BY date(data) ORDER BY date(data)"
-            
+            sql_where, params = db.montar_query_filtros(*filtros)
+            sql = f"""
+                SELECT date(data), medico, exam, COUNT(*),
+                    COUNT(dose_num), SUM(dose_num), MIN(dose_num), MAX(dose_num),
+                    COUNT(tempo_seg), SUM(tempo_seg), MIN(tempo_seg), MAX(tempo_seg)
+                {sql_where} GROUP BY date(data), medico, exam
+            """
         cursor.execute(sql, params)
         res = cursor.fetchall()
         conn.close()
+    except Exception as e:
+        print(f"Erro Agregados: {e}")
+        return agregados
 
-        if not res: return [], modo_multiplo
-
-        datas = [r[0] for r in res]
-        str_inicio = min(datas)
-        str_fim = max(datas)
-
-        d_inicio = datetime.datetime.strptime(str_inicio, "%Y-%m-%d").date()
-        d_fim = datetime.datetime.strptime(str_fim, "%Y-%m-%d").date()
+    return _montar_agregados(res)
 
-        todas_datas = []
-        delta = d_fim - d_inicio
-        for i in range(delta.days + 1):
-            dia = d_inicio + datetime.timedelta(days=i)
-            todas_datas.append(dia.strftime("%Y-%m-%d"))
+def _montar_agregados(linhas):
+    """Monta os agrupamentos a partir de linhas (dia, medico, exame, *estatísticas)."""
+    agregados = {nome: {} for nome in AGRUPAMENTOS}
+    for dia, medico, exame, *estatisticas in linhas:
+        chaves = {"medico": medico, "exame": exame, "exame_medico": (exame, medico), "dia": dia, "dia_medico": (dia, medico)}
+        for nome, chave in chaves.items():
+            if nome.startswith("dia") and dia is None: continue
+            grupo = agregados[nome]
+            if chave not in grupo: grupo[chave] = _novo_acumulador()
+            _somar(grupo[chave], estatisticas)
+    return agregados
 
-        res_preenchido = []
-        if not modo_multiplo:
-            mapa_dados = {r[0]: r[1] for r in res}
-            for d in todas_datas:
-                res_preenchido.append((d, mapa_dados.get(d, 0)))
-        else:
-            medicos = list(set([r[1] for r in res]))
-            mapa_dados = {m: {} for m in medicos}
-            for r in res:
-                mapa_dados[r[1]][r[0]] = r[2] 
-            for d in todas_datas:
-                for m in medicos:
-                    res_preenchido.append((d, m, mapa_dados[m].get(d, 0)))
-
-        return res_preenchido, modo_multiplo
-    except Exception as e:
-        print(f"Erro Evolução: {e}")
-        return [], False
+# --- AGREGAÇÃO COMPARTILHADA POR JANELA DE TEMPO ---
+# Filtros que podem ser aplicados em Python sobre a base da janela; com qualquer
+# outro (faixas de dose/tempo/DAP, paciente) é preciso ir ao banco com o filtro.
+FILTROS_JANELA = (4, 5, 10, 11)  # n_medico, exm, sala, sexo
 
-def calcular_media_medico(data_inicio, data_fim, min_d, max_d, n_medico, exm, min_tempo, max_tempo, min_dap, max_dap, sala, sexo, id_pac):
-    resultados = []
-    try:
-        conn = db.conectar()
-        cursor = conn.cursor()
-        sql_where, params = db.montar_query_filtros(data_inicio, data_fim, min_d, max_d, n_medico, exm, min_tempo, max_tempo, min_dap, max_dap, sala, sexo, id_pac)
-        
-        sql_media = f"""
-            SELECT medico, AVG(CAST(REPLACE(dose_mgy, ',', '.') AS REAL)) as media_dose,
-                MIN(CAST(REPLACE(dose_mgy, ',', '.') AS REAL)) as min_dose,
-                MAX(CAST(REPLACE(dose_mgy, ',', '.') AS REAL)) as max_dose,
-                COUNT(*) as qtd
-            {sql_where} GROUP BY medico ORDER BY media_dose DESC
-        """
-        cursor.execute(sql_media, params)
-        resultados = cursor.fetchall()
-        conn.close()
-    except Exception as e: print(f"Erro SQL Media: {e}")
-    return resultados
+def filtros_na_janela(filtros):
+    """True se só período, médico, exame, sala e sexo estão preenchidos."""
+    return all(not (v and str(v).strip()) for i, v in enumerate(filtros[2:], 2) if i not in FILTROS_JANELA)
 
-def calcular_media_tempo_medico(data_inicio, data_fim, min_d, max_d, n_medico, exm, min_tempo, max_tempo, min_dap, max_dap, sala, sexo, id_pac):
+@cache_filtros
+def calcular_base_janela(data_inicio, data_fim):
+    """
+    Linhas do resumo diário no período, por dia, médico, exame, sala e sexo.
+    Serve de base para montar os agregados de vários relatórios do mesmo período.
+    """
     try:
         conn = db.conectar()
-        if not conn: return []
+        if conn is None: return []
         cursor = conn.cursor()
-        sql_where, params = db.montar_query_filtros(data_inicio, data_fim, min_d, max_d, n_medico, exm, min_tempo, max_tempo, min_dap, max_dap, sala, sexo, id_pac)
-        calc_minutos = "(CAST(substr(tempo, 1, 2) AS INTEGER) * 60 + CAST(substr(tempo, 4, 2) AS INTEGER) + CAST(substr(tempo, 7, 2) AS REAL)/60)"
-        sql = f"""
-            SELECT medico, AVG({calc_minutos}) as media, MIN({calc_minutos}) as minimo, MAX({calc_minutos}) as maximo, COUNT(*) as qtd
-            {sql_where} GROUP BY medico ORDER BY media DESC
-        """
-        cursor.execute(sql, params)
-        resultados = cursor.fetchall()
+        sql_where, params = db.montar_query_resumo(data_inicio, data_fim, "", "", "", "")
+        cursor.execute(f"""
+            SELECT dia, medico, exam, sala, sexo, qtd,
+                n_dose, soma_dose, min_dose, max_dose,
+                n_tempo, soma_tempo, min_tempo, max_tempo
+            {sql_where}
+        """, params)
+        res = cursor.fetchall()
         conn.close()
-        return resultados
+        return res
     except Exception as e:
-        print(f"Erro Media Tempo SQL: {e}")
+        print(f"Erro Base Janela: {e}")
         return []
 
-def calcular_media_exame(data_inicio, data_fim, min_d, max_d, n_medico, exm, min_tempo, max_tempo, min_dap, max_dap, sala, sexo, id_pac):
-    resultados = []; modo_multiplo = False
-    if n_medico and ";" in str(n_medico): modo_multiplo = True
-    try:
-        conn = db.conectar(); cursor = conn.cursor()
-        sql_where, params = db.montar_query_filtros(data_inicio, data_fim, min_d, max_d, n_medico, exm, min_tempo, max_tempo, min_dap, max_dap, sala, sexo, id_pac)
-        if modo_multiplo:
-            sql_media = f"""SELECT exam, medico, AVG(CAST(REPLACE(dose_mgy, ',', '.') AS REAL)) as media_dose, MIN(CAST(REPLACE(dose_mgy, ',', '.') AS REAL)) as min_dose, MAX(CAST(REPLACE(dose_mgy, ',', '.') AS REAL)) as max_dose, COUNT(*) as qtd {sql_where} GROUP BY exam, medico ORDER BY exam"""
-        else:
-            sql_media = f"""SELECT exam, AVG(CAST(REPLACE(dose_mgy, ',', '.') AS REAL)) as media_dose, MIN(CAST(REPLACE(dose_mgy, ',', '.') AS REAL)) as min_dose, MAX(CAST(REPLACE(dose_mgy, ',', '.') AS REAL)) as max_dose, COUNT(*) as qtd {sql_where} GROUP BY exam ORDER BY media_dose DESC"""
-        cursor.execute(sql_media, params)
-        resultados = cursor.fetchall(); conn.close()
-    except Exception as e: print(f"Erro SQL Media Exame: {e}")
-    return resultados, modo_multiplo
+def agregados_da_base(base, n_medico, exm, sala, sexo):
+    """Mesmo resultado de calcular_agregados para os filtros, a partir de calcular_base_janela."""
+    medicos = None
+    if n_medico and str(n_medico).strip():
+        entrada_medico = str(n_medico).strip()
+        medicos = {m.strip() for m in entrada_medico.split(";") if m.strip()} if ";" in entrada_medico else {entrada_medico}
+        medicos = medicos or None
+    exm = str(exm).strip() if exm and str(exm).strip() else None
+    sala = str(sala).strip() if sala and str(sala).strip() else None
+    sexo = str(sexo).strip() if sexo and str(sexo).strip() else None
+
+    linhas = (
+        (dia, medico, exame, *estatisticas)
+        for dia, medico, exame, sala_linha, sexo_linha, *estatisticas in base
+        if (medicos is None or medico in medicos) and (exm is None or exame == exm)
+        and (sala is None or sala_linha == sala) and (sexo is None or sexo_linha == sexo)
+    )
+    return _montar_agregados(linhas)
+
+def _resumo_dose(acc):
+    media = acc[SOMA_DOSE] / acc[N_DOSE] if acc[N_DOSE] else None
+    return media, acc[MIN_DOSE], acc[MAX_DOSE], acc[QTD]
+
+def _resumo_tempo(acc):
+    """Mesmo formato de _resumo_dose, em minutos."""
+    if not acc[N_TEMPO]: return None, None, None, acc[QTD]
+    return acc[SOMA_TEMPO] / acc[N_TEMPO] / 60, acc[MIN_TEMPO] / 60, acc[MAX_TEMPO] / 60, acc[QTD]
+
+def resumo_grupos(agregados, agrupamento):
+    """
+    Linhas (chave, qtd, dose média, dose mín, dose máx, tempo médio em min) de um
+    agrupamento de calcular_agregados, em ordem de quantidade decrescente.
+    """
+    linhas = []
+    for chave, acc in agregados[agrupamento].items():
+        media_dose, min_dose, max_dose, qtd = _resumo_dose(acc)
+        linhas.append((chave, qtd, media_dose, min_dose, max_dose, _resumo_tempo(acc)[0]))
+    linhas.sort(key=lambda r: (-r[1], _texto_asc(str(r[0]))))
+    return linhas
+
+def _media_desc(linha, pos):
+    # Igual ao ORDER BY ... DESC do SQLite: nulos por último
+    return (linha[pos] is None, -(linha[pos] or 0))
+
+def _texto_asc(valor):
+    return (valor is None, valor or "")
+
+def _modo_multiplo(n_medico):
+    return bool(n_medico and ";" in str(n_medico))
+
+@cache_filtros
+def calcular_evolucao_temporal(data_inicio, data_fim, min_d, max_d, n_medico, exm, min_tempo, max_tempo, min_dap, max_dap, sala, sexo, id_pac, agregados=None):
+    """
+    Exames por dia, do primeiro ao último dia com exame (dias sem exame valem 0).
+    Retorna (serie, modo_multiplo), onde serie é {"datas": array datetime64[D] com um dia
+    por linha, "series": nomes das colunas (os médicos, em ordem, no modo múltiplo; "Exames"
+    senão), "valores": array de inteiros dias × séries}, ou {} se não há exames.
+    A matriz é montada uma vez aqui e usada direto pelo gráfico da tela e pelo PNG/PDF.
+    """
+    import numpy as np
+    modo_multiplo = _modo_multiplo(n_medico)
 
-def calcular_media_tempo_exame(data_inicio, data_fim, min_d, max_d, n_medico, exm, min_tempo, max_tempo, min_dap, max_dap, sala, sexo, id_pac):
-    modo_multiplo = False
-    if n_medico and ";" in str(n_medico): modo_multiplo = True
     try:
-        conn = db.conectar()
-        if not conn: return [], modo_multiplo
-        cursor = conn.cursor()
-        sql_where, params = db.montar_query_filtros(data_inicio, data_fim, min_d, max_d, n_medico, exm, min_tempo, max_tempo, min_dap, max_dap, sala, sexo, id_pac)
-        calc_minutos = "(CAST(substr(tempo, 1, 2) AS INTEGER) * 60 + CAST(substr(tempo, 4, 2) AS INTEGER) + CAST(substr(tempo, 7, 2) AS REAL)/60)"
+        if agregados is None:
+            agregados = calcular_agregados(data_inicio, data_fim, min_d, max_d, n_medico, exm, min_tempo, max_tempo, min_dap, max_dap, sala, sexo, id_pac)
+
+        if not agregados["dia"]: return {}, modo_multiplo
+
         if modo_multiplo:
-            sql = f"""SELECT exam, medico, AVG({calc_minutos}) as media, MIN({calc_minutos}) as minimo, MAX({calc_minutos}) as maximo, COUNT(*) as qtd {sql_where} GROUP BY exam, medico ORDER BY exam"""
+            chaves, accs = zip(*agregados["dia_medico"].items())
+            dias = np.array([dia for dia, _ in chaves], dtype="datetime64[D]")
+            series, coluna = np.unique(np.array([str(medico) for _, medico in chaves]), return_inverse=True)
+            series = series.tolist()
         else:
-            sql = f"""SELECT exam, AVG({calc_minutos}) as media, MIN({calc_minutos}) as minimo, MAX({calc_minutos}) as maximo, COUNT(*) as qtd {sql_where} GROUP BY exam ORDER BY media DESC"""
-        cursor.execute(sql, params)
-        resultados = cursor.fetchall(); conn.close()
-        return resultados, modo_multiplo
+            chaves, accs = zip(*agregados["dia"].items())
+            dias = np.array(chaves, dtype="datetime64[D]")
+            series, coluna = ["Exames"], np.zeros(len(chaves), dtype=np.intp)
+
+        inicio = dias.min()
+        linha = (dias - inicio).astype(np.intp)
+        valores = np.zeros((int(linha.max()) + 1, len(series)), dtype=np.int64)
+        np.add.at(valores, (linha, coluna), np.fromiter((acc[QTD] for acc in accs), dtype=np.int64, count=len(accs)))
+
+        datas = inicio + np.arange(valores.shape[0])
+        return {"datas": datas, "series": series, "valores": valores}, modo_multiplo
     except Exception as e:
-        print(f"Erro Media Tempo Exame SQL: {e}")
-        return [], False
+        print(f"Erro Evolução: {e}")
+        return {}, False
+
+# --- NÍVEL DE DETALHE DA SÉRIE TEMPORAL ---
+NIVEIS_SERIE = ("dia", "semana", "mes")
+# Segunda-feira anterior a 1970-01-01: as semanas começam na segunda
+_SEGUNDA_BASE = "1969-12-29"
+# Pontos mínimos por série no gráfico; abaixo disso os médicos com menos exames viram "Outros"
+MIN_PONTOS_SERIE = 12
+
+def nivel_automatico(dias, n_series, max_pontos):
+    """Nível mais fino (dia, semana, mês) em que dias × séries cabe em max_pontos."""
+    n_series = max(1, n_series)
+    if dias * n_series <= max_pontos: return "dia"
+    if (dias / 7 + 1) * n_series <= max_pontos: return "semana"
+    return "mes"
+
+def _limitar_series(serie, n_series):
+    """Mantém as n_series - 1 séries com mais exames (na ordem original) e soma as outras em "Outros"."""
+    import numpy as np
+    valores = serie["valores"]
+    if n_series <= 1:
+        return {**serie, "series": ["Outros"], "valores": valores.sum(axis=1, keepdims=True)}
+    ordem = np.argsort(-valores.sum(axis=0), kind="stable")
+    manter, juntar = np.sort(ordem[:n_series - 1]), ordem[n_series - 1:]
+    return {
+        **serie,
+        "series": [serie["series"][i] for i in manter] + ["Outros"],
+        "valores": np.column_stack((valores[:, manter], valores[:, juntar].sum(axis=1))),
+    }
+
+def _agrupar(datas, valores, picos, ate, grupos):
+    """Soma os trechos consecutivos com o mesmo grupo (as datas são contínuas e ordenadas)."""
+    import numpy as np
+    inicios = np.concatenate(([0], np.flatnonzero(grupos[1:] != grupos[:-1]) + 1))
+    fins = np.append(inicios[1:], len(datas)) - 1
+    return datas[inicios], ate[fins], np.add.reduceat(valores, inicios, axis=0), np.maximum.reduceat(picos, inicios, axis=0)
+
+def reduzir_serie(serie, max_pontos=None, nivel=None):
+    """
+    Agrupa a série de calcular_evolucao_temporal por semana ou mês para o gráfico
+    não receber pontos demais. Sem nivel, usa o mais fino que respeita max_pontos
+    (padrão: state.max_pontos_grafico); um período menor volta sozinho para o nível dia.
+    Retorna o mesmo formato, com "valores" somados por grupo, "datas" com o primeiro dia
+    de cada grupo e mais "ate" (último dia), "picos" (maior valor diário do grupo), "nivel"
+    e "passo" (quantos dias, semanas ou meses cada ponto soma; 1 sem grupos vizinhos somados).
+
+    O limite vale em qualquer nível, inclusive o escolhido à mão: com séries demais para
+    MIN_PONTOS_SERIE pontos cada, as menores viram "Outros"; se ainda assim passar,
+    grupos vizinhos são somados (ex.: meses de dois em dois).
+    """
+    import numpy as np
+    from config import state
+    if not serie: return serie
+    max_pontos = max_pontos or state.max_pontos_grafico
+    if len(serie["series"]) > 1 and len(serie["series"]) * MIN_PONTOS_SERIE > max_pontos:
+        serie = _limitar_series(serie, max_pontos // MIN_PONTOS_SERIE)
+    datas, valores = serie["datas"], serie["valores"]
+    n_series = len(serie["series"])
+    if nivel is None:
+        nivel = nivel_automatico(len(datas), n_series, max_pontos)
+
+    ate, picos = datas, valores
+    if nivel == "semana":
+        datas, ate, valores, picos = _agrupar(datas, valores, picos, ate, (datas - np.datetime64(_SEGUNDA_BASE, "D")).astype(np.int64) // 7)
+    elif nivel == "mes":
+        datas, ate, valores, picos = _agrupar(datas, valores, picos, ate, datas.astype("datetime64[M]"))
+
+    por_serie = max(1, max_pontos // n_series)
+    juntar = 1
+    if len(datas) > por_serie:
+        juntar = -(-len(datas) // por_serie)
+        datas, ate, valores, picos = _agrupar(datas, valores, picos, ate, np.arange(len(datas)) // juntar)
+
+    return {"datas": datas, "ate": ate, "series": serie["series"], "valores": valores, "picos": picos, "nivel": nivel, "passo": juntar}
+
+@cache_filtros
+def calcular_media_medico(data_inicio, data_fim, min_d, max_d, n_medico, exm, min_tempo, max_tempo, min_dap, max_dap, sala, sexo, id_pac, agregados=None):
+    if agregados is None:
+        agregados = calcular_agregados(data_inicio, data_fim, min_d, max_d, n_medico, exm, min_tempo, max_tempo, min_dap, max_dap, sala, sexo, id_pac)
+    resultados = [(medico, *_resumo_dose(acc)) for medico, acc in agregados["medico"].items()]
+    resultados.sort(key=lambda r: _media_desc(r, 1))
+    return resultados
+
+@cache_filtros
+def calcular_media_tempo_medico(data_inicio, data_fim, min_d, max_d, n_medico, exm, min_tempo, max_tempo, min_dap, max_dap, sala, sexo, id_pac, agregados=None):
+    if agregados is None:
+        agregados = calcular_agregados(data_inicio, data_fim, min_d, max_d, n_medico, exm, min_tempo, max_tempo, min_dap, max_dap, sala, sexo, id_pac)
+    resultados = [(medico, *_resumo_tempo(acc)) for medico, acc in agregados["medico"].items()]
+    resultados.sort(key=lambda r: _media_desc(r, 1))
+    return resultados
+
+@cache_filtros
+def calcular_media_exame(data_inicio, data_fim, min_d, max_d, n_medico, exm, min_tempo, max_tempo, min_dap, max_dap, sala, sexo, id_pac, agregados=None):
+    modo_multiplo = _modo_multiplo(n_medico)
+    if agregados is None:
+        agregados = calcular_agregados(data_inicio, data_fim, min_d, max_d, n_medico, exm, min_tempo, max_tempo, min_dap, max_dap, sala, sexo, id_pac)
+    if modo_multiplo:
+        resultados = [(exame, medico, *_resumo_dose(acc)) for (exame, medico), acc in agregados["exame_medico"].items()]
+        resultados.sort(key=lambda r: (_texto_asc(r[0]), _texto_asc(r[1])))
+    else:
+        resultados = [(exame, *_resumo_dose(acc)) for exame, acc in agregados["exame"].items()]
+        resultados.sort(key=lambda r: _media_desc(r, 1))
+    return resultados, modo_multiplo
+
+@cache_filtros
+def calcular_media_tempo_exame(data_inicio, data_fim, min_d, max_d, n_medico, exm, min_tempo, max_tempo, min_dap, max_dap, sala, sexo, id_pac, agregados=None):
+    modo_multiplo = _modo_multiplo(n_medico)
+    if agregados is None:
+        agregados = calcular_agregados(data_inicio, data_fim, min_d, max_d, n_medico, exm, min_tempo, max_tempo, min_dap, max_dap, sala, sexo, id_pac)
+    if modo_multiplo:
+        resultados = [(exame, medico, *_resumo_tempo(acc)) for (exame, medico), acc in agregados["exame_medico"].items()]
+        resultados.sort(key=lambda r: (_texto_asc(r[0]), _texto_asc(r[1])))
+    else:
+        resultados = [(exame, *_resumo_tempo(acc)) for exame, acc in agregados["exame"].items()]
+        resultados.sort(key=lambda r: _media_desc(r, 1))
+    return resultados, modo_multiplo
+
+perfil.instrumentar(__name__)
@@ -0,0 +1,102 @@
+# core/cache.py
+import functools
+import threading
+from collections import OrderedDict
+from config import state
+
+# Contador de versão dos dados: toda escrita em exames incrementa e
+# invalida de uma vez tudo o que estava em cache
+_versao_dados = 0
+_trava = threading.Lock()
+_caches = {}
+
+# Chamada antes de cada consulta aos caches para notar escritas feitas por outros
+# processos (cli.py ingest, lote de relatórios); core/database registra a sua
+_conferir_externas = None
+
+def registrar_conferencia_externa(funcao):
+    global _conferir_externas
+    _conferir_externas = funcao
+
+def versao_dados():
+    """Versão atual dos dados, depois de conferir se outro processo alterou o banco."""
+    if _conferir_externas is not None: _conferir_externas()
+    return _versao_dados
+
+def incrementar_versao_dados():
+    global _versao_dados
+    with _trava:
+        _versao_dados += 1
+        for entrada in _caches.values():
+            entrada["itens"].clear()
+
+def normalizar(valor):
+    """Filtros vazios (None, '', espaços) viram '' e textos perdem espaços nas pontas."""
+    if valor is None: return ""
+    if isinstance(valor, (list, tuple)): return tuple(normalizar(v) for v in valor)
+    return str(valor).strip()
+
+def criar_cache(nome):
+    """Registra um cache LRU nomeado, limpo junto com os demais a cada nova versão dos dados."""
+    entrada = {"itens": OrderedDict(), "acertos": 0, "falhas": 0}
+    with _trava:
+        _caches[nome] = entrada
+    return entrada
+
+def consultar_cache(entrada, chave):
+    """Retorna (achou, valor) e conta o acerto ou a falha."""
+    with _trava:
+        if chave in entrada["itens"]:
+            entrada["acertos"] += 1
+            entrada["itens"].move_to_end(chave)
+            return True, entrada["itens"][chave]
+        entrada["falhas"] += 1
+        return False, None
+
+def guardar_cache(entrada, chave, valor, versao):
+    """Guarda o valor calculado na versão dos dados informada (descartado se ela já mudou)."""
+    with _trava:
+        if versao == _versao_dados:
+            entrada["itens"][chave] = valor
+            while len(entrada["itens"]) > state.tamanho_cache:
+                entrada["itens"].popitem(last=False)
+
+def cache_filtros(funcao):
+    """
+    Cache LRU para funções que recebem os filtros de montar_query_filtros.
+    A chave é (banco, versão dos dados, argumentos normalizados).
+    Chamadas com agregados pré-calculados não passam pelo cache.
+    """
+    entrada = criar_cache(f"{funcao.__module__}.{funcao.__name__}")
+
+    @functools.wraps(funcao)
+    def envoltorio(*args, **kwargs):
+        if kwargs.get("agregados") is not None or not state.FILE_PATH:
+            return funcao(*args, **kwargs)
+        versao = versao_dados()
+        chave = (state.FILE_PATH, versao, normalizar(args), tuple(sorted((k, normalizar(v)) for k, v in kwargs.items())))
+        achou, resultado = consultar_cache(entrada, chave)
+        if achou: return resultado
+        resultado = funcao(*args, **kwargs)
+        guardar_cache(entrada, chave, resultado, versao)
+        return resultado
+
+    return envoltorio
+
+def estatisticas_cache():
+    """Retorna {função: {acertos, falhas, entradas}} e o total em '_total'."""
+    with _trava:
+        stats = {nome: {"acertos": e["acertos"], "falhas": e["falhas"], "entradas": len(e["itens"])} for nome, e in _caches.items()}
+    stats["_total"] = {
+        "acertos": sum(s["acertos"] for s in stats.values()),
+        "falhas": sum(s["falhas"] for s in stats.values()),
+        "versao_dados": _versao_dados,
+    }
+    return stats
+
+def limpar_cache():
+    with _trava:
+        for entrada in _caches.values():
+            entrada["itens"].clear()
+            entrada["acertos"] = 0
+            entrada["falhas"] = 0
@@ -1,30 +1,401 @@
 # database.py
+import atexit
 import sqlite3
+import threading
+import time
+from contextlib import contextmanager
+from itertools import islice
 from config import state
+from core import perfil
+from core.cache import (cache_filtros, consultar_cache, criar_cache, guardar_cache, incrementar_versao_dados,
+                        registrar_conferencia_externa, versao_dados)
+from core.utils import converter_numero, converter_tempo_segundos
+
+SQL_CRIAR_EXAMES = """CREATE TABLE IF NOT EXISTS exames (
+    id INTEGER PRIMARY KEY AUTOINCREMENT,
+    data TEXT,
+    medico TEXT,
+    exam TEXT,
+    dose_mgy TEXT,
+    tempo TEXT,
+    dap TEXT,
+    paciente_id TEXT,
+    sexo TEXT,
+    sala TEXT,
+    dose_num REAL,
+    dap_num REAL,
+    tempo_seg REAL
+)"""
+
+# dose_num, dap_num e tempo_seg são cópias numéricas de dose_mgy, dap e tempo,
+# preenchidas em Python a cada inserção/edição (ver _com_colunas_numericas)
+SQL_INSERIR_EXAME = """INSERT INTO exames (data, medico, exam, dose_mgy, tempo, dap, paciente_id, sexo, sala, dose_num, dap_num, tempo_seg) VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?)"""
+
+# Manifesto da importação: um registro por SOPInstanceUID já visto, com o
+# caminho, tamanho e mtime do arquivo (exame_id fica vazio para não-SR)
+SQL_CRIAR_MANIFESTO = """CREATE TABLE IF NOT EXISTS arquivos_importados (
+    sop_instance_uid TEXT PRIMARY KEY,
+    caminho TEXT,
+    tamanho INTEGER,
+    mtime REAL,
+    modalidade TEXT,
+    exame_id INTEGER
+)"""
+
+SQL_REGISTRAR_ARQUIVO = """INSERT INTO arquivos_importados (sop_instance_uid, caminho, tamanho, mtime, modalidade, exame_id) VALUES (?, ?, ?, ?, ?, ?)
+    ON CONFLICT(sop_instance_uid) DO UPDATE SET caminho=excluded.caminho, tamanho=excluded.tamanho, mtime=excluded.mtime,
+    exame_id=COALESCE(excluded.exame_id, arquivos_importados.exame_id)"""
+
+# Arquivos da pasta de importação que não têm SOPInstanceUID para o manifesto
+# (não DICOM, DICOM sem UID): guardados por caminho para não serem reabertos
+# enquanto tamanho e mtime não mudarem. motivo é a etapa do pré-filtro.
+SQL_CRIAR_IGNORADOS = """CREATE TABLE IF NOT EXISTS arquivos_ignorados (
+    caminho TEXT PRIMARY KEY,
+    tamanho INTEGER,
+    mtime REAL,
+    motivo TEXT
+)"""
+
+SQL_REGISTRAR_IGNORADO = """INSERT INTO arquivos_ignorados (caminho, tamanho, mtime, motivo) VALUES (?, ?, ?, ?)
+    ON CONFLICT(caminho) DO UPDATE SET tamanho=excluded.tamanho, mtime=excluded.mtime, motivo=excluded.motivo"""
+
+# Eventos de irradiação de cada exame (um por contêiner de evento do RDSR).
+# Mesmas unidades de exames: dose_rp em mGy e dap com o fator de dap.
+COLUNAS_EVENTO = ["ordem", "tipo", "data_hora", "tipo_irradiacao", "dose_rp", "dap", "duracao", "kvp",
+                  "corrente_ma", "angulo_primario", "angulo_secundario", "ctdivol", "dlp"]
+
+SQL_CRIAR_EVENTOS = """CREATE TABLE IF NOT EXISTS eventos (
+    id INTEGER PRIMARY KEY,
+    exame_id INTEGER NOT NULL,
+    ordem INTEGER,
+    tipo TEXT,
+    data_hora TEXT,
+    tipo_irradiacao TEXT,
+    dose_rp REAL,
+    dap REAL,
+    duracao REAL,
+    kvp REAL,
+    corrente_ma REAL,
+    angulo_primario REAL,
+    angulo_secundario REAL,
+    ctdivol REAL,
+    dlp REAL
+)"""
+
+SQL_INSERIR_EVENTO = f"""INSERT INTO eventos (exame_id, {", ".join(COLUNAS_EVENTO)}) VALUES ({", ".join(["?"] * (len(COLUNAS_EVENTO) + 1))})"""
+
+# Resumo diário: uma linha por (dia, médico, exame, sala, sexo) com a contagem e
+# soma/mín/máx de dose, DAP e tempo. Mantido pelos gatilhos abaixo a cada INSERT,
+# UPDATE e DELETE em exames; analytics lê daqui quando os filtros só usam essas dimensões.
+MEDIDAS_RESUMO = {"dose": "dose_num", "dap": "dap_num", "tempo": "tempo_seg"}
+COLUNAS_RESUMO = ["dia", "medico", "exam", "sala", "sexo", "qtd"] + [
+    f"{estatistica}_{medida}" for medida in MEDIDAS_RESUMO for estatistica in ("n", "soma", "min", "max")
+]
+
+SQL_CRIAR_RESUMO = """CREATE TABLE IF NOT EXISTS resumo_diario (
+    dia TEXT,
+    medico TEXT,
+    exam TEXT,
+    sala TEXT,
+    sexo TEXT,
+    qtd INTEGER NOT NULL DEFAULT 0,
+    """ + ",\n    ".join(
+    f"n_{medida} INTEGER NOT NULL DEFAULT 0, soma_{medida} REAL NOT NULL DEFAULT 0, min_{medida} REAL, max_{medida} REAL"
+    for medida in MEDIDAS_RESUMO
+) + "\n)"
+
+# Mesmas colunas de COLUNAS_RESUMO, calculadas das linhas de exames
+SQL_CAMPOS_RESUMO = "date(data), medico, exam, sala, sexo, COUNT(*), " + ", ".join(
+    f"COUNT({coluna}), TOTAL({coluna}), MIN({coluna}), MAX({coluna})" for coluna in MEDIDAS_RESUMO.values()
+)
+
+def _chave_resumo(linha):
+    """Condição do grupo da linha NEW/OLD de exames em resumo_diario (IS: dimensões podem ser nulas)."""
+    return f"dia IS date({linha}.data) AND medico IS {linha}.medico AND exam IS {linha}.exam AND sala IS {linha}.sala AND sexo IS {linha}.sexo"
+
+def _recalcular_grupo(linha):
+    """Refaz o grupo da linha a partir de exames (mín/máx não podem ser desfeitos por subtração)."""
+    return f"""DELETE FROM resumo_diario WHERE {_chave_resumo(linha)};
+    INSERT INTO resumo_diario ({", ".join(COLUNAS_RESUMO)}) SELECT {SQL_CAMPOS_RESUMO} FROM exames
+        WHERE date(data) IS date({linha}.data) AND medico IS {linha}.medico AND exam IS {linha}.exam AND sala IS {linha}.sala AND sexo IS {linha}.sexo
+        GROUP BY date(data), medico, exam, sala, sexo;"""
+
+_somas_resumo = ", ".join(
+    f"n_{medida} = n_{medida} + (NEW.{coluna} IS NOT NULL), soma_{medida} = soma_{medida} + IFNULL(NEW.{coluna}, 0), "
+    f"min_{medida} = CASE WHEN NEW.{coluna} IS NULL OR NEW.{coluna} >= min_{medida} THEN min_{medida} ELSE NEW.{coluna} END, "
+    f"max_{medida} = CASE WHEN NEW.{coluna} IS NULL OR NEW.{coluna} <= max_{medida} THEN max_{medida} ELSE NEW.{coluna} END"
+    for medida, coluna in MEDIDAS_RESUMO.items()
+)
+
+GATILHOS_RESUMO = [
+    # Inserção: soma no grupo (criado vazio se ainda não existe)
+    f"""CREATE TRIGGER IF NOT EXISTS resumo_diario_inserir AFTER INSERT ON exames BEGIN
+    INSERT INTO resumo_diario (dia, medico, exam, sala, sexo) SELECT date(NEW.data), NEW.medico, NEW.exam, NEW.sala, NEW.sexo
+        WHERE NOT EXISTS (SELECT 1 FROM resumo_diario WHERE {_chave_resumo("NEW")});
+    UPDATE resumo_diario SET qtd = qtd + 1, {_somas_resumo} WHERE {_chave_resumo("NEW")};
+END""",
+    f"""CREATE TRIGGER IF NOT EXISTS resumo_diario_remover AFTER DELETE ON exames BEGIN
+    {_recalcular_grupo("OLD")}
+END""",
+    f"""CREATE TRIGGER IF NOT EXISTS resumo_diario_editar AFTER UPDATE OF data, medico, exam, sala, sexo, dose_num, dap_num, tempo_seg ON exames BEGIN
+    {_recalcular_grupo("OLD")}
+    {_recalcular_grupo("NEW")}
+END""",
+]
+
+# --- GERENCIADOR DE CONEXÕES ---
+# Cada thread reaproveita a sua conexão de leitura; toda escrita passa por uma
+# única conexão de escrita protegida por trava. Com WAL, as leituras do
+# dashboard não esperam uma importação em andamento.
+
+class _ConexaoPersistente(sqlite3.Connection):
+    """Conexão de vida longa: close() só desfaz uma transação aberta."""
+    def close(self):
+        if self.in_transaction:
+            self.rollback()
+
+    def fechar(self):
+        super().close()
+
+class _CursorPerfilado(sqlite3.Cursor):
+    """Cursor das conexões abertas com o perfil ligado: cada execute vai para perfil.registrar_sql."""
+    def execute(self, sql, parametros=()):
+        inicio = time.perf_counter()
+        try:
+            return super().execute(sql, parametros)
+        finally:
+            perfil.registrar_sql(self.connection, sql, parametros, inicio, time.perf_counter())
+
+    def executemany(self, sql, parametros):
+        inicio = time.perf_counter()
+        try:
+            return super().executemany(sql, parametros)
+        finally:
+            perfil.registrar_sql(self.connection, sql, None, inicio, time.perf_counter(), linhas=self.rowcount)
+
+class _ConexaoPerfilada(_ConexaoPersistente):
+    def cursor(self, factory=_CursorPerfilado):
+        return super().cursor(factory)
+
+    def execute(self, sql, parametros=()):
+        return self.cursor().execute(sql, parametros)
+
+    def executemany(self, sql, parametros):
+        return self.cursor().executemany(sql, parametros)
+
+_locais = threading.local()
+_abertas = []
+_trava_abertas = threading.Lock()
+_trava_escrita = threading.RLock()
+_escritor = None
+
+def _abrir_conexao(caminho, escrita=False):
+    fabrica = _ConexaoPerfilada if perfil.ativo() else _ConexaoPersistente
+    conn = sqlite3.connect(caminho, factory=fabrica, check_same_thread=not escrita, timeout=30)
+    for nome, valor in state.pragmas_sqlite.items():
+        if nome == "journal_mode" and not escrita: continue
+        conn.execute(f"PRAGMA {nome} = {valor}")
+    with _trava_abertas:
+        _abertas.append(conn)
+    return conn
+
+def abrir_banco(caminho):
+    """Troca o banco ativo: fecha as conexões antigas e abre a de escrita com os pragmas configurados."""
+    global _escritor
+    fechar_conexoes()
+    state.FILE_PATH = caminho
+    with _trava_escrita:
+        _escritor = _abrir_conexao(caminho, escrita=True)
+        _escritor.caminho = caminho
+
+def fechar_conexoes():
+    global _escritor
+    with _trava_escrita:
+        with _trava_abertas:
+            for conn in _abertas:
+                try:
+                    conn.fechar()
+                except Exception:
+                    pass
+            _abertas.clear()
+        _escritor = None
+    _locais.__dict__.clear()
+
+atexit.register(fechar_conexoes)
 
 def conectar():
+    """Conexão de leitura da thread atual (reaberta se o banco ativo mudou)."""
     if not state.FILE_PATH: 
         return None
-    return sqlite3.connect(state.FILE_PATH)
+    conn = getattr(_locais, "conexao", None)
+    if conn is None or _locais.caminho != state.FILE_PATH:
+        if conn is not None:
+            conn.fechar()
+            with _trava_abertas:
+                if conn in _abertas: _abertas.remove(conn)
+        conn = _abrir_conexao(state.FILE_PATH)
+        _locais.conexao, _locais.caminho = conn, state.FILE_PATH
+    return conn
+
+def _conferir_escritas_externas():
+    """
+    PRAGMA data_version da conexão de escrita só muda quando outra conexão faz commit
+    no banco (outro processo: cli.py ingest, lote de relatórios). Nesse caso os caches
+    são descartados. Se a conexão de escrita está ocupada, quem escreve é este processo.
+    """
+    if not _trava_escrita.acquire(blocking=False): return
+    try:
+        if _escritor is None or _escritor.caminho != state.FILE_PATH: return
+        # Cursor base do sqlite3: a conferência não aparece no perfil
+        versao = sqlite3.Cursor(_escritor).execute("PRAGMA data_version").fetchone()[0]
+        anterior = getattr(_escritor, "data_version", None)
+        _escritor.data_version = versao
+    except sqlite3.Error:
+        return
+    finally:
+        _trava_escrita.release()
+    if anterior is not None and versao != anterior:
+        _dados_alterados()
+
+registrar_conferencia_externa(_conferir_escritas_externas)
+
+@contextmanager
+def escrita():
+    """
+    Conexão de escrita exclusiva (uma thread por vez).
+    Faz commit ao sair do bloco e rollback se houver exceção; entrega None sem banco ativo.
+    """
+    global _escritor
+    with _trava_escrita:
+        if not state.FILE_PATH:
+            yield None
+            return
+        if _escritor is None or _escritor.caminho != state.FILE_PATH:
+            if _escritor is not None: _escritor.fechar()
+            _escritor = _abrir_conexao(state.FILE_PATH, escrita=True)
+            _escritor.caminho = state.FILE_PATH
+        try:
+            yield _escritor
+            _escritor.commit()
+        except BaseException:
+            _escritor.rollback()
+            raise
+
+def _valor_numerico(valor, conversor):
+    """Como o CAST do SQL antigo: NULL continua NULL e texto vazio ou inválido conta como 0 nas médias e no mínimo."""
+    if valor is None: return None
+    numero = conversor(valor)
+    return 0.0 if numero is None else numero
+
+def _com_colunas_numericas(dados):
+    """Acrescenta (dose_num, dap_num, tempo_seg) à tupla (data, medico, exam, dose, tempo, dap, ...)."""
+    dados = tuple(dados)
+    return dados + (_valor_numerico(dados[3], converter_numero), _valor_numerico(dados[5], converter_numero),
+                    _valor_numerico(dados[4], converter_tempo_segundos))
+
+# --- MIGRAÇÕES (versão guardada em PRAGMA user_version) ---
+
+def _migracao_colunas_numericas(conn, tamanho_lote=5000):
+    cursor = conn.cursor()
+    existentes = {r[1] for r in cursor.execute("PRAGMA table_info(exames)")}
+    for coluna in ("dose_num", "dap_num", "tempo_seg"):
+        if coluna not in existentes:
+            cursor.execute(f"ALTER TABLE exames ADD COLUMN {coluna} REAL")
+    conn.commit()
+
+    ultimo_id = 0
+    while True:
+        cursor.execute("SELECT rowid, dose_mgy, dap, tempo FROM exames WHERE rowid > ? ORDER BY rowid LIMIT ?", (ultimo_id, tamanho_lote))
+        linhas = cursor.fetchall()
+        if not linhas: break
+        cursor.executemany("UPDATE exames SET dose_num=?, dap_num=?, tempo_seg=? WHERE rowid=?", [
+            (_valor_numerico(dose, converter_numero), _valor_numerico(dap, converter_numero),
+             _valor_numerico(tempo, converter_tempo_segundos), rowid)
+            for rowid, dose, dap, tempo in linhas
+        ])
+        conn.commit()
+        ultimo_id = linhas[-1][0]
+
+def _migracao_resumo_diario(conn):
+    """Cria resumo_diario, preenche com os exames existentes e liga os gatilhos."""
+    conn.execute(SQL_CRIAR_RESUMO)
+    conn.execute("DELETE FROM resumo_diario")
+    conn.execute(f"""INSERT INTO resumo_diario ({", ".join(COLUNAS_RESUMO)})
+        SELECT {SQL_CAMPOS_RESUMO} FROM exames GROUP BY date(data), medico, exam, sala, sexo""")
+    for gatilho in GATILHOS_RESUMO:
+        conn.execute(gatilho)
+    conn.commit()
+
+def _migracao_vazios_como_zero(conn):
+    """Bancos migrados com vazios como NULL: passam a 0, como o CAST do SQL antigo, e o resumo é refeito."""
+    # Sem o gatilho de edição: o resumo inteiro é refeito no fim, não grupo a grupo
+    conn.execute("DROP TRIGGER IF EXISTS resumo_diario_editar")
+    for coluna, origem in (("dose_num", "dose_mgy"), ("dap_num", "dap"), ("tempo_seg", "tempo")):
+        conn.execute(f"UPDATE exames SET {coluna} = 0 WHERE {coluna} IS NULL AND {origem} IS NOT NULL")
+    _migracao_resumo_diario(conn)
+
+MIGRACOES = [
+    (1, _migracao_colunas_numericas),
+    (2, _migracao_resumo_diario),
+    (3, _migracao_vazios_como_zero),
+]
+
+def aplicar_migracoes():
+    """Aplica, em ordem, as migrações com versão maior que a do arquivo."""
+    try:
+        with escrita() as conn:
+            if not conn: return False
+            versao = conn.execute("PRAGMA user_version").fetchone()[0]
+            for numero, migracao in MIGRACOES:
+                if numero <= versao: continue
+                migracao(conn)
+                conn.execute(f"PRAGMA user_version = {int(numero)}")
+                conn.commit()
+        return True
+    except Exception as e:
+        print(f"Erro Migração: {e}")
+        return False
+
+def preparar_banco():
+    """Cria as tabelas (exames, eventos e manifesto da importação), aplica as migrações pendentes e cria os índices."""
+    try:
+        with escrita() as conn:
+            if not conn: return False
+            conn.execute(SQL_CRIAR_EXAMES)
+            conn.execute(SQL_CRIAR_EVENTOS)
+            conn.execute(SQL_CRIAR_MANIFESTO)
+            conn.execute(SQL_CRIAR_IGNORADOS)
+    except Exception as e:
+        print(f"Erro ao preparar banco: {e}")
+        return False
+    _dados_alterados()
+    sucesso = aplicar_migracoes()
+    criar_indices()
+    return sucesso
+
+# Nomes dos filtros para relatórios em lote e linha de comando, na ordem de montar_query_filtros
+CAMPOS_FILTRO = ["data_inicio", "data_fim", "min_dose", "max_dose", "medico", "exame", "min_tempo", "max_tempo",
+                 "min_dap", "max_dap", "sala", "sexo", "id_paciente"]
 
 def montar_query_filtros(data_inicio, data_fim, min_d, max_d, n_medico, exm, min_tempo, max_tempo, min_dap, max_dap, sala, sexo, id_pac):
     sql_base = " FROM exames WHERE 1=1"
     params = []
 
+    # Comparação direta com a coluna (sem date()) para o índice de data ser usado
     if data_inicio and data_fim:
-        sql_base += " AND date(data) BETWEEN ? AND ?"
+        sql_base += " AND data >= ? AND data < date(?, '+1 day')"
         params.extend([data_inicio, data_fim])
     elif data_inicio:
-        sql_base += " AND date(data) >= ?"
+        sql_base += " AND data >= ?"
         params.append(data_inicio)
 
     if min_d and str(min_d).strip():
-        sql_base += " AND CAST(REPLACE(dose_mgy, ',', '.') AS REAL) >= ?"
-        params.append(min_d)
+        sql_base += " AND dose_num >= ?"
+        params.append(converter_numero(min_d))
     
     if max_d and str(max_d).strip():
-        sql_base += " AND CAST(REPLACE(dose_mgy, ',', '.') AS REAL) <= ?"
-        params.append(max_d)
+        sql_base += " AND dose_num <= ?"
+        params.append(converter_numero(max_d))
     
     if n_medico and str(n_medico).strip():
         entrada_medico = str(n_medico).strip()
@@ -43,35 +414,92 @@ def montar_query_filtros(data_inicio, data_fim, min_d, max_d, n_medico, exm, min
         params.append(str(exm).strip())
 
     if min_tempo and str(min_tempo).strip():
-        sql_base += " AND tempo >= ?"
-        params.append(min_tempo)
+        sql_base += " AND tempo_seg >= ?"
+        params.append(converter_tempo_segundos(min_tempo))
 
     if max_tempo and str(max_tempo).strip():
-        sql_base += " AND tempo <= ?"
-        params.append(max_tempo)
+        sql_base += " AND tempo_seg <= ?"
+        params.append(converter_tempo_segundos(max_tempo))
 
     if min_dap and str(min_dap).strip():
-        sql_base += " AND CAST(dap AS REAL) >= ?"
-        params.append(min_dap)
+        sql_base += " AND dap_num >= ?"
+        params.append(converter_numero(min_dap))
 
     if max_dap and str(max_dap).strip():
-        sql_base += " AND CAST(dap AS REAL) <= ?"
-        params.append(max_dap)
+        sql_base += " AND dap_num <= ?"
+        params.append(converter_numero(max_dap))
 
     if sala and str(sala).strip():
         sql_base += " AND sala == ?"
-        params.append(sala)
+        params.append(str(sala).strip())
 
     if sexo and str(sexo).strip():
         sql_base += " AND sexo = ?"
-        params.append(sexo)
+        params.append(str(sexo).strip())
 
     if id_pac and str(id_pac).strip():
         sql_base += " AND paciente_id = ?" 
-        params.append(id_pac)
+        params.append(str(id_pac).strip())
     
     return sql_base, params
 
+def montar_query_resumo(data_inicio, data_fim, n_medico, exm, sala, sexo):
+    """Mesmo recorte de montar_query_filtros sobre resumo_diario (só período, médico, exame, sala e sexo)."""
+    sql_base = " FROM resumo_diario WHERE 1=1"
+    params = []
+
+    # dia = date(data): data >= início e data < fim + 1 dia equivalem a comparar o dia
+    if data_inicio and data_fim:
+        sql_base += " AND dia >= ? AND dia <= ?"
+        params.extend([data_inicio, data_fim])
+    elif data_inicio:
+        sql_base += " AND dia >= ?"
+        params.append(data_inicio)
+
+    if n_medico and str(n_medico).strip():
+        entrada_medico = str(n_medico).strip()
+        if ";" in entrada_medico:
+            lista_medicos = [m.strip() for m in entrada_medico.split(";") if m.strip()]
+            if lista_medicos:
+                sql_base += f" AND medico IN ({','.join(['?'] * len(lista_medicos))})"
+                params.extend(lista_medicos)
+        else:
+            sql_base += " AND medico = ?"
+            params.append(entrada_medico)
+
+    if exm and str(exm).strip():
+        sql_base += " AND exam = ?"
+        params.append(str(exm).strip())
+
+    if sala and str(sala).strip():
+        sql_base += " AND sala = ?"
+        params.append(str(sala).strip())
+
+    if sexo and str(sexo).strip():
+        sql_base += " AND sexo = ?"
+        params.append(str(sexo).strip())
+
+    return sql_base, params
+
+# Total de registros por filtro, para não recontar a cada troca de página.
+# LRU do core.cache (limite state.tamanho_cache), limpo sempre que a tabela exames é alterada.
+_cache_contagem = criar_cache("core.database.contagem")
+
+def _dados_alterados():
+    """Chamada após toda escrita em exames: descarta contagens e resultados em cache."""
+    incrementar_versao_dados()
+
+def _contar(cursor, sql_where, params):
+    versao = versao_dados()
+    chave = (state.FILE_PATH, sql_where, tuple(params))
+    achou, total = consultar_cache(_cache_contagem, chave)
+    if achou: return total
+    cursor.execute(f"SELECT COUNT(*) {sql_where}", params)
+    total = cursor.fetchone()[0]
+    guardar_cache(_cache_contagem, chave, total, versao)
+    return total
+
+@cache_filtros
 def carregar_dados_banco(data_inicio, data_fim, min_d, max_d, n_medico, exm, min_tempo, max_tempo, min_dap, max_dap, sala, sexo, id_pac, limit=15, offset=0):
     dados = []
     total_registros = 0
@@ -82,10 +510,9 @@ def carregar_dados_banco(data_inicio, data_fim, min_d, max_d, n_medico, exm, min
         
         sql_where, params = montar_query_filtros(data_inicio, data_fim, min_d, max_d, n_medico, exm, min_tempo, max_tempo, min_dap, max_dap, sala, sexo, id_pac)
         
-        cursor.execute(f"SELECT COUNT(*) {sql_where}", params)
-        total_registros = cursor.fetchone()[0]
+        total_registros = _contar(cursor, sql_where, params)
 
-        sql_dados = f"SELECT rowid, data, medico, exam, dose_mgy, tempo, dap, paciente_id, sexo, sala {sql_where} ORDER BY data DESC LIMIT ? OFFSET ?"
+        sql_dados = f"SELECT rowid, data, medico, exam, dose_mgy, tempo, dap, paciente_id, sexo, sala {sql_where} ORDER BY data DESC, rowid DESC LIMIT ? OFFSET ?"
         
         params_dados = params.copy()
         params_dados.extend([limit, offset])
@@ -98,57 +525,285 @@ def carregar_dados_banco(data_inicio, data_fim, min_d, max_d, n_medico, exm, min
     
     return dados, total_registros
 
-def criar_indices():
+@cache_filtros
+def carregar_pagina_cursor(data_inicio, data_fim, min_d, max_d, n_medico, exm, min_tempo, max_tempo, min_dap, max_dap, sala, sexo, id_pac, limit=15, cursor_pagina=None, direcao="proxima"):
+    """
+    Paginação por cursor (keyset) em ordem de data DESC, rowid DESC.
+    cursor_pagina é o par (data, rowid) da linha de referência:
+    "proxima" traz as linhas depois dela, "anterior" as linhas antes dela.
+    Sem cursor, traz a primeira página. Retorna (dados, total_registros).
+    """
+    dados = []
+    total_registros = 0
     try:
         conn = conectar()
-        if not conn: return
+        if not conn: return dados, total_registros
         cursor = conn.cursor()
-        cursor.execute("CREATE INDEX IF NOT EXISTS idx_data ON exames(data)")
-        cursor.execute("CREATE INDEX IF NOT EXISTS idx_medico ON exames(medico)")
-        cursor.execute("CREATE INDEX IF NOT EXISTS idx_exam ON exames(exam)")
-        conn.commit()
+
+        sql_where, params = montar_query_filtros(data_inicio, data_fim, min_d, max_d, n_medico, exm, min_tempo, max_tempo, min_dap, max_dap, sala, sexo, id_pac)
+        total_registros = _contar(cursor, sql_where, params)
+
+        campos = "rowid, data, medico, exam, dose_mgy, tempo, dap, paciente_id, sexo, sala"
+        params_dados = params.copy()
+        if cursor_pagina is None:
+            sql_dados = f"SELECT {campos} {sql_where} ORDER BY data DESC, rowid DESC LIMIT ?"
+        elif direcao == "anterior":
+            sql_dados = f"SELECT {campos} {sql_where} AND (data, rowid) > (?, ?) ORDER BY data ASC, rowid ASC LIMIT ?"
+            params_dados.extend(cursor_pagina)
+        else:
+            sql_dados = f"SELECT {campos} {sql_where} AND (data, rowid) < (?, ?) ORDER BY data DESC, rowid DESC LIMIT ?"
+            params_dados.extend(cursor_pagina)
+        params_dados.append(limit)
+
+        cursor.execute(sql_dados, params_dados)
+        dados = cursor.fetchall()
+        if cursor_pagina is not None and direcao == "anterior":
+            dados.reverse()
         conn.close()
+    except Exception as e:
+        print(f"Erro SQL Página: {e}")
+
+    return dados, total_registros
+
+# Índices pensados para as combinações de filtro que a interface envia
+# (nome, definição, consulta atendida)
+INDICES = [
+    ("idx_data", "exames(data)", "período e paginação por data"),
+    ("idx_data_medico", "exames(data, medico)", "evolução temporal por médico no período"),
+    ("idx_dia_medico", "exames(date(data), medico)", "GROUP BY date(data), medico sem filtro de período"),
+    ("idx_medico_data", "exames(medico, data, dose_num, tempo_seg)", "filtro de médico + período, médias por médico"),
+    ("idx_exam_medico", "exames(exam, medico, dose_num, tempo_seg)", "médias por exame/médico"),
+    ("idx_sala_data", "exames(sala, data)", "filtro de sala + período"),
+    ("idx_sexo_data", "exames(sexo, data)", "filtro de sexo + período"),
+    ("idx_paciente", "exames(paciente_id)", "busca por paciente"),
+    ("idx_dose_num", "exames(dose_num)", "faixa de dose e top 10"),
+    ("idx_dap_num", "exames(dap_num)", "faixa de DAP"),
+    ("idx_tempo_seg", "exames(tempo_seg)", "faixa de tempo"),
+    ("idx_eventos_exame", "eventos(exame_id, ordem)", "eventos de um exame ao abrir a linha"),
+    ("idx_resumo_diario", "resumo_diario(dia, medico, exam, sala, sexo)", "gatilhos do resumo diário e dashboard por período"),
+    ("idx_arquivos_exame", "arquivos_importados(exame_id)", "SOPInstanceUID de cada exame na exportação Parquet"),
+]
+
+# Índices antigos cobertos pelo prefixo dos compostos acima
+INDICES_OBSOLETOS = ["idx_medico", "idx_exam"]
+
+def criar_indices():
+    try:
+        with escrita() as conn:
+            if not conn: return
+            cursor = conn.cursor()
+            for nome, definicao, _ in INDICES:
+                cursor.execute(f"CREATE INDEX IF NOT EXISTS {nome} ON {definicao}")
+            for nome in INDICES_OBSOLETOS:
+                cursor.execute(f"DROP INDEX IF EXISTS {nome}")
+            # Atualiza as estatísticas (amostradas) para o planejador escolher entre os índices
+            cursor.execute("PRAGMA analysis_limit = 1000")
+            cursor.execute("ANALYZE")
     except Exception as e:
         print(f"Erro ao criar índices: {e}")
 
-def inserir_exame(dados):
+def _filtros_exemplo(**valores):
+    campos = ["data_inicio", "data_fim", "min_d", "max_d", "n_medico", "exm", "min_tempo", "max_tempo", "min_dap", "max_dap", "sala", "sexo", "id_pac"]
+    return [valores.get(c, "") for c in campos]
+
+# Consultas de referência da interface e o índice que cada uma deve usar
+CONSULTAS_REFERENCIA = [
+    ("tabela por período", _filtros_exemplo(data_inicio="2024-01-01", data_fim="2024-01-31"),
+     "SELECT rowid {where} ORDER BY data DESC, rowid DESC LIMIT 100", "idx_data"),
+    ("evolução por médico no período", _filtros_exemplo(data_inicio="2024-01-01", data_fim="2024-12-31", n_medico="1;2"),
+     "SELECT date(data), medico, COUNT(*) {where} GROUP BY date(data), medico", "idx_medico_data"),
+    ("evolução de todos os médicos", _filtros_exemplo(),
+     "SELECT date(data), medico, COUNT(*) {where} GROUP BY date(data), medico", "idx_dia_medico"),
+    ("média por médico", _filtros_exemplo(n_medico="1"),
+     "SELECT medico, AVG(dose_num), COUNT(*) {where} GROUP BY medico", "idx_medico_data"),
+    ("média por exame e médico", _filtros_exemplo(),
+     "SELECT exam, medico, AVG(dose_num), AVG(tempo_seg) {where} GROUP BY exam, medico", "idx_exam_medico"),
+    ("sala no período", _filtros_exemplo(data_inicio="2024-01-01", data_fim="2024-01-31", sala="SALA"),
+     "SELECT rowid {where}", "idx_sala_data"),
+    ("sexo no período", _filtros_exemplo(data_inicio="2024-01-01", data_fim="2024-01-31", sexo="F"),
+     "SELECT rowid {where}", "idx_sexo_data"),
+    ("paciente", _filtros_exemplo(id_pac="123"), "SELECT rowid {where}", "idx_paciente"),
+    ("faixa de dose", _filtros_exemplo(min_d="4000", max_d="4100"), "SELECT rowid {where}", "idx_dose_num"),
+]
+
+def verificar_indices():
+    """
+    Roda EXPLAIN QUERY PLAN nas consultas de referência.
+    Retorna uma lista de (descricao, indice_esperado, plano, usou_esperado).
+    """
+    relatorio = []
     try:
         conn = conectar()
-        if not conn: return False
+        if not conn: return relatorio
         cursor = conn.cursor()
-        sql_create = """CREATE TABLE IF NOT EXISTS exames (
-            id INTEGER PRIMARY KEY AUTOINCREMENT,
-            data TEXT,
-            medico TEXT,
-            exam TEXT,
-            dose_mgy TEXT,
-            tempo TEXT,
-            dap TEXT,
-            paciente_id TEXT,
-            sexo TEXT,
-            sala TEXT
-        )"""
-        cursor.execute(sql_create)
-        sql = """INSERT INTO exames (data, medico, exam, dose_mgy, tempo, dap, paciente_id, sexo, sala) VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?)"""
-        cursor.execute(sql, dados)
-        conn.commit()
+        for descricao, filtros, modelo, esperado in CONSULTAS_REFERENCIA:
+            sql_where, params = montar_query_filtros(*filtros)
+            cursor.execute("EXPLAIN QUERY PLAN " + modelo.format(where=sql_where), params)
+            plano = " | ".join(r[3] for r in cursor.fetchall())
+            relatorio.append((descricao, esperado, plano, f"INDEX {esperado} " in plano + " "))
         conn.close()
+    except Exception as e:
+        print(f"Erro ao verificar índices: {e}")
+    return relatorio
+
+def inserir_exame(dados):
+    try:
+        with escrita() as conn:
+            if not conn: return False
+            cursor = conn.cursor()
+            cursor.execute(SQL_CRIAR_EXAMES)
+            cursor.execute(SQL_INSERIR_EXAME, _com_colunas_numericas(dados))
+        _dados_alterados()
         return True
     except Exception as e: 
         print(f"Erro Insert: {e}")
         return False
 
-def deletar_exame(id_row):
+def inserir_exames_lote(registros, tamanho_lote=None, manifesto=None, eventos=None):
+    """
+    Insere vários exames com executemany, um commit por lote.
+    manifesto (opcional) é uma lista alinhada com registros de tuplas
+    (sop_instance_uid, caminho, tamanho, mtime, modalidade), gravada na mesma transação.
+    eventos (opcional) é uma lista alinhada com registros; cada item é a lista de
+    eventos do exame, tuplas na ordem de COLUNAS_EVENTO.
+    Retorna (inseridos, falhas, relatorio), onde relatorio traz linhas e tempo de cada commit.
+    """
+    inseridos = 0
+    falhas = 0
+    relatorio = []
+    if tamanho_lote is None:
+        tamanho_lote = state.tamanho_lote_insercao
+
+    registros = iter(registros)
+    manifesto = iter(manifesto) if manifesto is not None else None
+    eventos = iter(eventos) if eventos is not None else None
+    try:
+        with escrita() as conn:
+            if not conn:
+                falhas = sum(1 for _ in registros)
+                return inseridos, falhas, relatorio
+            cursor = conn.cursor()
+            cursor.execute(SQL_CRIAR_EXAMES)
+            cursor.execute(SQL_CRIAR_MANIFESTO)
+            cursor.execute(SQL_CRIAR_EVENTOS)
+            conn.commit()
+
+            while True:
+                lote = list(islice(registros, tamanho_lote))
+                if not lote: break
+                lote_manifesto = list(islice(manifesto, len(lote))) if manifesto is not None else []
+                lote_eventos = list(islice(eventos, len(lote))) if eventos is not None else []
+                inicio = time.perf_counter()
+                try:
+                    cursor.executemany(SQL_INSERIR_EXAME, [_com_colunas_numericas(d) for d in lote])
+                    if lote_manifesto or lote_eventos:
+                        # Um único escritor dentro da transação: os ids saem em sequência até last_insert_rowid()
+                        ultimo_id = cursor.execute("SELECT last_insert_rowid()").fetchone()[0]
+                        primeiro_id = ultimo_id - len(lote) + 1
+                        cursor.executemany(SQL_REGISTRAR_ARQUIVO, [
+                            (*item, primeiro_id + i) for i, item in enumerate(lote_manifesto) if item
+                        ])
+                        cursor.executemany(SQL_INSERIR_EVENTO, (
+                            (primeiro_id + i, *evento) for i, lista in enumerate(lote_eventos) if lista for evento in lista
+                        ))
+                    conn.commit()
+                    _dados_alterados()
+                    inseridos += len(lote)
+                except Exception as e:
+                    conn.rollback()
+                    falhas += len(lote)
+                    print(f"Erro Insert Lote: {e}")
+                    continue
+                relatorio.append({"linhas": len(lote), "segundos": time.perf_counter() - inicio})
+    except Exception as e:
+        print(f"Erro Insert Lote: {e}")
+
+    return inseridos, falhas, relatorio
+
+def carregar_manifesto():
+    """
+    Retorna ({caminho: (tamanho, mtime)}, {uids com exame gravado}) do manifesto de importação,
+    incluindo os arquivos ignorados. Se um caminho aparece nas duas tabelas, vale o mtime mais novo.
+    """
+    arquivos = {}
+    uids_gravados = set()
     try:
+        with escrita() as conn:
+            if not conn: return arquivos, uids_gravados
+            conn.execute(SQL_CRIAR_MANIFESTO)
+            conn.execute(SQL_CRIAR_IGNORADOS)
+            conn.execute("CREATE INDEX IF NOT EXISTS idx_arquivos_caminho ON arquivos_importados(caminho)")
         conn = conectar()
-        if not conn: return False
         cursor = conn.cursor()
-        cursor.execute("DELETE FROM exames WHERE rowid = ?", (id_row,))
-        if cursor.rowcount == 0: 
-            conn.close()
-            return False 
-        conn.commit()
+        cursor.execute("SELECT sop_instance_uid, caminho, tamanho, mtime, exame_id FROM arquivos_importados")
+        for uid, caminho, tamanho, mtime, exame_id in cursor:
+            if caminho is not None:
+                arquivos[caminho] = (tamanho, mtime)
+            if exame_id is not None:
+                uids_gravados.add(uid)
+        cursor.execute("SELECT caminho, tamanho, mtime FROM arquivos_ignorados")
+        for caminho, tamanho, mtime in cursor:
+            anterior = arquivos.get(caminho)
+            if anterior is None or (mtime or 0) >= (anterior[1] or 0):
+                arquivos[caminho] = (tamanho, mtime)
+        conn.close()
+    except Exception as e:
+        print(f"Erro Manifesto: {e}")
+    return arquivos, uids_gravados
+
+# Mesmo exame já gravado: compara as colunas normalizadas (as que o Parquet exporta)
+SQL_EXAME_GRAVADO = """SELECT 1 FROM exames WHERE paciente_id IS ? AND substr(data, 1, 10) = ? AND medico IS ? AND exam IS ?
+    AND dose_num IS ? AND tempo IS ? AND dap_num IS ? AND sexo IS ? AND sala IS ? LIMIT 1"""
+
+def exames_ja_gravados(registros):
+    """
+    Para exames sem SOPInstanceUID (ex.: importados de Parquet), diz quais já estão
+    em exames com os mesmos valores. Retorna uma lista de bool alinhada com registros.
+    """
+    gravados = []
+    try:
+        conn = conectar()
+        if not conn: return [False] * len(registros)
+        cursor = conn.cursor()
+        for dados in registros:
+            data, medico, exam, _, tempo, _, paciente_id, sexo, sala, dose_num, dap_num, _ = _com_colunas_numericas(dados)
+            cursor.execute(SQL_EXAME_GRAVADO, (paciente_id, str(data)[:10], medico, exam, dose_num, tempo, dap_num, sexo, sala))
+            gravados.append(cursor.fetchone() is not None)
         conn.close()
+    except Exception as e:
+        print(f"Erro Exames Gravados: {e}")
+        return [False] * len(registros)
+    return gravados
+
+def registrar_arquivos(itens, ignorados=()):
+    """
+    Grava no manifesto arquivos que não geraram exame novo (não-SR ou SR repetido).
+    ignorados são tuplas (caminho, tamanho, mtime, motivo) dos arquivos sem SOPInstanceUID.
+    """
+    try:
+        with escrita() as conn:
+            if not conn: return False
+            cursor = conn.cursor()
+            cursor.execute(SQL_CRIAR_MANIFESTO)
+            cursor.execute(SQL_CRIAR_IGNORADOS)
+            cursor.executemany(SQL_REGISTRAR_ARQUIVO, [(*item, None) for item in itens])
+            cursor.executemany(SQL_REGISTRAR_IGNORADO, ignorados)
+        return True
+    except Exception as e:
+        print(f"Erro Manifesto: {e}")
+        return False
+
+def deletar_exame(id_row):
+    try:
+        with escrita() as conn:
+            if not conn: return False
+            cursor = conn.cursor()
+            cursor.execute("DELETE FROM exames WHERE rowid = ?", (id_row,))
+            if cursor.rowcount == 0: 
+                return False 
+            cursor.execute(SQL_CRIAR_EVENTOS)
+            cursor.execute("DELETE FROM eventos WHERE exame_id = ?", (id_row,))
+        _dados_alterados()
         return True
     except Exception as e: 
         print(f"Erro Delete: {e}")
@@ -167,17 +822,33 @@ def buscar_exame_por_id(id_row):
         print(f"Erro Busca ID: {e}")
         return None
 
-def atualizar_exame(id_row, dados):
+def carregar_eventos_exame(id_row):
+    """
+    Eventos de irradiação de um exame, em ordem, como dicts com as chaves de COLUNAS_EVENTO.
+    Lido só quando a linha é aberta, para não pesar na listagem.
+    """
+    eventos = []
     try:
         conn = conectar()
-        if not conn: return False
+        if not conn: return eventos
         cursor = conn.cursor()
-        sql = """UPDATE exames SET data=?, medico=?, exam=?, dose_mgy=?, tempo=?, dap=?, paciente_id=?, sexo=?, sala=? WHERE rowid=?"""
-        params = list(dados)
-        params.append(id_row)
-        cursor.execute(sql, params)
-        conn.commit()
+        cursor.execute(f"SELECT {', '.join(COLUNAS_EVENTO)} FROM eventos WHERE exame_id = ? ORDER BY ordem", (id_row,))
+        eventos = [dict(zip(COLUNAS_EVENTO, linha)) for linha in cursor.fetchall()]
         conn.close()
+    except Exception as e:
+        print(f"Erro Eventos: {e}")
+    return eventos
+
+def atualizar_exame(id_row, dados):
+    try:
+        with escrita() as conn:
+            if not conn: return False
+            cursor = conn.cursor()
+            sql = """UPDATE exames SET data=?, medico=?, exam=?, dose_mgy=?, tempo=?, dap=?, paciente_id=?, sexo=?, sala=?, dose_num=?, dap_num=?, tempo_seg=? WHERE rowid=?"""
+            params = list(_com_colunas_numericas(dados))
+            params.append(id_row)
+            cursor.execute(sql, params)
+        _dados_alterados()
         return True
     except Exception as e: 
         print(f"Erro Update: {e}")
@@ -186,20 +857,18 @@ def atualizar_exame(id_row, dados):
 def inicializar_tipos_exames():
     padroes = []
     try:
-        conn = conectar()
-        if not conn: return padroes    
-        cursor = conn.cursor()
-        cursor.execute("CREATE TABLE IF NOT EXISTS tipos_exames (nome TEXT PRIMARY KEY)")
-        
-        cursor.execute("SELECT COUNT(*) FROM tipos_exames")
-        if cursor.fetchone()[0] == 0:
-            for item in padroes:
-                cursor.execute("INSERT INTO tipos_exames (nome) VALUES (?)", (item,))
-            conn.commit()
-        
-        cursor.execute("SELECT nome FROM tipos_exames ORDER BY nome")
-        lista = [r[0] for r in cursor.fetchall()]
-        conn.close()
+        with escrita() as conn:
+            if not conn: return padroes    
+            cursor = conn.cursor()
+            cursor.execute("CREATE TABLE IF NOT EXISTS tipos_exames (nome TEXT PRIMARY KEY)")
+            
+            cursor.execute("SELECT COUNT(*) FROM tipos_exames")
+            if cursor.fetchone()[0] == 0:
+                for item in padroes:
+                    cursor.execute("INSERT INTO tipos_exames (nome) VALUES (?)", (item,))
+            
+            cursor.execute("SELECT nome FROM tipos_exames ORDER BY nome")
+            lista = [r[0] for r in cursor.fetchall()]
         return lista
     except Exception as e:
         print(f"Erro init exames: {e}")
@@ -207,43 +876,37 @@ def inicializar_tipos_exames():
 
 def adicionar_tipo_exame_db(novo_nome):
     try:
-        conn = conectar()
-        if not conn: return False 
-        cursor = conn.cursor()
-        cursor.execute("INSERT INTO tipos_exames (nome) VALUES (?)", (novo_nome.upper(),))
-        conn.commit()
-        conn.close()
+        with escrita() as conn:
+            if not conn: return False 
+            cursor = conn.cursor()
+            cursor.execute("INSERT INTO tipos_exames (nome) VALUES (?)", (novo_nome.upper(),))
         return True
     except Exception: return False
 
 def remover_tipo_exame_db(nome):
     try:
-        conn = conectar()
-        if not conn: return False 
-        cursor = conn.cursor()
-        cursor.execute("DELETE FROM tipos_exames WHERE nome = ?", (nome,))
-        conn.commit()
-        conn.close()
+        with escrita() as conn:
+            if not conn: return False 
+            cursor = conn.cursor()
+            cursor.execute("DELETE FROM tipos_exames WHERE nome = ?", (nome,))
         return True
     except Exception: return False
 
 def inicializar_equipamento():
     padroes = []
     try:
-        conn = conectar()
-        if not conn: return padroes    
-        cursor = conn.cursor()
-        cursor.execute("CREATE TABLE IF NOT EXISTS tipos_equipamento (nome TEXT PRIMARY KEY)")
-        
-        cursor.execute("SELECT COUNT(*) FROM tipos_equipamento")
-        if cursor.fetchone()[0] == 0:
-            for item in padroes:
-                cursor.execute("INSERT INTO tipos_equipamento (nome) VALUES (?)", (item,))
-            conn.commit()
-        
-        cursor.execute("SELECT nome FROM tipos_equipamento ORDER BY nome")
-        lista = [r[0] for r in cursor.fetchall()]
-        conn.close()
+        with escrita() as conn:
+            if not conn: return padroes    
+            cursor = conn.cursor()
+            cursor.execute("CREATE TABLE IF NOT EXISTS tipos_equipamento (nome TEXT PRIMARY KEY)")
+            
+            cursor.execute("SELECT COUNT(*) FROM tipos_equipamento")
+            if cursor.fetchone()[0] == 0:
+                for item in padroes:
+                    cursor.execute("INSERT INTO tipos_equipamento (nome) VALUES (?)", (item,))
+            
+            cursor.execute("SELECT nome FROM tipos_equipamento ORDER BY nome")
+            lista = [r[0] for r in cursor.fetchall()]
         return lista
     except Exception as e:
         print(f"Erro init equipamento: {e}")
@@ -251,22 +914,20 @@ def inicializar_equipamento():
 
 def adicionar_tipo_equipamento_db(novo_nome):
     try:
-        conn = conectar()
-        if not conn: return False 
-        cursor = conn.cursor()
-        cursor.execute("INSERT INTO tipos_equipamento (nome) VALUES (?)", (novo_nome,))
-        conn.commit()
-        conn.close()
+        with escrita() as conn:
+            if not conn: return False 
+            cursor = conn.cursor()
+            cursor.execute("INSERT INTO tipos_equipamento (nome) VALUES (?)", (novo_nome,))
         return True
     except Exception: return False
 
 def remover_tipo_equipamento_db(nome):
     try:
-        conn = conectar()
-        if not conn: return False 
-        cursor = conn.cursor()
-        cursor.execute("DELETE FROM tipos_equipamento WHERE nome = ?", (nome,))
-        conn.commit()
-        conn.close()
+        with escrita() as conn:
+            if not conn: return False 
+            cursor = conn.cursor()
+            cursor.execute("DELETE FROM tipos_equipamento WHERE nome = ?", (nome,))
         return True
     except Exception: return False
+
+perfil.instrumentar(__name__)
@@ -2,13 +2,58 @@
 import os
 import pydicom
 from pydicom import config
+from pydicom.filereader import read_partial
 import datetime
+import multiprocessing
+import time
+from concurrent.futures import ProcessPoolExecutor
+from concurrent.futures.process import BrokenProcessPool
+from config import state
 from core import database as db
 
 # --- CONFIGURAÇÕES GLOBAIS DO PYDICOM ---
 config.convert_wrong_length_to_UN = True
 config.enforce_valid_values = False
 
+# --- PRÉ-FILTRO DE CABEÇALHO ---
+# Etapas em que um arquivo pode ser descartado antes da leitura completa do SR
+ETAPA_NAO_DICOM = "nao_dicom"   # sem "DICM" no preâmbulo nem cabeçalho DICOM cru
+ETAPA_NAO_SR = "nao_sr"         # DICOM válido, mas Modality diferente de SR
+ETAPA_SR = "sr"                 # passou pelo filtro e foi lido por completo
+TAG_MODALIDADE = 0x00080060
+
+# --- TABELAS DE CÓDIGOS DO SR (DCM) ---
+# Totais do exame: código -> (chave, modo). "ultimo" fica com a última ocorrência
+# e "soma" acumula todas (ex.: tempo de fluoroscopia de cada plano)
+CODIGOS_TOTAIS = {
+    "113725": ("Dose", "ultimo"),         # Dose (RP) Total, Gy
+    "113722": ("DAP", "ultimo"),          # Dose Area Product Total, Gy.m²
+    "113730": ("TempoFluoro", "soma"),    # Total Fluoro Time, s
+}
+
+# Contêineres de evento de irradiação: código -> tipo
+CODIGOS_EVENTO = {
+    "113706": "projecao",   # Irradiation Event X-Ray Data
+    "113819": "ct",         # CT Acquisition
+}
+
+# Campos lidos dentro de cada evento: código -> chave (vale a primeira ocorrência)
+CAMPOS_EVENTO = {
+    "111526": "data_hora",          # DateTime Started
+    "113721": "tipo_irradiacao",    # Irradiation Event Type
+    "113820": "tipo_aquisicao_ct",  # CT Acquisition Type
+    "113738": "dose_rp",            # Dose (RP), Gy
+    "122130": "dap",                # Dose Area Product, Gy.m²
+    "113742": "duracao",            # Irradiation Duration, s
+    "113824": "tempo_exposicao",    # Exposure Time (CT), s
+    "113733": "kvp",                # KVP, kV
+    "113734": "corrente_ma",        # X-Ray Tube Current, mA
+    "112011": "angulo_primario",    # Positioner Primary Angle, graus
+    "112012": "angulo_secundario",  # Positioner Secondary Angle, graus
+    "113830": "ctdivol",            # Mean CTDIvol, mGy
+    "113838": "dlp",                # DLP, mGy.cm
+}
+
 def identificar_medico(nome_dicom_raw):
     """Limpa e tenta encontrar o registro do médico na string DICOM"""
     if not nome_dicom_raw or str(nome_dicom_raw) == "N/A":
@@ -23,79 +68,367 @@ def identificar_medico(nome_dicom_raw):
     except Exception:
         pass 
     return f"{nome_dicom_raw}"
+
+def _valor_item(item):
+    """Valor de um item de conteúdo do SR conforme o ValueType (None se vazio)."""
+    tipo = item.get("ValueType")
+    medidas = item.get("MeasuredValueSequence")
+    if medidas:
+        return float(medidas[0].NumericValue)
+    if tipo == "DATETIME":
+        return str(item.get("DateTime", "")) or None
+    if tipo == "CODE":
+        conceitos = item.get("ConceptCodeSequence")
+        return str(conceitos[0].CodeMeaning) if conceitos else None
+    if tipo == "TEXT":
+        return str(item.get("TextValue", "")) or None
+    return None
+
+def extrair_conteudo_sr(conteudo, codigos=CODIGOS_TOTAIS, eventos=False):
+    """
+    Percorre a árvore de conteúdo do SR (ContentSequence) uma única vez, sem recursão.
+    Devolve (totais, lista_eventos): totais traz a chave de cada código de `codigos`
+    encontrado; lista_eventos traz um dict por evento de irradiação (só se eventos=True).
+
+    A leitura para assim que todos os códigos pedidos foram achados, o item de primeiro
+    nível onde apareceram termina (os contêineres seguintes do mesmo tipo, como o segundo
+    plano de um biplano, ainda são lidos) e, com eventos=True, o último contêiner de
+    evento do primeiro nível já passou: o conteúdo dos itens que sobram (comentários,
+    fonte da informação de dose etc.) não é percorrido.
+    """
+    totais = {}
+    lista_eventos = []
+    faltando = set(codigos)
+    raiz_ultimo_achado = None
+    # Posição do último evento no primeiro nível: depois dele não há mais o que coletar
+    ultimo_evento = -1
+    if eventos:
+        for posicao, item in enumerate(conteudo):
+            nomes = item.get("ConceptNameCodeSequence")
+            if nomes and nomes[0].CodeValue in CODIGOS_EVENTO:
+                ultimo_evento = posicao
+    posicao_raiz = -1
+
+    # Cada nível da pilha é (iterador dos itens, evento que está sendo preenchido)
+    pilha = [(iter(conteudo), None)]
+    while pilha:
+        itens, evento = pilha[-1]
+        item = next(itens, None)
+        if item is None:
+            pilha.pop()
+            continue
+
+        nomes = item.get("ConceptNameCodeSequence")
+        codigo = nomes[0].CodeValue if nomes else None
+
+        if len(pilha) == 1:
+            posicao_raiz += 1
+            if not faltando and posicao_raiz > ultimo_evento and codigo != raiz_ultimo_achado:
+                break
+            raiz_atual = codigo
+
+        if evento is not None:
+            chave = CAMPOS_EVENTO.get(codigo)
+            if chave is not None and chave not in evento:
+                evento[chave] = _valor_item(item)
+        elif codigo in CODIGOS_EVENTO:
+            if not eventos:
+                continue
+            evento = {"tipo": CODIGOS_EVENTO[codigo]}
+            lista_eventos.append(evento)
+        elif codigo in codigos:
+            valor = _valor_item(item)
+            if valor is not None:
+                chave, modo = codigos[codigo]
+                totais[chave] = totais.get(chave, 0.0) + valor if modo == "soma" else valor
+                faltando.discard(codigo)
+                raiz_ultimo_achado = raiz_atual
+
+        filhos = item.get("ContentSequence")
+        if filhos:
+            pilha.append((iter(filhos), evento))
+
+    return totais, lista_eventos
+
+def _linha_evento(ordem, evento):
+    """Converte um evento de extrair_conteudo_sr na tupla de db.COLUNAS_EVENTO (mesmas unidades de exames)."""
+    dose_rp = evento.get("dose_rp")
+    dap = evento.get("dap")
+    return (
+        ordem, evento["tipo"], evento.get("data_hora"), evento.get("tipo_irradiacao"),
+        round(dose_rp * 1000, 4) if dose_rp is not None else None,
+        round(dap * 1e6, 4) if dap is not None else None,
+        evento.get("duracao", evento.get("tempo_exposicao")), evento.get("kvp"), evento.get("corrente_ma"),
+        evento.get("angulo_primario"), evento.get("angulo_secundario"), evento.get("ctdivol"), evento.get("dlp"),
+    )
+
+def extrair_exame_arquivo(caminho_completo):
+    """
+    Lê um arquivo DICOM e devolve (sop_instance_uid, modalidade, dados, eventos),
+    onde dados é a tupla pronta para o banco ou None quando o arquivo não é um SR,
+    e eventos é a lista de tuplas dos eventos de irradiação.
+    """
+    ds = pydicom.dcmread(caminho_completo, stop_before_pixels=True, force=True)
+
+    sop_uid = str(ds.get("SOPInstanceUID", "")) or None
+    modalidade = ds.get("Modality")
+    if modalidade != "SR":
+        return sop_uid, modalidade, None, []
+
+    nome_medico_bruto = ds.get("PerformingPhysicianName", "N/A")
+    medico_id = identificar_medico(nome_medico_bruto)
+
+    data_dicom = str(ds.get("StudyDate", ""))
+    if len(data_dicom) == 8:
+        data_formatada = f"{data_dicom[0:4]}-{data_dicom[4:6]}-{data_dicom[6:8]}"
+    else:
+        data_formatada = datetime.date.today().strftime("%Y-%m-%d")
+        
+    metrics = {
+        "Dose": 0.0, 
+        "DAP": 0.0, 
+        "TempoFluoro": 0.0, 
+        #"TempoAcq": 0.0
+    }
+
+    totais, eventos = extrair_conteudo_sr(ds.get("ContentSequence") or [], eventos=True)
+    metrics.update(totais)
+
+    dose = metrics["Dose"] * 1000 
+    dap = metrics["DAP"] * 1e6    
+    tempo_s = metrics["TempoFluoro"] #+ metrics["TempoAcq"]
     
-def processar_diretorio_dicom(caminho_upload):
+    m, s = divmod(tempo_s, 60)
+    h, m = divmod(m, 60)
+    tempo_fmt = "{:02d}:{:02d}:{:02d}".format(int(h), int(m), int(s))
+    
+    paciente_id = str(ds.get("PatientID", "0"))
+    sexo_raw = str(ds.get("PatientSex", "NI")).upper()
+    sexo = sexo_raw if sexo_raw in ["F", "M"] else "NI"
+    exame_nome = str(ds.get("AdmittingDiagnosesDescription", ds.get("StudyDescription", "NI")))
+    fabricante = ds.get("Manufacturer", "Desconhecido")
+    numero_serie = str(ds.get("DeviceSerialNumber", ""))
+
+    dados = (data_formatada, medico_id, exame_nome, round(dose, 2), tempo_fmt, round(dap, 2), paciente_id, sexo, f"{fabricante}-{numero_serie}")
+    return sop_uid, modalidade, dados, [_linha_evento(i, ev) for i, ev in enumerate(eventos, 1)]
+
+def classificar_arquivo(caminho_completo):
     """
-    Varre a pasta, lê os arquivos DICOM SR, extrai as métricas e salva no banco.
-    Retorna a quantidade de sucessos e erros para a interface.
+    Classifica o arquivo lendo só o preâmbulo e as primeiras tags do grupo 0008,
+    sem percorrer o dataset. Devolve (etapa, sop_instance_uid, modalidade).
     """
-    arquivos_processados = 0
-    erros = 0
+    with open(caminho_completo, "rb") as f:
+        inicio = f.read(132)
+        # Arquivos Part 10 têm "DICM" após o preâmbulo de 128 bytes; sem ele, só
+        # aceita datasets crus que começam pelos grupos 0002 ou 0008
+        if inicio[128:132] != b"DICM" and inicio[:2] not in (b"\x02\x00", b"\x08\x00"):
+            return ETAPA_NAO_DICOM, None, None
+        f.seek(0)
+        ds = read_partial(f, stop_when=lambda tag, vr, tamanho: tag > TAG_MODALIDADE, force=True)
+
+    sop_uid = str(ds.get("SOPInstanceUID", "")) or None
+    modalidade = ds.get("Modality")
+    if modalidade != "SR":
+        return ETAPA_NAO_SR, sop_uid, modalidade
+    return ETAPA_SR, sop_uid, modalidade
 
+def _ler_arquivo(caminho_completo):
+    """
+    Executado nos workers: nunca levanta exceção, devolve (caminho, resultado, etapa, erro).
+    Só os arquivos que passam pelo pré-filtro são lidos por completo.
+    """
+    try:
+        etapa, sop_uid, modalidade = classificar_arquivo(caminho_completo)
+        if etapa != ETAPA_SR:
+            return caminho_completo, (sop_uid, modalidade, None, []), etapa, None
+        return caminho_completo, extrair_exame_arquivo(caminho_completo), ETAPA_SR, None
+    except Exception as e:
+        return caminho_completo, None, None, str(e)
+
+def listar_arquivos(caminho_upload, cancelar=None, ao_avancar=None):
+    """
+    Retorna {caminho: (tamanho, mtime)} de todos os arquivos da pasta.
+    ao_avancar(qtd) é chamado a cada 500 arquivos encontrados.
+    """
+    arquivos_encontrados = {}
     for raiz, pastas, arquivos in os.walk(caminho_upload):
+        if cancelar is not None and cancelar.is_set(): break
         for arquivo in arquivos:
             caminho_completo = os.path.join(raiz, arquivo)
             try:
-                ds = pydicom.dcmread(caminho_completo, stop_before_pixels=True, force=True)
-
-                if ds.get("Modality") == "SR":
-                    nome_medico_bruto = ds.get("PerformingPhysicianName", "N/A")
-                    medico_id = identificar_medico(nome_medico_bruto)
-
-                    data_dicom = str(ds.get("StudyDate", ""))
-                    if len(data_dicom) == 8:
-                        data_formatada = f"{data_dicom[0:4]}-{data_dicom[4:6]}-{data_dicom[6:8]}"
-                    else:
-                        data_formatada = datetime.date.today().strftime("%Y-%m-%d")
-                        
-                    metrics = {
-                        "Dose": 0.0, 
-                        "DAP": 0.0, 
-                        "TempoFluoro": 0.0, 
-                        #"TempoAcq": 0.0
-                    }
-
-                    if hasattr(ds, "ContentSequence"):
-                        def extrair_simples(seq, dest):
-                            for it in seq:
-                                if hasattr(it, "ConceptNameCodeSequence"):
-                                    c = it.ConceptNameCodeSequence[0].CodeValue
-                                    if hasattr(it, "MeasuredValueSequence"):
-                                        valor = float(it.MeasuredValueSequence[0].NumericValue)
-                                        if c == "113725": dest["Dose"] = valor
-                                        elif c == "113722": dest["DAP"] = valor
-                                        elif c == "113730": dest["TempoFluoro"] += valor 
-                                if hasattr(it, "ContentSequence"): 
-                                    extrair_simples(it.ContentSequence, dest)
-                        
-                        extrair_simples(ds.ContentSequence, metrics)
-
-                    dose = metrics["Dose"] * 1000 
-                    dap = metrics["DAP"] * 1e6    
-                    tempo_s = metrics["TempoFluoro"] #+ metrics["TempoAcq"]
-                    
-                    m, s = divmod(tempo_s, 60)
-                    h, m = divmod(m, 60)
-                    tempo_fmt = "{:02d}:{:02d}:{:02d}".format(int(h), int(m), int(s))
-                    
-                    paciente_id = str(ds.get("PatientID", "0"))
-                    sexo_raw = str(ds.get("PatientSex", "NI")).upper()
-                    sexo = sexo_raw if sexo_raw in ["F", "M"] else "NI"
-                    exame_nome = str(ds.get("AdmittingDiagnosesDescription", ds.get("StudyDescription", "NI")))
-                    fabricante = ds.get("Manufacturer", "Desconhecido")
-                    numero_serie = str(ds.get("DeviceSerialNumber", ""))
-                    
-                    # Usa o banco de dados para inserir
-                    sucesso = db.inserir_exame((data_formatada, medico_id, exame_nome, round(dose, 2), tempo_fmt, round(dap, 2), paciente_id, sexo, f"{fabricante}-{numero_serie}"))
-                    
-                    if sucesso:
-                        arquivos_processados += 1
-                    else:
-                        erros += 1
-
-            except Exception as e:
-                print(f"Erro ao ler {arquivo}: {e}")
-                erros += 1
+                info = os.stat(caminho_completo)
+            except OSError:
                 continue
+            arquivos_encontrados[caminho_completo] = (info.st_size, info.st_mtime)
+            if ao_avancar and len(arquivos_encontrados) % 500 == 0:
+                ao_avancar(len(arquivos_encontrados))
+    return arquivos_encontrados
+
+def _ler_em_paralelo(arquivos, workers):
+    """
+    Distribui a leitura entre processos e devolve os resultados na ordem dos arquivos.
+    Se o pool não puder ser criado (ex.: app empacotado) ou quebrar no meio,
+    o restante é lido no processo atual.
+    """
+    lidos = 0
+    executor = None
+    try:
+        tamanho_bloco = max(1, min(64, len(arquivos) // (workers * 4)))
+        # spawn: a importação roda numa thread do processo do Flet, e fork com outras threads vivas pode travar
+        executor = ProcessPoolExecutor(max_workers=workers, mp_context=multiprocessing.get_context("spawn"))
+        for resultado in executor.map(_ler_arquivo, arquivos, chunksize=tamanho_bloco):
+            lidos += 1
+            yield resultado
+    except (BrokenProcessPool, OSError, NotImplementedError) as e:
+        print(f"Importação paralela indisponível ({e}), seguindo em um processo.")
+        for caminho_completo in arquivos[lidos:]:
+            yield _ler_arquivo(caminho_completo)
+    finally:
+        # Ao cancelar, descarta os blocos que ainda não começaram
+        if executor is not None:
+            executor.shutdown(wait=True, cancel_futures=True)
+    
+def processar_diretorio_dicom(caminho_upload, workers=None, progresso=None, cancelar=None):
+    """
+    Varre a pasta, lê os arquivos DICOM SR, extrai as métricas e salva no banco.
+    A leitura pode ser dividida entre vários processos (workers); a gravação
+    no banco fica sempre no processo principal.
+    Arquivos com o mesmo caminho, tamanho e mtime de uma importação anterior
+    não são abertos (inclusive os descartados pelo pré-filtro ou sem SOPInstanceUID),
+    e SRs cujo SOPInstanceUID já está no banco não são duplicados.
+
+    progresso(evento) recebe um dict com fase, escaneados, a_ler, lidos, inseridos,
+    falhas, ignorados, arquivos_por_segundo e etapas (quantos arquivos ficaram em
+    cada etapa do pré-filtro). cancelar é um threading.Event: quando
+    marcado, a leitura para e o que já foi lido é gravado antes de retornar.
+    Retorna a quantidade de sucessos e erros para a interface.
+    """
+    arquivos_processados = 0
+    erros = 0
+    inalterados = 0
+    duplicados = 0
+    ignorados = 0
+    lidos = 0
+    etapas = {ETAPA_NAO_DICOM: 0, ETAPA_NAO_SR: 0, ETAPA_SR: 0}
+    inicio = time.perf_counter()
+    ultimo_aviso = 0.0
+
+    if workers is None:
+        workers = state.workers_importacao
+
+    def avisar(fase, escaneados, a_ler, forcar=False):
+        nonlocal ultimo_aviso
+        agora = time.perf_counter()
+        if progresso is None or (not forcar and agora - ultimo_aviso < 0.2): return
+        ultimo_aviso = agora
+        decorrido = agora - inicio
+        progresso({
+            "fase": fase, "escaneados": escaneados, "a_ler": a_ler, "lidos": lidos,
+            "inseridos": arquivos_processados, "falhas": erros, "ignorados": inalterados + ignorados,
+            "arquivos_por_segundo": lidos / decorrido if decorrido > 0 else 0.0,
+            "etapas": dict(etapas),
+        })
+
+    def cancelado():
+        return cancelar is not None and cancelar.is_set()
+
+    manifesto, uids_gravados = db.carregar_manifesto()
+    encontrados = listar_arquivos(caminho_upload, cancelar, lambda qtd: avisar("varrendo", qtd, 0))
+    arquivos = [c for c, info in encontrados.items() if manifesto.get(c) != info]
+    inalterados = len(encontrados) - len(arquivos)
+    if cancelado(): arquivos = []
+    avisar("lendo", len(encontrados), len(arquivos), forcar=True)
+
+    if workers > 1 and len(arquivos) > 1:
+        resultados = _ler_em_paralelo(arquivos, workers)
+    else:
+        resultados = (_ler_arquivo(c) for c in arquivos)
+
+    pendentes = []
+    pendentes_eventos = []
+    pendentes_manifesto = []
+    # Só valem depois que o lote de pendentes é gravado: se o insert falhar, os arquivos
+    # não entram no manifesto e são lidos de novo na próxima importação
+    pendentes_ignorados = []
+    uids_pendentes = set()
+    repetidos_pendentes = []
+    apenas_manifesto = []
+    apenas_ignorados = []
+    relatorio = []
+
+    def gravar_pendentes():
+        nonlocal arquivos_processados, erros, duplicados, ignorados
+        if pendentes:
+            # Um único commit: o lote inteiro é gravado ou nada é
+            inseridos, falhas, rel = db.inserir_exames_lote(pendentes, tamanho_lote=len(pendentes),
+                                                            manifesto=pendentes_manifesto, eventos=pendentes_eventos)
+            arquivos_processados += inseridos
+            erros += falhas
+            relatorio.extend(rel)
+            if inseridos == len(pendentes):
+                uids_gravados.update(uids_pendentes)
+                apenas_ignorados.extend(pendentes_ignorados)
+                apenas_manifesto.extend(repetidos_pendentes)
+                duplicados += len(repetidos_pendentes)
+                ignorados += len(repetidos_pendentes)
+            else:
+                erros += len(repetidos_pendentes)
+        if apenas_manifesto or apenas_ignorados:
+            db.registrar_arquivos(apenas_manifesto, apenas_ignorados)
+        for lista in (pendentes, pendentes_eventos, pendentes_manifesto, pendentes_ignorados,
+                      repetidos_pendentes, apenas_manifesto, apenas_ignorados):
+            lista.clear()
+        uids_pendentes.clear()
+
+    for caminho_completo, resultado, etapa, erro in resultados:
+        lidos += 1
+        avisar("lendo", len(encontrados), len(arquivos))
+        if etapa is not None:
+            etapas[etapa] += 1
+        if erro is not None:
+            print(f"Erro ao ler {os.path.basename(caminho_completo)}: {erro}")
+            erros += 1
+        else:
+            sop_uid, modalidade, dados, eventos = resultado
+            tamanho, mtime = encontrados[caminho_completo]
+            item_manifesto = (sop_uid, caminho_completo, tamanho, mtime, modalidade) if sop_uid else None
+            # Sem UID não entra no manifesto: fica registrado pelo caminho para não ser lido de novo
+            item_ignorado = None if sop_uid else (caminho_completo, tamanho, mtime, etapa)
+
+            if dados is None or (sop_uid and sop_uid in uids_gravados):
+                if dados is not None: duplicados += 1
+                ignorados += 1
+                if item_manifesto: apenas_manifesto.append(item_manifesto)
+                if item_ignorado: apenas_ignorados.append(item_ignorado)
+            elif sop_uid and sop_uid in uids_pendentes:
+                # Cópia de um SR que ainda está no lote: só é repetido se ele for gravado
+                repetidos_pendentes.append(item_manifesto)
+            else:
+                pendentes.append(dados)
+                pendentes_eventos.append(eventos)
+                pendentes_manifesto.append(item_manifesto)
+                if sop_uid: uids_pendentes.add(sop_uid)
+                if item_ignorado: pendentes_ignorados.append(item_ignorado)
+
+            if len(pendentes) + len(repetidos_pendentes) + len(apenas_manifesto) + len(apenas_ignorados) >= state.tamanho_lote_insercao:
+                gravar_pendentes()
+
+        if cancelado():
+            resultados.close()
+            break
+
+    gravar_pendentes()
+    avisar("cancelado" if cancelado() else "concluido", len(encontrados), len(arquivos), forcar=True)
+
+    print(f"Pré-filtro: {inalterados} inalterados (manifesto), {etapas[ETAPA_NAO_DICOM]} não DICOM, "
+          f"{etapas[ETAPA_NAO_SR]} não SR (cabeçalho), {etapas[ETAPA_SR]} SR lidos por completo, {erros} com erro.")
+
+    if inalterados or duplicados:
+        print(f"Importação: {inalterados} arquivos inalterados ignorados, {duplicados} SR já existentes no banco.")
+
+    if relatorio:
+        tempo_total = sum(r["segundos"] for r in relatorio)
+        print(f"Importação: {len(relatorio)} commits, {arquivos_processados} linhas, "
+              f"{tempo_total:.3f}s gravando ({1000 * tempo_total / len(relatorio):.1f} ms/commit)")
                 
-    return arquivos_processados, erros
\ No newline at end of file
+    return arquivos_processados, erros
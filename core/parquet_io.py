@@ -0,0 +1,178 @@
+# core/parquet_io.py
+# Exportação/importação colunar (Parquet) da tabela exames.
+# pyarrow é opcional (pip install "OpenZoe[parquet]"): só é importado aqui, na hora do uso.
+import datetime
+import os
+import tempfile
+from core import database as db
+
+# Colunas do arquivo, na ordem da consulta abaixo
+COLUNAS = ["id", "data", "medico", "exame", "dose_mgy", "tempo", "tempo_seg", "dap",
+           "paciente_id", "sexo", "sala", "sop_instance_uid"]
+
+SQL_CAMPOS = """exames.id, exames.data, exames.medico, exames.exam, exames.dose_num, exames.tempo, exames.tempo_seg,
+    exames.dap_num, exames.paciente_id, exames.sexo, exames.sala,
+    (SELECT sop_instance_uid FROM arquivos_importados a WHERE a.exame_id = exames.id)"""
+
+def parquet_disponivel():
+    try:
+        import pyarrow  # noqa: F401
+        return True
+    except ImportError:
+        return False
+
+def _esquema():
+    import pyarrow as pa
+    return pa.schema([
+        ("id", pa.int64()),
+        ("data", pa.date32()),
+        ("medico", pa.string()),
+        ("exame", pa.string()),
+        ("dose_mgy", pa.float64()),
+        ("tempo", pa.string()),
+        ("tempo_seg", pa.float64()),
+        ("dap", pa.float64()),
+        ("paciente_id", pa.string()),
+        ("sexo", pa.string()),
+        ("sala", pa.string()),
+        ("sop_instance_uid", pa.string()),
+    ])
+
+def _converter_data(valor):
+    try:
+        return datetime.date.fromisoformat(str(valor)[:10])
+    except (TypeError, ValueError):
+        return None
+
+def exportar_parquet(caminho, filtros=None, progresso=None, cancelar=None, linhas_por_grupo=100_000, compressao="zstd"):
+    """
+    Grava as linhas de exames (filtradas se filtros for a lista de argumentos de
+    db.montar_query_filtros) em Parquet tipado: data como date32, dose/DAP/tempo
+    como float64. Cada bloco de linhas_por_grupo linhas vira um row group.
+    progresso(escritas, total) é chamado a cada bloco; cancelar é um threading.Event.
+    O arquivo é montado num temporário na mesma pasta, que só substitui caminho no fim:
+    cancelado ou com erro, caminho não é criado nem alterado.
+    Retorna a quantidade de linhas gravadas, ou None em caso de erro.
+    """
+    try:
+        import pyarrow as pa
+        import pyarrow.parquet as pq
+    except ImportError:
+        print("Erro Parquet: pyarrow não está instalado (pip install pyarrow).")
+        return None
+
+    temporario = None
+    try:
+        conn = db.conectar()
+        if not conn: return None
+        cursor = conn.cursor()
+
+        if filtros:
+            sql_where, params = db.montar_query_filtros(*filtros)
+        else:
+            sql_where, params = "FROM exames", []
+        total = cursor.execute(f"SELECT COUNT(*) {sql_where}", params).fetchone()[0]
+        cursor.execute(f"SELECT {SQL_CAMPOS} {sql_where} ORDER BY data, exames.id", params)
+
+        esquema = _esquema()
+        escritas = 0
+        descritor, temporario = tempfile.mkstemp(suffix=".parquet.tmp", dir=os.path.dirname(os.path.abspath(caminho)))
+        os.close(descritor)
+        if progresso: progresso(escritas, total)
+        with pq.ParquetWriter(temporario, esquema, compression=compressao) as escritor:
+            while True:
+                if cancelar is not None and cancelar.is_set(): break
+                bloco = cursor.fetchmany(linhas_por_grupo)
+                if not bloco: break
+                colunas = list(zip(*bloco))
+                colunas[1] = [_converter_data(v) for v in colunas[1]]
+                escritor.write_table(pa.Table.from_arrays(
+                    [pa.array(valores, type=campo.type) for valores, campo in zip(colunas, esquema)],
+                    schema=esquema
+                ))
+                escritas += len(bloco)
+                if progresso: progresso(escritas, total)
+        conn.close()
+        if cancelar is not None and cancelar.is_set():
+            os.remove(temporario)
+        else:
+            os.replace(temporario, caminho)
+        return escritas
+
+    except Exception as e:
+        print(f"Erro Parquet: {e}")
+        if temporario and os.path.exists(temporario):
+            os.remove(temporario)
+        return None
+
+def _registros_do_lote(lote, uids_gravados, origem):
+    """
+    Converte um RecordBatch nas tuplas de db.inserir_exames_lote, pulando exames já gravados:
+    pelo SOPInstanceUID quando há, senão pelos valores (db.exames_ja_gravados).
+    origem é (caminho, tamanho, mtime) do arquivo Parquet, gravada no manifesto dos exames com UID.
+    Retorna (registros, manifesto, descartados).
+    """
+    registros, manifesto, descartados = [], [], 0
+    colunas = {nome: lote.column(nome).to_pylist() for nome in lote.schema.names}
+    vazio = [None] * lote.num_rows
+    uids = colunas.get("sop_instance_uid", vazio)
+    for i in range(lote.num_rows):
+        uid = uids[i]
+        if uid and uid in uids_gravados:
+            descartados += 1
+            continue
+        data = colunas["data"][i]
+        registros.append((
+            data.isoformat() if isinstance(data, datetime.date) else data,
+            colunas["medico"][i], colunas["exame"][i], colunas["dose_mgy"][i], colunas["tempo"][i],
+            colunas["dap"][i], colunas["paciente_id"][i], colunas["sexo"][i], colunas["sala"][i],
+        ))
+        manifesto.append((uid, *origem, "SR") if uid else None)
+        if uid: uids_gravados.add(uid)
+
+    sem_uid = [i for i, item in enumerate(manifesto) if item is None]
+    repetidos = {i for i, gravado in zip(sem_uid, db.exames_ja_gravados([registros[i] for i in sem_uid])) if gravado}
+    if repetidos:
+        registros = [r for i, r in enumerate(registros) if i not in repetidos]
+        manifesto = [m for i, m in enumerate(manifesto) if i not in repetidos]
+        descartados += len(repetidos)
+    return registros, manifesto, descartados
+
+def importar_parquet(caminho, progresso=None, cancelar=None, linhas_por_lote=None):
+    """
+    Carrega em exames um arquivo gerado por exportar_parquet, lendo por row group
+    e gravando com db.inserir_exames_lote. Exames cujo SOPInstanceUID já está no
+    banco são ignorados, assim como os sem UID com os mesmos valores de um exame
+    gravado, então importar o mesmo arquivo duas vezes não duplica.
+    Retorna (inseridos, falhas, ignorados), ou None em caso de erro.
+    """
+    try:
+        import pyarrow.parquet as pq
+    except ImportError:
+        print("Erro Parquet: pyarrow não está instalado (pip install pyarrow).")
+        return None
+
+    try:
+        arquivo = pq.ParquetFile(caminho)
+        info = os.stat(caminho)
+        origem = (os.path.abspath(caminho), info.st_size, info.st_mtime)
+        total = arquivo.metadata.num_rows
+        _, uids_gravados = db.carregar_manifesto()
+
+        inseridos = falhas = ignorados = lidas = 0
+        if progresso: progresso(lidas, total)
+        for lote in arquivo.iter_batches(batch_size=linhas_por_lote or 65536, columns=[c for c in COLUNAS if c in arquivo.schema_arrow.names]):
+            if cancelar is not None and cancelar.is_set(): break
+            registros, manifesto, descartados = _registros_do_lote(lote, uids_gravados, origem)
+            ignorados += descartados
+            if registros:
+                ok, erro, _ = db.inserir_exames_lote(registros, tamanho_lote=len(registros), manifesto=manifesto)
+                inseridos += ok
+                falhas += erro
+            lidas += lote.num_rows
+            if progresso: progresso(lidas, total)
+        return inseridos, falhas, ignorados
+
+    except Exception as e:
+        print(f"Erro Parquet: {e}")
+        return None
@@ -0,0 +1,222 @@
+# core/perfil.py
+# Instrumentação opcional para achar o que deixa o dashboard lento: tempo e contagem de
+# cada função dos módulos medidos, SQL executado (texto, parâmetros e EXPLAIN QUERY PLAN),
+# fases da interface e acertos/falhas dos caches (core/cache).
+# Desligada por padrão. Para ligar, defina OPENZOE_PERFIL=perfil.json antes de abrir o
+# programa (ou chame ativar()); ao sair, o resultado é gravado nesse arquivo. O JSON
+# também é um trace (chave traceEvents), que abre em chrome://tracing ou ui.perfetto.dev.
+# Desligada, as funções não são envolvidas e as fases custam um teste de None.
+import atexit
+import datetime
+import functools
+import inspect
+import json
+import os
+import sys
+import threading
+import time
+from config import state
+from core.cache import estatisticas_cache
+
+_ativo = False
+_trava = threading.Lock()
+_modulos = []       # nomes registrados com instrumentar()
+_inicio = time.perf_counter()
+_inicio_relogio = datetime.datetime.now()
+_funcoes = {}       # nome -> estatísticas
+_fases = {}         # nome -> estatísticas
+_consultas = {}     # sql -> estatísticas, parâmetros e plano
+_eventos = []       # eventos do trace ("ph": "X")
+_eventos_descartados = 0
+
+# Exemplos distintos de parâmetros guardados por consulta
+MAX_EXEMPLOS_PARAMETROS = 5
+
+def ativo():
+    return _ativo
+
+def _nova_estatistica():
+    return {"qtd": 0, "total": 0.0, "max": 0.0}
+
+def _somar(tabela, nome, segundos):
+    est = tabela.get(nome)
+    if est is None:
+        est = tabela[nome] = _nova_estatistica()
+    est["qtd"] += 1
+    est["total"] += segundos
+    if segundos > est["max"]: est["max"] = segundos
+    return est
+
+def _evento(nome, categoria, inicio, fim, argumentos=None):
+    global _eventos_descartados
+    if len(_eventos) >= state.perfil_max_eventos:
+        _eventos_descartados += 1
+        return
+    evento = {"name": nome, "cat": categoria, "ph": "X", "pid": os.getpid(), "tid": threading.get_ident(),
+              "ts": round((inicio - _inicio) * 1e6, 1), "dur": round((fim - inicio) * 1e6, 1)}
+    if argumentos: evento["args"] = argumentos
+    _eventos.append(evento)
+
+def _medir(nome, funcao):
+    @functools.wraps(funcao)
+    def envoltorio(*args, **kwargs):
+        inicio = time.perf_counter()
+        try:
+            return funcao(*args, **kwargs)
+        finally:
+            fim = time.perf_counter()
+            with _trava:
+                _somar(_funcoes, nome, fim - inicio)
+                _evento(nome, "funcao", inicio, fim)
+    envoltorio._perfil = True
+    return envoltorio
+
+def _envolver(modulo):
+    """
+    Troca cada função pública definida no módulo por uma versão medida (chamadas internas
+    também passam por ela). As auxiliares com _ ficam de fora: chamadas por linha, o custo
+    da medição distorceria o tempo da função que as chama.
+    """
+    for nome, objeto in list(vars(modulo).items()):
+        if nome.startswith("_") or not inspect.isfunction(objeto) or objeto.__module__ != modulo.__name__: continue
+        if getattr(objeto, "_perfil", False): continue
+        # Context managers (ex.: db.escrita) só criariam o objeto: o tempo não diria nada
+        if inspect.isgeneratorfunction(getattr(objeto, "__wrapped__", objeto)): continue
+        setattr(modulo, nome, _medir(f"{modulo.__name__}.{nome}", objeto))
+
+def instrumentar(nome_modulo):
+    """
+    Registra um módulo para ser medido. Chamado no fim do próprio módulo:
+    se o perfil já está ligado, as funções são envolvidas na hora; senão, quando ativar() for chamado.
+    """
+    if nome_modulo not in _modulos:
+        _modulos.append(nome_modulo)
+    if _ativo:
+        _envolver(sys.modules[nome_modulo])
+
+def ativar(caminho=None):
+    """Liga a coleta. Conexões abertas a partir daqui registram o SQL; o resultado vai para caminho ao sair."""
+    global _ativo
+    if caminho: state.perfil_arquivo = caminho
+    if _ativo: return
+    _ativo = True
+    for nome in _modulos:
+        _envolver(sys.modules[nome])
+    if state.perfil_arquivo:
+        atexit.register(salvar)
+
+def inicio_fase():
+    """Marca o começo de uma fase da interface; None com o perfil desligado."""
+    return time.perf_counter() if _ativo else None
+
+def fim_fase(nome, inicio):
+    """Fecha a fase aberta com inicio_fase()."""
+    if inicio is None: return
+    fim = time.perf_counter()
+    with _trava:
+        _somar(_fases, nome, fim - inicio)
+        _evento(nome, "ui", inicio, fim)
+
+def _json_seguro(valor):
+    if valor is None or isinstance(valor, (int, float, str)): return valor
+    if isinstance(valor, (list, tuple)): return [_json_seguro(v) for v in valor]
+    if isinstance(valor, dict): return {str(k): _json_seguro(v) for k, v in valor.items()}
+    return repr(valor)
+
+def _plano(conn, sql, parametros):
+    import sqlite3
+    try:
+        # Cursor base do sqlite3: o EXPLAIN não passa de novo pela instrumentação
+        linhas = sqlite3.Cursor(conn).execute(f"EXPLAIN QUERY PLAN {sql}", parametros).fetchall()
+        return [linha[-1] for linha in linhas]
+    except Exception as e:
+        return [f"(sem plano: {e})"]
+
+def registrar_sql(conn, sql, parametros, inicio, fim, linhas=None):
+    """Chamado pelas conexões de core/database com o perfil ligado, a cada execute/executemany."""
+    texto = " ".join(sql.split())
+    consulta = _consultas.get(texto)
+    plano = None
+    if consulta is None and parametros is not None and texto.split(" ", 1)[0].upper() in ("SELECT", "WITH"):
+        plano = _plano(conn, sql, parametros)
+    parametros = _json_seguro(parametros) if parametros is not None else None
+    with _trava:
+        consulta = _consultas.get(texto)
+        if consulta is None:
+            consulta = _consultas[texto] = {**_nova_estatistica(), "parametros": [], "plano": plano}
+        _somar(_consultas, texto, fim - inicio)
+        if parametros is not None and parametros not in consulta["parametros"] and len(consulta["parametros"]) < MAX_EXEMPLOS_PARAMETROS:
+            consulta["parametros"].append(parametros)
+        argumentos = {"sql": texto}
+        if parametros is not None: argumentos["parametros"] = parametros
+        if linhas is not None: argumentos["linhas"] = linhas
+        _evento(texto[:60], "sql", inicio, fim, argumentos)
+
+def _tabela(estatisticas):
+    return {
+        "qtd": estatisticas["qtd"],
+        "total_ms": round(estatisticas["total"] * 1000, 3),
+        "media_ms": round(estatisticas["total"] / estatisticas["qtd"] * 1000, 3) if estatisticas["qtd"] else 0.0,
+        "max_ms": round(estatisticas["max"] * 1000, 3),
+    }
+
+def resumo():
+    """Dicionário com funções, fases e consultas (ordenadas pelo tempo total), acertos e falhas dos caches e os eventos do trace."""
+    with _trava:
+        def ordenar(tabela):
+            return dict(sorted(((nome, _tabela(est)) for nome, est in tabela.items()), key=lambda item: -item[1]["total_ms"]))
+        consultas = sorted(
+            ({"sql": sql, **_tabela(est), "parametros": est["parametros"], "plano": est["plano"]} for sql, est in _consultas.items()),
+            key=lambda c: -c["total_ms"]
+        )
+        return {
+            "inicio": _inicio_relogio.isoformat(timespec="seconds"),
+            "duracao_s": round(time.perf_counter() - _inicio, 3),
+            "banco": state.FILE_PATH,
+            "funcoes": ordenar(_funcoes),
+            "fases": ordenar(_fases),
+            "consultas": consultas,
+            "cache": estatisticas_cache(),
+            "eventos_descartados": _eventos_descartados,
+            "displayTimeUnit": "ms",
+            "traceEvents": list(_eventos),
+        }
+
+def salvar(caminho=None):
+    """Grava resumo() em JSON (padrão: state.perfil_arquivo). Retorna o caminho ou None."""
+    caminho = caminho or state.perfil_arquivo
+    if not caminho or not _ativo: return None
+    try:
+        with open(caminho, "w", encoding="utf-8") as f:
+            json.dump(resumo(), f, ensure_ascii=False, indent=1)
+        return caminho
+    except Exception as e:
+        print(f"Erro Perfil: {e}")
+        return None
+
+def limpar():
+    """Zera o que foi coletado (o perfil continua ligado)."""
+    global _inicio, _inicio_relogio, _eventos_descartados
+    with _trava:
+        _funcoes.clear(); _fases.clear(); _consultas.clear(); _eventos.clear()
+        _eventos_descartados = 0
+        _inicio, _inicio_relogio = time.perf_counter(), datetime.datetime.now()
+
+def comparar(arquivo_antes, arquivo_depois):
+    """Imprime o tempo total de cada função, fase e consulta presente nos dois arquivos."""
+    with open(arquivo_antes, encoding="utf-8") as f: antes = json.load(f)
+    with open(arquivo_depois, encoding="utf-8") as f: depois = json.load(f)
+    for secao in ("funcoes", "fases"):
+        for nome in sorted(antes[secao].keys() & depois[secao].keys()):
+            a, d = antes[secao][nome]["total_ms"], depois[secao][nome]["total_ms"]
+            print(f"{nome:<60} {a:10.1f}ms {d:10.1f}ms  x{(d / a if a else float('inf')):5.2f}")
+    consultas_antes = {c["sql"]: c for c in antes["consultas"]}
+    for consulta in depois["consultas"]:
+        anterior = consultas_antes.get(consulta["sql"])
+        if anterior:
+            a, d = anterior["total_ms"], consulta["total_ms"]
+            print(f"{consulta['sql'][:60]:<60} {a:10.1f}ms {d:10.1f}ms  x{(d / a if a else float('inf')):5.2f}")
+
+if __name__ == "__main__":
+    # python -m core.perfil antes.json depois.json
+    comparar(sys.argv[1], sys.argv[2])
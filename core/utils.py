@@ -6,4 +6,32 @@ def formatar_data(valor):
 
 def formatar_tempo(valor):
     """Remove milissegundos da string de tempo."""
-    return str(valor).split()[0].replace('.000000', '') if valor else ""
\ No newline at end of file
+    return str(valor).split()[0].replace('.000000', '') if valor else ""
+
+def converter_numero(valor):
+    """Converte texto com vírgula ou ponto decimal em float (None se vazio/inválido)."""
+    if valor is None: return None
+    if isinstance(valor, (int, float)): return float(valor)
+    texto = str(valor).strip().replace(',', '.')
+    if not texto: return None
+    try:
+        return float(texto)
+    except ValueError:
+        return None
+
+def converter_tempo_segundos(valor):
+    """Converte 'HH:MM:SS' (ou 'MM:SS') em segundos. Número puro é lido como minutos."""
+    if valor is None: return None
+    texto = str(valor).strip()
+    if not texto: return None
+    trechos = [t for t in texto.split() if ":" in t]
+    if trechos:
+        segundos = 0.0
+        try:
+            for parte in trechos[0].split(":"):
+                segundos = segundos * 60 + float(parte)
+        except ValueError:
+            return None
+        return segundos
+    minutos = converter_numero(texto)
+    return minutos * 60 if minutos is not None else None
@@ -9,20 +9,37 @@ Licença: MIT
 """
 
 import flet as ft
-import flet_charts as fch
+import asyncio
 import datetime
 import math 
+import multiprocessing
 import os
-import tempfile
+import threading
+import time
 from config import state
 from core import database as db
-from core import dicom_parser
-from reports.csv_export import gerar_csv_string
-from reports.pdf_export import RelatorioPDF
+from core import parquet_io
+from reports.csv_export import exportar_csv_arquivo
 from core import analytics
-from reports import charts_export
-from core.utils import formatar_data, formatar_tempo
-from ui import charts_ui
+from core import perfil
+from core.utils import formatar_data
+from ui import tabela_ui
+# pydicom (core.dicom_parser), matplotlib (reports.charts_export), fpdf (reports.pdf_export)
+# e flet_charts (ui.charts_ui) são importados só no primeiro uso, para a janela abrir mais rápido
+
+# OPENZOE_PERFIL=perfil.json liga a instrumentação (tempos, SQL e fases da interface)
+if state.perfil_arquivo:
+    perfil.ativar()
+
+# Opções do seletor de detalhe do gráfico de evolução -> nível de analytics.reduzir_serie
+NIVEIS_GRAFICO = {"Automático": None, "Por dia": "dia", "Por semana": "semana", "Por mês": "mes"}
+ROTULOS_NIVEL = {"dia": ("Dia", "dias"), "semana": ("Semana", "semanas"), "mes": ("Mês", "meses")}
+
+def rotulo_nivel(serie):
+    """Quanto cada ponto da série reduzida soma: "Dia", "Semana" ou, com grupos vizinhos somados, "3 dias"."""
+    if not serie: return ROTULOS_NIVEL["dia"][0]
+    singular, plural = ROTULOS_NIVEL[serie["nivel"]]
+    return singular if serie["passo"] == 1 else f"{serie['passo']} {plural}"
 
 # ==============================================================================
 #                           INTERFACE GRÁFICA (FLET)
@@ -42,6 +59,7 @@ def main(page: ft.Page):
         if not dados:
             if not caminho_oculto: page.show_dialog(ft.SnackBar(ft.Text("Sem dados para salvar!"), bgcolor="red"))
             return False
+        from reports import charts_export
         sucesso, msg = charts_export.gerar_png_evolucao(dados, modo, state.directory_path, caminho_oculto)
         if sucesso and not caminho_oculto: page.show_dialog(ft.SnackBar(ft.Text(f"Salvo como: {msg}"), bgcolor="green"))
         elif not sucesso: page.show_dialog(ft.SnackBar(ft.Text(f"Erro: {msg}"), bgcolor="red"))
@@ -52,6 +70,7 @@ def main(page: ft.Page):
         if not dados:
             if not caminho_oculto: page.show_dialog(ft.SnackBar(ft.Text("Sem dados para salvar!"), bgcolor="red"))
             return False
+        from reports import charts_export
         sucesso, msg = charts_export.gerar_png_dose_medico(dados, state.directory_path, caminho_oculto)
         if sucesso and not caminho_oculto: page.show_dialog(ft.SnackBar(ft.Text(f"Salvo como: {msg}"), bgcolor="green"))
         return sucesso
@@ -61,6 +80,7 @@ def main(page: ft.Page):
         if not dados:
             if not caminho_oculto: page.show_dialog(ft.SnackBar(ft.Text("Sem dados para salvar!"), bgcolor="red"))
             return False
+        from reports import charts_export
         sucesso, msg = charts_export.gerar_png_tempo_medico(dados, state.directory_path, caminho_oculto)
         if sucesso and not caminho_oculto: page.show_dialog(ft.SnackBar(ft.Text(f"Salvo como: {msg}"), bgcolor="green"))
         return sucesso
@@ -70,6 +90,7 @@ def main(page: ft.Page):
         if not dados:
             if not caminho_oculto: page.show_dialog(ft.SnackBar(ft.Text("Sem dados para salvar!"), bgcolor="red"))
             return False
+        from reports import charts_export
         sucesso, msg = charts_export.gerar_png_dose_exame(dados, modo, state.directory_path, caminho_oculto)
         if sucesso and not caminho_oculto: page.show_dialog(ft.SnackBar(ft.Text(f"Salvo como: {msg}"), bgcolor="green"))
         return sucesso
@@ -79,6 +100,7 @@ def main(page: ft.Page):
         if not dados:
             if not caminho_oculto: page.show_dialog(ft.SnackBar(ft.Text("Sem dados para salvar!"), bgcolor="red"))
             return False
+        from reports import charts_export
         sucesso, msg = charts_export.gerar_png_tempo_exame(dados, modo, state.directory_path, caminho_oculto)
         if sucesso and not caminho_oculto: page.show_dialog(ft.SnackBar(ft.Text(f"Salvo como: {msg}"), bgcolor="green"))
         return sucesso
@@ -88,31 +110,15 @@ def main(page: ft.Page):
     async def handle_pick_files(e: ft.Event[ft.Button]):
         files = await ft.FilePicker().pick_files(allow_multiple=True)
         if files:
-            state.FILE_PATH = files[0].path
-            conn = db.conectar()
-            cursor = conn.cursor()
+            db.abrir_banco(files[0].path)
             
-            sql_create = """CREATE TABLE IF NOT EXISTS exames (
-                id INTEGER PRIMARY KEY AUTOINCREMENT,
-                data TEXT,
-                medico TEXT,
-                exam TEXT,
-                dose_mgy TEXT,
-                tempo TEXT,
-                dap TEXT,
-                paciente_id TEXT,
-                sexo TEXT,
-                sala TEXT
-            )"""
             db.inicializar_tipos_exames() 
             db.inicializar_equipamento()
             atualizar_dropdowns_globais()
             
-            cursor.execute(sql_create)
-            conn.commit()
-            conn.close()
-            
-            db.criar_indices()
+            # Cria a tabela, aplica migrações pendentes e cria os índices
+            db.preparar_banco()
+            voltar_primeira_pagina()
             atualizar_tudo()
             page.show_dialog(ft.SnackBar(ft.Text(f"Arquivo Selecionado: {state.FILE_PATH}"), bgcolor="green"))
         else:
@@ -153,21 +159,72 @@ def main(page: ft.Page):
         else:
             page.update()
  
+    # --- IMPORTAÇÃO DICOM EM SEGUNDO PLANO ---
+    cancelar_importacao = threading.Event()
+    barra_importacao = ft.ProgressBar(width=420, value=None)
+    txt_importacao = ft.Text("Procurando arquivos...")
+    txt_velocidade_importacao = ft.Text("", size=12, color=ft.Colors.GREY)
+
+    def cancelar_importacao_click(e):
+        cancelar_importacao.set()
+        btn_cancelar_importacao.disabled = True
+        txt_importacao.value = "Cancelando... os dados já lidos serão mantidos."
+        dlg_importacao.update()
+
+    btn_cancelar_importacao = ft.TextButton("Cancelar", icon=ft.Icons.CANCEL, on_click=cancelar_importacao_click)
+    dlg_importacao = ft.AlertDialog(
+        modal=True,
+        title=ft.Text("Importando DICOM"),
+        content=ft.Column([barra_importacao, txt_importacao, txt_velocidade_importacao], tight=True, width=420),
+        actions=[btn_cancelar_importacao],
+    )
+
+    def mostrar_progresso_importacao(ev):
+        if cancelar_importacao.is_set():
+            return
+        if ev["fase"] == "varrendo":
+            barra_importacao.value = None
+            txt_importacao.value = f"Procurando arquivos... {ev['escaneados']} encontrados"
+        else:
+            barra_importacao.value = (ev["lidos"] / ev["a_ler"]) if ev["a_ler"] else None
+            txt_importacao.value = (f"Arquivos: {ev['escaneados']} | Lidos: {ev['lidos']}/{ev['a_ler']} | "
+                                    f"Gravados: {ev['inseridos']} | Ignorados: {ev['ignorados']} | Erros: {ev['falhas']}")
+            txt_velocidade_importacao.value = f"{ev['arquivos_por_segundo']:.1f} arquivos/s"
+        dlg_importacao.update()
+
     async def handle_get_directory_path_upload(e: ft.Event[ft.Button]):
         state.upload_path = await ft.FilePicker().get_directory_path()
         if state.upload_path:
-            # 1. Avisa que começou (opcional, deixa a interface mais amigável)
-            page.show_dialog(ft.SnackBar(ft.Text("Lendo arquivos DICOM, aguarde..."), bgcolor="blue"))
-            page.update()
-
-            # 2. Chama o nosso novo módulo isolado
-            qtd_sucesso, qtd_erros = dicom_parser.processar_diretorio_dicom(state.upload_path)
+            # 1. Abre o diálogo de progresso
+            cancelar_importacao.clear()
+            btn_cancelar_importacao.disabled = False
+            barra_importacao.value = None
+            txt_importacao.value = "Procurando arquivos..."
+            txt_velocidade_importacao.value = ""
+            page.show_dialog(dlg_importacao)
+
+            # 2. Roda a importação fora do loop da interface; o callback só guarda
+            #    o último evento e a tela é atualizada aqui, a cada 250 ms
+            ultimo_evento = {}
+            from core import dicom_parser
+            tarefa = asyncio.create_task(asyncio.to_thread(
+                dicom_parser.processar_diretorio_dicom, state.upload_path,
+                progresso=lambda ev: ultimo_evento.update(ev), cancelar=cancelar_importacao
+            ))
+            while not tarefa.done():
+                if ultimo_evento: mostrar_progresso_importacao(ultimo_evento)
+                await asyncio.sleep(0.25)
+            qtd_sucesso, qtd_erros = tarefa.result()
+            page.pop_dialog()
 
             # 3. Atualiza a tabela com os novos dados
             atualizar_tudo()
 
             # 4. Dá o feedback final com a contagem exata
-            if qtd_erros > 0:
+            if cancelar_importacao.is_set():
+                msg = f"Importação cancelada: {qtd_sucesso} exames gravados, {qtd_erros} erros."
+                cor = "orange"
+            elif qtd_erros > 0:
                 msg = f"Importação: {qtd_sucesso} lidos, {qtd_erros} erros (ver terminal)."
                 cor = "orange"
             else:
@@ -178,20 +235,66 @@ def main(page: ft.Page):
         else:
             page.update()
 
+    # --- EXPORTAÇÃO EM SEGUNDO PLANO (CSV) ---
+    cancelar_exportacao = threading.Event()
+    barra_exportacao = ft.ProgressBar(width=420, value=None)
+    txt_exportacao = ft.Text("")
+
+    def cancelar_exportacao_click(e):
+        cancelar_exportacao.set()
+        txt_exportacao.value = "Cancelando..."
+        dlg_exportacao.update()
+
+    dlg_exportacao = ft.AlertDialog(
+        modal=True,
+        title=ft.Text("Exportando"),
+        content=ft.Column([barra_exportacao, txt_exportacao], tight=True, width=420),
+        actions=[ft.TextButton("Cancelar", icon=ft.Icons.CANCEL, on_click=cancelar_exportacao_click)],
+    )
+
+    async def executar_exportacao(titulo, funcao, *args, **kwargs):
+        """Roda funcao(*args, progresso=..., cancelar=..., **kwargs) fora do loop da interface, com barra de progresso."""
+        cancelar_exportacao.clear()
+        dlg_exportacao.title.value = titulo
+        barra_exportacao.value = None
+        txt_exportacao.value = "Preparando..."
+        page.show_dialog(dlg_exportacao)
+
+        andamento = {}
+        def progresso(feitos, total):
+            andamento["feitos"], andamento["total"] = feitos, total
+
+        tarefa = asyncio.create_task(asyncio.to_thread(funcao, *args, progresso=progresso, cancelar=cancelar_exportacao, **kwargs))
+        while not tarefa.done():
+            if andamento and not cancelar_exportacao.is_set():
+                barra_exportacao.value = (andamento["feitos"] / andamento["total"]) if andamento["total"] else None
+                txt_exportacao.value = f"{andamento['feitos']} de {andamento['total']} linhas"
+                dlg_exportacao.update()
+            await asyncio.sleep(0.25)
+        page.pop_dialog()
+        return tarefa.result(), cancelar_exportacao.is_set()
+
+    async def salvar_csv(nome_arquivo, apenas_filtrados, inputs_filtros, msg_sucesso):
+        resultado = await ft.FilePicker().save_file(file_name=nome_arquivo, allowed_extensions=["csv"])
+        if not resultado: return
+
+        linhas, cancelado = await executar_exportacao("Exportando CSV", exportar_csv_arquivo, resultado,
+                                                      apenas_filtrados=apenas_filtrados, inputs_filtros=inputs_filtros)
+        # exportar_csv_arquivo só cria o arquivo no fim: cancelado, com erro ou vazio, nada fica no disco
+        if cancelado:
+            page.show_dialog(ft.SnackBar(ft.Text("Exportação cancelada."), bgcolor="orange"))
+        elif linhas is None:
+            page.show_dialog(ft.SnackBar(ft.Text("Erro ao gerar o CSV (ver terminal)."), bgcolor="red"))
+        elif linhas == 0:
+            page.show_dialog(ft.SnackBar(ft.Text("Sem dados com esses filtros." if apenas_filtrados else "Sem dados no banco."), bgcolor="orange"))
+        else:
+            page.show_dialog(ft.SnackBar(ft.Text(f"{msg_sucesso} ({linhas} linhas)"), bgcolor="green"))
+
     # --- handle CSV ---
 
     async def exportar_csv_completo(e: ft.Event[ft.Button]):
-        texto_csv = gerar_csv_string(apenas_filtrados=False)
         nome_arquivo = f"Relatorio_Completo_{datetime.datetime.now().strftime('%Y%m%d')}.csv"
-        resultado = await ft.FilePicker().save_file(file_name=nome_arquivo, allowed_extensions=["csv"])
-        
-        if resultado:
-            try:
-                with open(resultado, 'w', newline='', encoding='utf-8-sig') as f:
-                    f.write(texto_csv)
-                page.show_dialog(ft.SnackBar(ft.Text("Relatório completo salvo!"), bgcolor="green"))
-            except Exception as ex:
-                page.show_dialog(ft.SnackBar(ft.Text(f"Erro: {ex}"), bgcolor="red"))
+        await salvar_csv(nome_arquivo, False, None, "Relatório completo salvo!")
 
     async def exportar_csv_filtrado(e: ft.Event[ft.Button]):
         filtros_atuais = {
@@ -202,22 +305,48 @@ def main(page: ft.Page):
             'sala': sala_entry.value, 'sexo': sexo_entry.value,
             'id_pac': id_paciente_entry.value
         }
-        
-        texto_csv = gerar_csv_string(apenas_filtrados=True, inputs_filtros=filtros_atuais)
-        
-        if not texto_csv:
-             page.show_dialog(ft.SnackBar(ft.Text("Sem dados com esses filtros."), bgcolor="orange")); return
 
         nome_arquivo = f"Relatorio_Filtrado_{datetime.datetime.now().strftime('%Y%m%d')}.csv"
-        
-        resultado = await ft.FilePicker().save_file(file_name=nome_arquivo, allowed_extensions=["csv"])   
-        if resultado:
-            try:
-                with open(resultado, 'w', newline='', encoding='utf-8-sig') as f:
-                    f.write(texto_csv)
-                page.show_dialog(ft.SnackBar(ft.Text("Relatório filtrado salvo!"), bgcolor="green"))
-            except Exception as ex:
-                page.show_dialog(ft.SnackBar(ft.Text(f"Erro: {ex}"), bgcolor="red"))
+        await salvar_csv(nome_arquivo, True, filtros_atuais, "Relatório filtrado salvo!")
+
+    # --- handle Parquet (exportação/importação colunar, requer pyarrow) ---
+
+    async def exportar_parquet_filtrado(e: ft.Event[ft.Button]):
+        if not parquet_io.parquet_disponivel():
+            page.show_dialog(ft.SnackBar(ft.Text("Instale o pyarrow para usar Parquet (pip install pyarrow)."), bgcolor="orange")); return
+
+        filtros = [state.data_inicio, state.data_final, min_dose.value, max_dose.value, medico_entry.value, exame_entry.value,
+                   min_tempo_entry.value, max_tempo_entry.value, min_dap_entry.value, max_dap_entry.value,
+                   sala_entry.value, sexo_entry.value, id_paciente_entry.value]
+        nome_arquivo = f"Exames_{datetime.datetime.now().strftime('%Y%m%d')}.parquet"
+        resultado = await ft.FilePicker().save_file(file_name=nome_arquivo, allowed_extensions=["parquet"])
+        if not resultado: return
+
+        linhas, cancelado = await executar_exportacao("Exportando Parquet", parquet_io.exportar_parquet, resultado, filtros=filtros)
+        if cancelado:
+            page.show_dialog(ft.SnackBar(ft.Text("Exportação cancelada."), bgcolor="orange"))
+        elif linhas is None:
+            page.show_dialog(ft.SnackBar(ft.Text("Erro ao gerar o Parquet (ver terminal)."), bgcolor="red"))
+        else:
+            page.show_dialog(ft.SnackBar(ft.Text(f"Parquet salvo! ({linhas} linhas)"), bgcolor="green"))
+
+    async def importar_parquet(e: ft.Event[ft.Button]):
+        if not state.FILE_PATH:
+            page.show_dialog(ft.SnackBar(ft.Text("Selecione um banco de dados primeiro."), bgcolor="orange")); return
+        if not parquet_io.parquet_disponivel():
+            page.show_dialog(ft.SnackBar(ft.Text("Instale o pyarrow para usar Parquet (pip install pyarrow)."), bgcolor="orange")); return
+
+        files = await ft.FilePicker().pick_files(allowed_extensions=["parquet"])
+        if not files: return
+
+        resultado, cancelado = await executar_exportacao("Importando Parquet", parquet_io.importar_parquet, files[0].path)
+        atualizar_tudo()
+        if resultado is None:
+            page.show_dialog(ft.SnackBar(ft.Text("Erro ao importar o Parquet (ver terminal)."), bgcolor="red")); return
+        inseridos, falhas, ignorados = resultado
+        msg = f"Parquet: {inseridos} exames importados, {ignorados} já existentes, {falhas} erros."
+        if cancelado: msg = "Importação cancelada. " + msg
+        page.show_dialog(ft.SnackBar(ft.Text(msg), bgcolor="orange" if (falhas or cancelado) else "green"))
 
     # --- Hendler Para montar Relatório (PDF) ---
 
@@ -232,105 +361,12 @@ def main(page: ft.Page):
         filepath = await ft.FilePicker().save_file(file_name=nome_sugerido, allowed_extensions=["pdf"])
         if not filepath: return
 
+        filtros = [state.data_inicio, state.data_final, v_min, v_max, v_med, v_exm, v_min_t, v_max_t, v_min_dap, v_max_dap, v_sala, v_sexo, v_id_pac]
         try:
-            conn = db.conectar()
-            cursor = conn.cursor()
-            sql_where, params = db.montar_query_filtros(state.data_inicio, state.data_final, v_min, v_max, v_med, v_exm, v_min_t, v_max_t, v_min_dap, v_max_dap, v_sala, v_sexo, v_id_pac)
-
-            cursor.execute(f"SELECT data, medico, exam, dose_mgy, tempo {sql_where} ORDER BY CAST(REPLACE(dose_mgy, ',', '.') AS REAL) DESC LIMIT 10", params)
-            top10_dados = cursor.fetchall()
-            
-            cursor.execute(f"SELECT COUNT(*) {sql_where}", params)
-            total_exames = cursor.fetchone()[0]
-            conn.close()
-
-            pdf = RelatorioPDF()
-            pdf.add_page()
-            
-            pdf.set_font("helvetica", "B", 12)
-            pdf.cell(0, 8, "Filtros Aplicados:", new_x="LMARGIN", new_y="NEXT")
-            pdf.set_font("helvetica", "", 10)
-            pdf.cell(0, 6, f"Período: {state.data_inicio if state.data_inicio else 'Início'} a {state.data_final if state.data_final else 'Hoje'}", new_x="LMARGIN", new_y="NEXT")
-            pdf.cell(0, 6, f"Médico(s): {v_med if v_med else 'Todos'}", new_x="LMARGIN", new_y="NEXT")
-            pdf.cell(0, 6, f"Exame: {v_exm if v_exm else 'Todos'}", new_x="LMARGIN", new_y="NEXT")
-            pdf.ln(5)
-
-            def colocar_grafico_no_pdf(funcao_grafico):
-                temp_file = tempfile.NamedTemporaryFile(delete=False, suffix=".png").name
-                gerou_com_sucesso = funcao_grafico(caminho_oculto=temp_file) 
-                
-                if gerou_com_sucesso:
-                    if pdf.get_y() > 200: pdf.add_page() 
-                    pdf.image(temp_file, w=180)
-                    pdf.ln(5)
-                
-                if os.path.exists(temp_file): os.unlink(temp_file)
-
-            unico_dia = bool(state.data_inicio and state.data_final and state.data_inicio == state.data_final)
-            unico_medico = bool(v_med and ";" not in v_med)
-
-            if unico_dia:
-                pdf.set_font("helvetica", "B", 14)
-                pdf.set_text_color(0, 100, 0)
-                dfmt = state.data_inicio[8:10] + "/" + state.data_inicio[5:7] + "/" + state.data_inicio[0:4]
-                pdf.cell(0, 10, f"Total de Exames no dia {dfmt}: {total_exames}", new_x="LMARGIN", new_y="NEXT", align="C")
-                pdf.set_text_color(0, 0, 0); pdf.ln(5)
-            else:
-                colocar_grafico_no_pdf(salvar_grafico_evolucao)
-
-            if not unico_medico:
-                colocar_grafico_no_pdf(salvar_grafico_dose_medico)
-                colocar_grafico_no_pdf(salvar_grafico_tempo_medico)
-
-            colocar_grafico_no_pdf(salvar_grafico_dose_exame)
-            colocar_grafico_no_pdf(salvar_grafico_tempo_exame)
-
-            if pdf.get_y() > 200: pdf.add_page()
-            pdf.set_font("helvetica", "B", 12)
-            pdf.cell(0, 10, "Atenção: Top 10 Maiores Doses no Período", new_x="LMARGIN", new_y="NEXT")
-            
-            pdf.set_font("helvetica", "B", 10); pdf.set_fill_color(200, 200, 200)
-            pdf.cell(30, 8, "Data", border=1, fill=True); pdf.cell(50, 8, "Médico", border=1, fill=True)
-            pdf.cell(60, 8, "Exame", border=1, fill=True); pdf.cell(25, 8, "Dose", border=1, fill=True)
-            pdf.cell(25, 8, "Tempo", border=1, fill=True, new_x="LMARGIN", new_y="NEXT")
-
-            pdf.set_font("helvetica", "", 9)
-            for row in top10_dados:
-                ds = str(row[3]) if row[3] else "0.0"
-                pdf.cell(30, 8, str(row[0]).split()[0] if row[0] else "N/A", border=1)
-                pdf.cell(50, 8, str(row[1])[:20] if row[1] else "N/A", border=1)
-                pdf.cell(60, 8, str(row[2])[:25] if row[2] else "N/A", border=1)
-                
-                # --- LÓGICA DE CORES DA DOSE (RGB) ---
-                try:
-                    valor_dose = float(ds.replace(',', '.'))
-                    if valor_dose >= 5000:
-                        pdf.set_text_color(255, 0, 0) # Vermelho
-                        pdf.set_font("helvetica", "B", 9)
-                    elif valor_dose >= 4000:
-                        pdf.set_text_color(255, 128, 0) # Laranja
-                        pdf.set_font("helvetica", "B", 9)
-                    elif valor_dose >= 3000:
-                        pdf.set_text_color(204, 153, 0) # Amarelo (Mostarda para leitura no branco)
-                        pdf.set_font("helvetica", "B", 9)
-                    elif valor_dose >= 2000:
-                        pdf.set_text_color(0, 0, 255) # Azul
-                        pdf.set_font("helvetica", "B", 9)
-                    elif valor_dose >= 1000:
-                        pdf.set_text_color(143, 0, 255) # Roxo
-                        pdf.set_font("helvetica", "B", 9)
-                    else:
-                        pdf.set_text_color(0, 0, 0) # Preto padrão
-                        pdf.set_font("helvetica", "", 9)
-                except (ValueError, TypeError):
-                    pdf.set_text_color(0, 0, 0) # Falha segura (Preto)
-                    pdf.set_font("helvetica", "", 9)
-                
-                pdf.cell(25, 8, ds, border=1)
-                pdf.set_text_color(0, 0, 0); pdf.set_font("helvetica", "", 9)
-                pdf.cell(25, 8, str(row[4])[:8] if row[4] else "N/A", border=1, new_x="LMARGIN", new_y="NEXT")
-
-            pdf.output(filepath)
+            page.show_dialog(ft.SnackBar(ft.Text("Gerando relatório PDF..."), bgcolor="blue"))
+            # Gráficos desenhados em processos paralelos; a interface segue respondendo
+            from reports.pdf_export import gerar_relatorio_pdf
+            await asyncio.to_thread(gerar_relatorio_pdf, filepath, filtros)
             page.show_dialog(ft.SnackBar(ft.Text("Relatório PDF gerado com sucesso!"), bgcolor="green"))
 
         except Exception as err:
@@ -338,15 +374,22 @@ def main(page: ft.Page):
 
     
     # --- TABELA ---
-    tabela = charts_ui.criar_tabela_dados()
+    tabela = tabela_ui.TabelaVirtual(ao_abrir=lambda id_exame: abrir_eventos(id_exame))
 
     # --- CONFIG GRÁFICOS ---
-    # Instanciando gráficos da nova UI
-    grafico_barras = charts_ui.criar_grafico_base("Dose Média")
-    grafico_tempo = charts_ui.criar_grafico_base("Minutos Médios")
-    grafico_exame = charts_ui.criar_grafico_base("Dose / Exame")
-    grafico_tempo_exame = charts_ui.criar_grafico_base("Tempo / Exame")
-    grafico_linha = charts_ui.criar_grafico_linha_base("Qtd Exames")
+    # Criados na primeira vez que o dashboard aparece (ver carregar_graficos)
+    grafico_barras = grafico_tempo = grafico_exame = grafico_tempo_exame = grafico_linha = None
+    dashboard_desatualizado = True
+
+    def carregar_graficos():
+        nonlocal grafico_barras, grafico_tempo, grafico_exame, grafico_tempo_exame, grafico_linha
+        if grafico_barras is not None: return
+        from ui import charts_ui
+        grafico_barras = charts_ui.criar_grafico_base("Dose Média")
+        grafico_tempo = charts_ui.criar_grafico_base("Minutos Médios")
+        grafico_exame = charts_ui.criar_grafico_base("Dose / Exame")
+        grafico_tempo_exame = charts_ui.criar_grafico_base("Tempo / Exame")
+        grafico_linha = charts_ui.criar_grafico_linha_base("Qtd Exames")
 
     # --- INPUTS ---
     min_dose = ft.TextField(label="Dose min", keyboard_type="number", width=150)
@@ -377,6 +420,35 @@ def main(page: ft.Page):
     page.overlay.append(drp)
 
     
+    # --- EVENTOS DE IRRADIAÇÃO (carregados só ao abrir a linha) ---
+    def formatar_valor_evento(valor, casas=2):
+        if valor is None: return "-"
+        if isinstance(valor, float): return f"{valor:.{casas}f}".replace('.', ',')
+        return str(valor)
+
+    def abrir_eventos(id_exame):
+        eventos = db.carregar_eventos_exame(id_exame)
+        if not eventos:
+            page.show_dialog(ft.SnackBar(ft.Text(f"Exame {id_exame} sem eventos de irradiação registrados."), bgcolor="orange"))
+            return
+
+        colunas = [("#", "ordem", 0), ("Início", "data_hora", 0), ("Tipo", "tipo", 0), ("Dose RP (mGy)", "dose_rp", 2),
+                   ("DAP", "dap", 2), ("Duração (s)", "duracao", 1), ("kVp", "kvp", 0), ("mA", "corrente_ma", 0),
+                   ("Ângulo 1º", "angulo_primario", 0), ("Ângulo 2º", "angulo_secundario", 0),
+                   ("CTDIvol", "ctdivol", 2), ("DLP", "dlp", 1)]
+        tabela_eventos = ft.DataTable(
+            columns=[ft.DataColumn(ft.Text(titulo)) for titulo, _, _ in colunas],
+            rows=[ft.DataRow(cells=[ft.DataCell(ft.Text(formatar_valor_evento(ev[chave], casas), selectable=True)) for _, chave, casas in colunas])
+                  for ev in eventos],
+        )
+        dose_total = sum(ev["dose_rp"] or 0 for ev in eventos)
+        dlg_eventos = ft.AlertDialog(
+            title=ft.Text(f"Exame {id_exame}: {len(eventos)} eventos (dose RP somada: {formatar_valor_evento(dose_total)} mGy)"),
+            content=ft.Column([ft.Row([tabela_eventos], scroll=ft.ScrollMode.AUTO)], height=500, width=1000, scroll=ft.ScrollMode.AUTO),
+            actions=[ft.TextButton("Fechar", on_click=lambda e: page.pop_dialog())],
+        )
+        page.show_dialog(dlg_eventos)
+
     # --- FUNÇÃO PRINCIPAL DE ATUALIZAÇÃO DA TELA ---
 
     # 1. ATUALIZA SÓ A TABELA (Leve e Rápida)
@@ -386,60 +458,26 @@ def main(page: ft.Page):
         v_min_dap, v_max_dap = min_dap_entry.value, max_dap_entry.value
         v_med, v_exm, v_sala = medico_entry.value, exame_entry.value, sala_entry.value
         v_sexo, v_id_pac = sexo_entry.value, id_paciente_entry.value
-        
-        offset = (state.pagina_atual - 1) * state.itens_por_pagina
-        
-        dados, total_registros = db.carregar_dados_banco(state.data_inicio, state.data_final, v_min, v_max, v_med, v_exm, v_min_t, v_max_t, v_min_dap, v_max_dap, v_sala, v_sexo, v_id_pac, state.itens_por_pagina, offset)
-        
-        tabela.rows.clear()
-        
-        for row in dados:
-            try:
-                valor_dose = float(str(row[4]).replace(',', '.'))
-            except (ValueError, TypeError):
-                valor_dose = 0.0
-
-            if valor_dose >= 1000 and valor_dose < 2000:
-                color_icon, color_text = "#8F00FF", "#8F00FF" # Roxo
-            elif valor_dose >= 2000 and valor_dose < 3000:
-                color_icon, color_text = ft.Colors.BLUE, ft.Colors.BLUE
-            elif valor_dose >= 3000 and valor_dose < 4000:
-                color_icon, color_text = ft.Colors.YELLOW, ft.Colors.YELLOW
-            elif valor_dose >= 4000 and valor_dose < 5000:
-                color_icon, color_text = ft.Colors.ORANGE, ft.Colors.ORANGE
-            elif valor_dose >= 5000:
-                color_icon, color_text = ft.Colors.RED, ft.Colors.RED
-            else:
-                color_icon, color_text = None, None
 
-            if color_icon:
-                celula_dose = ft.Row([ft.Icon(ft.Icons.WARNING_AMBER_ROUNDED, color=color_icon, size=16), ft.Text(str(row[4]), color=color_text, weight="bold", selectable=True)], spacing=5)
-            else:
-                celula_dose = ft.Text(str(row[4]) if row[4] else "", selectable=True)
-
-            tabela.rows.append(ft.DataRow(cells=[
-                ft.DataCell(ft.Text(str(row[0]), weight="bold", selectable=True)),
-                ft.DataCell(ft.Text(formatar_data(row[1]), selectable=True)),
-                ft.DataCell(ft.Text(str(row[2])[:20] if row[2] else "", selectable=True)),
-                ft.DataCell(ft.Text(str(row[3]) if row[3] else "", selectable=True)),
-                ft.DataCell(ft.Text(str(formatar_tempo(row[5])) if row[5] else "", selectable=True)),
-                ft.DataCell(ft.Text(str(row[7]) if row[7] else "", selectable=True)),
-                ft.DataCell(ft.Text(str(row[8]) if row[8] else "", selectable=True)),
-                ft.DataCell(ft.Text(str(row[9]) if row[9] else "", selectable=True)),
-                ft.DataCell(ft.Text(str(float(row[6])) if row[6] else "", selectable=True)),
-                ft.DataCell(celula_dose),
-            ]))
-        
-        total_paginas = math.ceil(total_registros / state.itens_por_pagina) if total_registros > 0 else 1
-        txt_paginacao.value = f"Página {state.pagina_atual} de {total_paginas} (Total: {total_registros})"
-        btn_anterior.disabled = (state.pagina_atual == 1)
-        btn_proximo.disabled = (state.pagina_atual >= total_paginas)
-        tabela.update()
-        controles_paginacao.update()
+        # A janela visível é relida com estes filtros; rolar a tabela busca os blocos seguintes
+        tabela.recarregar([state.data_inicio, state.data_final, v_min, v_max, v_med, v_exm, v_min_t, v_max_t, v_min_dap, v_max_dap, v_sala, v_sexo, v_id_pac])
 
 
     # 2. ATUALIZA SÓ O GRÁFICO SELECIONADO (Otimizado)
     def atualizar_apenas_graficos(e=None):
+        nonlocal dashboard_desatualizado
+        # Com a aba de dados aberta, só marca o dashboard para ser refeito ao ser exibido
+        if not conteudo_dashboard.visible:
+            dashboard_desatualizado = True
+            return
+        dashboard_desatualizado = False
+        fase = perfil.inicio_fase()
+        carregar_graficos()
+        import flet_charts as fch
+        from ui import charts_ui
+        perfil.fim_fase("graficos.carregar", fase)
+
+        fase = perfil.inicio_fase()
         tipo = selecao_grafico.value
         
         v_min, v_max = min_dose.value, max_dose.value
@@ -453,55 +491,51 @@ def main(page: ft.Page):
         funcao_salvar = None
 
         if tipo == "Evolução Temporal (Linha)":
-            titulo_grafico = "Evolução Temporal (Exames/Dia)"
             funcao_salvar = handle_get_directory_path_evolucao
             
-            dados_evo, modo_mult_evo = analytics.calcular_evolucao_temporal(state.data_inicio, state.data_final, v_min, v_max, v_med, v_exm, v_min_t, v_max_t, v_min_dap, v_max_dap, v_sala, v_sexo, v_id_pac)
+            serie_evo, modo_mult_evo = analytics.calcular_evolucao_temporal(state.data_inicio, state.data_final, v_min, v_max, v_med, v_exm, v_min_t, v_max_t, v_min_dap, v_max_dap, v_sala, v_sexo, v_id_pac)
             
-            if dados_evo:
-                if not modo_mult_evo:
-                    pontos = []
-                    for i, r in enumerate(dados_evo):
-                        data_fmt = r[0]
-                        pontos.append(fch.LineChartDataPoint(x=i, y=r[1], tooltip=f"Data: {data_fmt}\nQtd: {r[1]}"))
-                    
-                    step = max(1, int(len(dados_evo) / 6))
-                    lbl_x = [fch.ChartAxisLabel(value=i, label=ft.Container(ft.Text(r[0][5:].replace("-","/"), size=10, weight="bold"), padding=ft.Padding.only(top=10))) for i, r in enumerate(dados_evo) if i % step == 0]
-
-                    grafico_linha.data_series = [fch.LineChartData(points=pontos, stroke_width=3, color=ft.Colors.CYAN, curved=True, below_line_bgcolor=ft.Colors.with_opacity(0.2, ft.Colors.CYAN))]
-                    grafico_linha.bottom_axis.labels = lbl_x
-                    grafico_linha.max_x = len(dados_evo) - 1
-                    grafico_linha.max_y = (max([r[1] for r in dados_evo]) * 1.2) if dados_evo else 10
-                
-                else:
-                    datas_unicas = sorted(list(set(r[0] for r in dados_evo)))
-                    medicos_unicos = sorted(list(set(r[1] for r in dados_evo)))
-
-                    mapa_dados = {med: {d: 0 for d in datas_unicas} for med in medicos_unicos}
-                    for r in dados_evo:
-                        mapa_dados[r[1]][r[0]] = r[2] 
-
-                    cores = [ft.Colors.CYAN, ft.Colors.PINK, ft.Colors.LIME, ft.Colors.ORANGE, ft.Colors.PURPLE, ft.Colors.RED]
-                    series = []
-                    max_y_val = 0
-
-                    for idx_med, medico in enumerate(medicos_unicos):
-                        pontos = []
-                        cor = cores[idx_med % len(cores)]
-                        for i, data_exm in enumerate(datas_unicas):
-                            qtd = mapa_dados[medico][data_exm]
-                            if qtd > max_y_val: max_y_val = qtd
-                            pontos.append(fch.LineChartDataPoint(x=i, y=qtd, tooltip=f"{medico}\nData: {data_exm}\nQtd: {qtd}"))
-                        
-                        series.append(fch.LineChartData(points=pontos, stroke_width=3, color=cor, curved=True))
-
-                    step = max(1, int(len(datas_unicas) / 6))
-                    lbl_x = [fch.ChartAxisLabel(value=i, label=ft.Container(ft.Text(d[5:].replace("-","/"), size=10, weight="bold"), padding=ft.Padding.only(top=10))) for i, d in enumerate(datas_unicas) if i % step == 0]
-
-                    grafico_linha.data_series = series
-                    grafico_linha.bottom_axis.labels = lbl_x
-                    grafico_linha.max_x = len(datas_unicas) - 1
-                    grafico_linha.max_y = max_y_val * 1.2 if max_y_val > 0 else 10
+            # Períodos longos são agrupados por semana/mês para não mandar milhares de pontos ao gráfico
+            nivel = NIVEIS_GRAFICO[selecao_nivel.value]
+            serie_evo = analytics.reduzir_serie(serie_evo, nivel=nivel)
+            titulo_grafico = f"Evolução Temporal (Exames/{rotulo_nivel(serie_evo)})"
+
+            if serie_evo:
+                # Uma coluna de valores por série (só "Exames" fora do modo múltiplo), já com os dias sem exame
+                datas_txt = serie_evo["datas"].astype(str).tolist()
+                ates_txt = serie_evo["ate"].astype(str).tolist()
+                valores, picos = serie_evo["valores"], serie_evo["picos"]
+                agrupado = bool((serie_evo["ate"] != serie_evo["datas"]).any())
+                cores = [ft.Colors.CYAN, ft.Colors.PINK, ft.Colors.LIME, ft.Colors.ORANGE, ft.Colors.PURPLE, ft.Colors.RED]
+                series = []
+                for idx_serie, nome in enumerate(serie_evo["series"]):
+                    prefixo = f"{nome}\n" if modo_mult_evo else ""
+                    if agrupado:
+                        pontos = [
+                            fch.LineChartDataPoint(x=i, y=qtd, tooltip=f"{prefixo}{de} a {ate}\nQtd: {qtd}\nMáx. em um dia: {pico}")
+                            for i, (de, ate, qtd, pico) in enumerate(zip(datas_txt, ates_txt, valores[:, idx_serie].tolist(), picos[:, idx_serie].tolist()))
+                        ]
+                    else:
+                        pontos = [
+                            fch.LineChartDataPoint(x=i, y=qtd, tooltip=f"{prefixo}Data: {data_exm}\nQtd: {qtd}")
+                            for i, (data_exm, qtd) in enumerate(zip(datas_txt, valores[:, idx_serie].tolist()))
+                        ]
+                    if modo_mult_evo:
+                        series.append(fch.LineChartData(points=pontos, stroke_width=3, color=cores[idx_serie % len(cores)], curved=True))
+                    else:
+                        series.append(fch.LineChartData(points=pontos, stroke_width=3, color=ft.Colors.CYAN, curved=True, below_line_bgcolor=ft.Colors.with_opacity(0.2, ft.Colors.CYAN)))
+
+                step = max(1, int(len(datas_txt) / 6))
+                formato_rotulo = (lambda d: f"{d[5:7]}/{d[:4]}") if serie_evo["nivel"] == "mes" else (lambda d: d[5:].replace("-","/"))
+                lbl_x = [fch.ChartAxisLabel(value=i, label=ft.Container(ft.Text(formato_rotulo(d), size=10, weight="bold"), padding=ft.Padding.only(top=10))) for i, d in enumerate(datas_txt) if i % step == 0]
+
+                max_y_val = int(valores.max())
+                grafico_linha.data_series = series
+                grafico_linha.bottom_axis.labels = lbl_x
+                grafico_linha.max_x = len(datas_txt) - 1
+                grafico_linha.max_y = max_y_val * 1.2 if max_y_val > 0 else 10
+                # Somas por semana/mês chegam a milhares: uma linha de grade por unidade pesaria mais que os pontos
+                grafico_linha.horizontal_grid_lines.interval = max(1, math.ceil(grafico_linha.max_y / 10))
 
             else:
                 grafico_linha.data_series = []
@@ -535,9 +569,13 @@ def main(page: ft.Page):
             res, modo_mult = analytics.calcular_media_tempo_exame(state.data_inicio, state.data_final, v_min, v_max, v_med, v_exm, v_min_t, v_max_t, v_min_dap, v_max_dap, v_sala, v_sexo, v_id_pac)
             charts_ui.popular_grafico_agrupado(res, grafico_tempo_exame, modo_mult, [ft.Colors.BROWN, ft.Colors.CYAN, ft.Colors.LIME], " min")
             grafico_obj = grafico_tempo_exame
+        perfil.fim_fase(f"graficos.montar.{tipo}", fase)
 
+        fase = perfil.inicio_fase()
+        selecao_nivel.visible = (tipo == "Evolução Temporal (Linha)")
         cabecalho = ft.Row([
             ft.Text(titulo_grafico, size=20, weight="bold"),
+            selecao_nivel,
             ft.IconButton(
                 icon=ft.Icons.SAVE_ALT, 
                 tooltip="Salvar Gráfico como PNG", 
@@ -552,6 +590,7 @@ def main(page: ft.Page):
         ])
         
         container_grafico_ativo.update()
+        perfil.fim_fase("graficos.update", fase)
 
     # 3. O MAESTRO (Atualiza o que for necessário)
     def atualizar_tudo(e=None):
@@ -817,25 +856,23 @@ def main(page: ft.Page):
 
 
     # --- BOTÕES AÇÃO ---
+    def voltar_primeira_pagina():
+        tabela.voltar_ao_inicio()
+
     def acao_filtrar(e): 
-        state.pagina_atual = 1
+        voltar_primeira_pagina()
         atualizar_tudo()
         
     def limpar_filtros(e):
         state.data_inicio = ""
         state.data_final = ""
-        state.pagina_atual = 1
+        voltar_primeira_pagina()
         min_dose.value = ""; max_dose.value = ""; min_tempo_entry.value = ""; max_tempo_entry.value = ""; min_dap_entry.value = ""; max_dap_entry.value = ""; medico_entry.value = ""; exame_entry.value = None
         sala_entry.value = ""; txt_datas.value = "Nenhuma data selecionada"
         sexo_entry.value = None
         id_paciente_entry.value = ""
         atualizar_tudo()
         
-    def mudar_pagina(d):
-        state.pagina_atual += d
-        state.pagina_atual = max(1, state.pagina_atual) 
-        atualizar_apenas_tabela()
-
 
     # --- APOIO / PIX ---
     
@@ -911,11 +948,6 @@ def main(page: ft.Page):
 
     # Botões Principais
 
-    btn_anterior = ft.IconButton(icon=ft.Icons.ARROW_BACK, on_click=lambda _: mudar_pagina(-1))
-    btn_proximo = ft.IconButton(icon=ft.Icons.ARROW_FORWARD, on_click=lambda _: mudar_pagina(1))
-    txt_paginacao = ft.Text(f"Página {state.pagina_atual}")
-    controles_paginacao = ft.Row(controls=[btn_anterior, txt_paginacao, btn_proximo], alignment=ft.MainAxisAlignment.CENTER)
-
     btn_filtrar = ft.Button("Filtrar", icon=ft.Icons.SEARCH, on_click=acao_filtrar)
     btn_limpar = ft.FilledButton("Limpar", on_click=limpar_filtros, style=ft.ButtonStyle(bgcolor=ft.Colors.GREY))
     def abrir_cal(e): drp.open=True; page.update()
@@ -950,6 +982,20 @@ def main(page: ft.Page):
         on_click=exportar_csv_filtrado
     )
 
+    btn_parquet = ft.IconButton(
+        icon=ft.Icons.DATASET, 
+        tooltip="Baixar Visualização Atual (Parquet)", 
+        icon_color=ft.Colors.TEAL, 
+        on_click=exportar_parquet_filtrado
+    )
+
+    btn_parquet_importar = ft.IconButton(
+        icon=ft.Icons.DRIVE_FOLDER_UPLOAD, 
+        tooltip="Importar exames de um arquivo Parquet", 
+        icon_color=ft.Colors.TEAL, 
+        on_click=importar_parquet
+    )
+
     btn_pdf = ft.IconButton(
         icon=ft.Icons.PICTURE_AS_PDF, 
         tooltip="Gerar Relatório em PDF (Filtrado)", 
@@ -970,6 +1016,14 @@ def main(page: ft.Page):
         value="Média de Dose por Médico", 
         on_select=atualizar_apenas_graficos
     )
+    # Nível de detalhe da evolução temporal: "Automático" agrupa conforme o período (state.max_pontos_grafico)
+    selecao_nivel = ft.Dropdown(
+        label="Detalhe",
+        width=170,
+        options=[ft.dropdown.Option(nome) for nome in NIVEIS_GRAFICO],
+        value="Automático",
+        on_select=atualizar_apenas_graficos
+    )
     # --- LAYOUT CRUD ---
     btn_add = ft.FilledButton("Adicionar", icon=ft.Icons.ADD, style=ft.ButtonStyle(bgcolor=ft.Colors.GREEN, color=ft.Colors.WHITE), on_click=open_add_dialog)
     btn_edit = ft.FilledButton("Editar", icon=ft.Icons.EDIT, style=ft.ButtonStyle(bgcolor=ft.Colors.ORANGE, color=ft.Colors.WHITE), on_click=open_edit_ask_id)
@@ -984,7 +1038,7 @@ def main(page: ft.Page):
 
     # Layout Conteúdo Tabela
     conteudo_tabela = ft.Column(
-        controls=[ft.Row(controls=[btn_add, btn_edit, btn_rem], alignment=ft.MainAxisAlignment.CENTER), ft.Row(scroll=ft.ScrollMode.ADAPTIVE, controls=[tabela]), ft.Row(controls=[controles_paginacao, btn_csv_filter, btn_csv_full, btn_pdf ])],
+        controls=[ft.Row(controls=[btn_add, btn_edit, btn_rem], alignment=ft.MainAxisAlignment.CENTER), ft.Row(scroll=ft.ScrollMode.ADAPTIVE, controls=[tabela.controle]), ft.Row(controls=[tabela.txt_posicao, btn_csv_filter, btn_csv_full, btn_parquet, btn_parquet_importar, btn_pdf ])],
         scroll=ft.ScrollMode.ADAPTIVE, expand=True, visible=True
     )
     
@@ -1015,10 +1069,16 @@ def main(page: ft.Page):
             conteudo_tabela.visible = False
             conteudo_dashboard.visible = True
             conteudo_dashboard.update()
+            if dashboard_desatualizado: atualizar_apenas_graficos()
 
     nav_bar = ft.NavigationBar(selected_index=0, on_change=trocar_aba, destinations=[ft.NavigationBarDestination(icon=ft.Icons.LIST_ALT, label="Dados"), ft.NavigationBarDestination(icon=ft.Icons.BAR_CHART, label="Dashboard")])
     page.add( ft.Divider(), linha_1, linha_2, linha_3, ft.Divider(), ft.Column(controls=[conteudo_tabela, conteudo_dashboard], expand=True), nav_bar)
     atualizar_tudo()
 
+    # Usado por benchmarks/bench_inicializacao.py --app: tempo do lançamento até a primeira tela pronta
+    if os.environ.get("OPENZOE_TEMPO_INICIO"):
+        print(f"OPENZOE_PRIMEIRA_TELA_MS={(time.time() - float(os.environ['OPENZOE_TEMPO_INICIO'])) * 1000:.0f}", flush=True)
+
 if __name__ == "__main__":
+    multiprocessing.freeze_support()
     ft.run(main)
@@ -2,25 +2,28 @@
 import matplotlib
 matplotlib.use('Agg')
 import matplotlib.pyplot as plt
+import atexit
 import datetime
+import io
+import multiprocessing
 import os
+from concurrent.futures import ProcessPoolExecutor
+from concurrent.futures.process import BrokenProcessPool
+from config import state
+from core import perfil
+from core.cache import criar_cache, consultar_cache, guardar_cache, normalizar, versao_dados
 
 def gerar_png_evolucao(dados, modo_multiplo, diretorio, caminho_oculto=None):
+    """dados é a série de analytics.calcular_evolucao_temporal (datas × séries)."""
     try:
         plt.figure(figsize=(12, 6))
+        datas, valores = dados["datas"], dados["valores"]
         if not modo_multiplo:
-            eixo_x = [d[0] for d in dados]
-            eixo_y = [d[1] for d in dados]
-            plt.plot(eixo_x, eixo_y, marker='o', linestyle='-', color='b')
+            plt.plot(datas, valores[:, 0], marker='o', linestyle='-', color='b')
         else:
-            datas_unicas = sorted(list(set(d[0] for d in dados)))
-            medicos_unicos = sorted(list(set(d[1] for d in dados)))
-            mapa_dados = {med: {d: 0 for d in datas_unicas} for med in medicos_unicos}
-            for r in dados: mapa_dados[r[1]][r[0]] = r[2]
             cores = plt.cm.tab10.colors
-            for i, medico in enumerate(medicos_unicos):
-                y_vals = [mapa_dados[medico][d] for d in datas_unicas]
-                plt.plot(datas_unicas, y_vals, marker='o', linestyle='-', label=medico, color=cores[i % len(cores)])
+            for i, medico in enumerate(dados["series"]):
+                plt.plot(datas, valores[:, i], marker='o', linestyle='-', label=medico, color=cores[i % len(cores)])
             plt.legend(title="Médicos")
 
         plt.title("Evolução Temporal de Exames")
@@ -150,4 +153,79 @@ def gerar_png_tempo_exame(dados, modo_multiplo, diretorio, caminho_oculto=None):
 
         nome_arquivo = os.path.join(diretorio, f"Tempo_exame_{datetime.datetime.now().strftime('%Y%m%d_%H%M%S')}.png")
         plt.savefig(nome_arquivo, dpi=300); plt.close(); return True, os.path.basename(nome_arquivo)
-    except Exception as e: return False, str(e)
\ No newline at end of file
+    except Exception as e: return False, str(e)
+
+# --- RENDERIZAÇÃO PARA O PDF (em memória, em paralelo e com cache) ---
+
+# tipo -> (função de desenho, recebe modo_multiplo)
+GRAFICOS = {
+    "evolucao": (gerar_png_evolucao, True),
+    "dose_medico": (gerar_png_dose_medico, False),
+    "tempo_medico": (gerar_png_tempo_medico, False),
+    "dose_exame": (gerar_png_dose_exame, True),
+    "tempo_exame": (gerar_png_tempo_exame, True),
+}
+
+_cache_png = criar_cache("reports.charts_export.png")
+_executor = None
+
+def renderizar_png(tipo, dados, modo_multiplo=False):
+    """Desenha o gráfico direto num buffer. Retorna (tipo, bytes do PNG ou None, erro)."""
+    funcao, usa_modo = GRAFICOS[tipo]
+    buffer = io.BytesIO()
+    if usa_modo:
+        sucesso, msg = funcao(dados, modo_multiplo, None, buffer)
+    else:
+        sucesso, msg = funcao(dados, None, buffer)
+    if not sucesso: return tipo, None, msg
+    return tipo, buffer.getvalue(), None
+
+def _obter_executor():
+    """Pool de processos criado na primeira vez e reaproveitado entre relatórios."""
+    global _executor
+    if _executor is None:
+        # spawn, não fork: o PDF é gerado numa thread do processo do Flet, que tem outras threads vivas
+        _executor = ProcessPoolExecutor(max_workers=state.workers_graficos, mp_context=multiprocessing.get_context("spawn"))
+        atexit.register(_executor.shutdown, wait=False, cancel_futures=True)
+    return _executor
+
+def renderizar_graficos(pedidos, assinatura):
+    """
+    pedidos é uma lista de (tipo, dados, modo_multiplo) e assinatura identifica os
+    filtros que geraram os dados. Os PNGs ficam em cache por (banco, tipo, filtros,
+    versão dos dados), com a assinatura normalizada como no cache de filtros: só vale
+    porque db.montar_query_filtros também apara os textos antes de consultar.
+    Os que faltam são desenhados ao mesmo tempo em processos.
+    Retorna {tipo: bytes do PNG}; gráficos que falharem ficam de fora.
+    """
+    global _executor
+    versao = versao_dados()
+    imagens = {}
+    faltando = []
+    for tipo, dados, modo in pedidos:
+        achou, png = consultar_cache(_cache_png, (state.FILE_PATH, tipo, normalizar(assinatura), versao))
+        if achou: imagens[tipo] = png
+        else: faltando.append((tipo, dados, modo))
+
+    resultados = []
+    if len(faltando) > 1 and state.workers_graficos > 1:
+        try:
+            executor = _obter_executor()
+            futuros = [executor.submit(renderizar_png, tipo, dados, modo) for tipo, dados, modo in faltando]
+            resultados = [f.result() for f in futuros]
+        except (BrokenProcessPool, OSError, NotImplementedError) as e:
+            print(f"Renderização paralela indisponível ({e}), seguindo em um processo.")
+            _executor = None
+            resultados = []
+    if len(resultados) != len(faltando):
+        resultados = [renderizar_png(tipo, dados, modo) for tipo, dados, modo in faltando]
+
+    for tipo, png, erro in resultados:
+        if png is None:
+            print(f"Erro ao gerar gráfico {tipo}: {erro}")
+            continue
+        imagens[tipo] = png
+        guardar_cache(_cache_png, (state.FILE_PATH, tipo, normalizar(assinatura), versao), png, versao)
+    return imagens
+
+perfil.instrumentar(__name__)
@@ -1,57 +1,85 @@
 
 # reports/csv_export.py
 import csv
-import io
+import os
+import tempfile
 from core import database as db
 from config import state
 from core.utils import formatar_data, formatar_tempo
 
-def gerar_csv_string(apenas_filtrados=False, inputs_filtros=None):
+COLUNAS_HEADER = [
+    "ID", "Data", "Médico", "Exame", "Dose (mGy)",
+    "Tempo", "DAP", "ID Paciente", "Sexo", "Sala"
+]
+
+CAMPOS_SQL = "rowid, data, medico, exam, dose_mgy, tempo, dap, paciente_id, sexo, sala"
+
+def _montar_consulta(apenas_filtrados, inputs_filtros):
+    """Retorna (sql_where, params) da exportação: filtros atuais ou a tabela inteira."""
+    if apenas_filtrados and inputs_filtros:
+        return db.montar_query_filtros(
+            state.data_inicio, state.data_final,
+            inputs_filtros['min_d'], inputs_filtros['max_d'],
+            inputs_filtros['med'], inputs_filtros['exm'],
+            inputs_filtros['min_t'], inputs_filtros['max_t'],
+            inputs_filtros['min_dap'], inputs_filtros['max_dap'],
+            inputs_filtros['sala'], inputs_filtros['sexo'],
+            inputs_filtros['id_pac']
+        )
+    return "FROM exames", []
+
+def _formatar_linha(row):
+    linha = list(row)
+    linha[1] = formatar_data(linha[1])
+    linha[5] = formatar_tempo(linha[5])
+    if linha[4]: linha[4] = str(linha[4]).replace('.', ',')
+    if linha[6]: linha[6] = str(linha[6]).replace('.', ',')
+    return linha
+
+def exportar_csv_arquivo(caminho, apenas_filtrados=False, inputs_filtros=None, progresso=None, cancelar=None, tamanho_bloco=5000):
+    """
+    Grava o CSV direto no arquivo, lendo o cursor em blocos com fetchmany:
+    a memória usada não depende do tamanho da tabela.
+    progresso(escritas, total) é chamado a cada bloco; cancelar é um threading.Event.
+    As linhas vão para um arquivo temporário na mesma pasta, que só substitui caminho
+    no fim: sem linhas, cancelado ou com erro, caminho não é criado nem alterado.
+    Retorna a quantidade de linhas gravadas (0 sem linhas), ou None em caso de erro.
+    """
+    temporario = None
     try:
         conn = db.conectar()
-        if not conn: return ""
+        if not conn: return None
         cursor = conn.cursor()
-        
-        colunas_header = [
-            "ID", "Data", "Médico", "Exame", "Dose (mGy)", 
-            "Tempo", "DAP", "ID Paciente", "Sexo", "Sala"
-        ]
-        
-        campos_sql = "rowid, data, medico, exam, dose_mgy, tempo, dap, paciente_id, sexo, sala"
-
-        if apenas_filtrados and inputs_filtros:
-            sql_where, params = db.montar_query_filtros(
-                state.data_inicio, state.data_final, 
-                inputs_filtros['min_d'], inputs_filtros['max_d'], 
-                inputs_filtros['med'], inputs_filtros['exm'], 
-                inputs_filtros['min_t'], inputs_filtros['max_t'], 
-                inputs_filtros['min_dap'], inputs_filtros['max_dap'], 
-                inputs_filtros['sala'], inputs_filtros['sexo'], 
-                inputs_filtros['id_pac']
-            )
-            sql = f"SELECT {campos_sql} {sql_where} ORDER BY data DESC"
-            cursor.execute(sql, params)
-        else:
-            sql = f"SELECT {campos_sql} FROM exames ORDER BY data DESC"
-            cursor.execute(sql)
-            
-        dados = cursor.fetchall()
-        conn.close()
 
-        output = io.StringIO()
-        writer = csv.writer(output, delimiter=';', quoting=csv.QUOTE_ALL)
-        writer.writerow(colunas_header)
-        
-        for row in dados:
-            linha = list(row)
-            linha[1] = formatar_data(linha[1])  
-            linha[5] = formatar_tempo(linha[5]) 
-            if linha[4]: linha[4] = str(linha[4]).replace('.', ',')
-            if linha[6]: linha[6] = str(linha[6]).replace('.', ',')
-            writer.writerow(linha)
-            
-        return output.getvalue()
+        sql_where, params = _montar_consulta(apenas_filtrados, inputs_filtros)
+        total = cursor.execute(f"SELECT COUNT(*) {sql_where}", params).fetchone()[0]
+        if total == 0:
+            conn.close()
+            return 0
+        cursor.execute(f"SELECT {CAMPOS_SQL} {sql_where} ORDER BY data DESC", params)
+
+        escritas = 0
+        descritor, temporario = tempfile.mkstemp(suffix=".csv.tmp", dir=os.path.dirname(os.path.abspath(caminho)))
+        with os.fdopen(descritor, 'w', newline='', encoding='utf-8-sig') as f:
+            writer = csv.writer(f, delimiter=';', quoting=csv.QUOTE_ALL)
+            writer.writerow(COLUNAS_HEADER)
+            if progresso: progresso(escritas, total)
+            while True:
+                if cancelar is not None and cancelar.is_set(): break
+                bloco = cursor.fetchmany(tamanho_bloco)
+                if not bloco: break
+                writer.writerows(_formatar_linha(row) for row in bloco)
+                escritas += len(bloco)
+                if progresso: progresso(escritas, total)
+        conn.close()
+        if cancelar is not None and cancelar.is_set():
+            os.remove(temporario)
+        else:
+            os.replace(temporario, caminho)
+        return escritas
 
     except Exception as e:
         print(f"Erro CSV: {e}")
-        return ""
\ No newline at end of file
+        if temporario and os.path.exists(temporario):
+            os.remove(temporario)
+        return None
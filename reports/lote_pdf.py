@@ -0,0 +1,132 @@
+# reports/lote_pdf.py
+# Geração de relatórios PDF em lote, sem a interface (pode rodar pelo cron):
+#   python -m reports.lote_pdf --banco exames.db --saida relatorios/ --mes 2024-05 --por sala --por medico
+#   python -m reports.lote_pdf --banco exames.db --saida relatorios/ --specs relatorios.json
+import argparse
+import calendar
+import datetime
+import json
+import multiprocessing
+import os
+import re
+from concurrent.futures import ProcessPoolExecutor
+from concurrent.futures.process import BrokenProcessPool
+from config import state
+from core import analytics
+from core import database as db
+from reports.pdf_export import gerar_relatorio_pdf
+
+def filtros_da_spec(spec):
+    """Converte {"sala": "A-1", "data_inicio": ...} (chaves de db.CAMPOS_FILTRO) na lista de argumentos de montar_query_filtros."""
+    return [spec.get(campo, "") or "" for campo in db.CAMPOS_FILTRO]
+
+def _nome_arquivo(spec):
+    if spec.get("arquivo"): return spec["arquivo"]
+    partes = [f"{c}-{spec[c]}" for c in ("sala", "medico", "exame", "sexo") if spec.get(c)]
+    periodo = f"{spec.get('data_inicio') or 'inicio'}_{spec.get('data_fim') or 'hoje'}"
+    nome = "_".join(["Relatorio", *partes, periodo])
+    return re.sub(r"[^\w\-.]+", "-", nome) + ".pdf"
+
+def intervalo_mes(mes):
+    """'2024-05' -> ('2024-05-01', '2024-05-31')."""
+    ano, numero = (int(p) for p in mes.split("-"))
+    return f"{ano:04d}-{numero:02d}-01", f"{ano:04d}-{numero:02d}-{calendar.monthrange(ano, numero)[1]:02d}"
+
+def specs_por_dimensao(data_inicio, data_fim, dimensoes):
+    """Uma especificação por sala e/ou médico com exames no período."""
+    base = analytics.calcular_base_janela(data_inicio, data_fim)
+    # Posições em calcular_base_janela: dia, medico, exam, sala, sexo
+    posicoes = {"medico": 1, "sala": 3}
+    specs = []
+    for dimensao in dimensoes:
+        for valor in sorted({linha[posicoes[dimensao]] for linha in base if linha[posicoes[dimensao]]}):
+            specs.append({"data_inicio": data_inicio, "data_fim": data_fim, dimensao: valor})
+    return specs
+
+def _iniciar_worker(caminho_banco):
+    db.abrir_banco(caminho_banco)
+    # Cada relatório já roda no seu processo: os gráficos são desenhados nele mesmo
+    state.workers_graficos = 1
+
+def _gerar(tarefa):
+    caminho, filtros, agregados = tarefa
+    try:
+        gerar_relatorio_pdf(caminho, filtros, agregados=agregados)
+        return caminho, None
+    except Exception as e:
+        return caminho, str(e)
+
+def gerar_lote(specs, diretorio_saida, workers=None, progresso=None):
+    """
+    Gera um PDF por especificação em diretorio_saida.
+    Especificações do mesmo período que só filtram médico, exame, sala ou sexo
+    compartilham uma única varredura do banco (analytics.calcular_base_janela);
+    as demais calculam os próprios agregados. Os PDFs são gerados em paralelo.
+    progresso(feitos, total) é chamado a cada relatório concluído.
+    Retorna a lista de (caminho, erro ou None).
+    """
+    if workers is None:
+        workers = state.workers_relatorios
+    os.makedirs(diretorio_saida, exist_ok=True)
+
+    tarefas = []
+    for spec in specs:
+        filtros = filtros_da_spec(spec)
+        agregados = None
+        if analytics.filtros_na_janela(filtros):
+            base = analytics.calcular_base_janela(filtros[0], filtros[1])
+            agregados = analytics.agregados_da_base(base, filtros[4], filtros[5], filtros[10], filtros[11])
+        tarefas.append((os.path.join(diretorio_saida, _nome_arquivo(spec)), filtros, agregados))
+
+    resultados = []
+    if workers > 1 and len(tarefas) > 1:
+        try:
+            # spawn, não fork: o processo já tem conexões SQLite por thread e o estado do matplotlib
+            contexto = multiprocessing.get_context("spawn")
+            with ProcessPoolExecutor(max_workers=workers, mp_context=contexto, initializer=_iniciar_worker, initargs=(state.FILE_PATH,)) as executor:
+                for resultado in executor.map(_gerar, tarefas):
+                    resultados.append(resultado)
+                    if progresso: progresso(len(resultados), len(tarefas))
+        except (BrokenProcessPool, OSError, NotImplementedError) as e:
+            print(f"Geração paralela indisponível ({e}), seguindo em um processo.")
+    for tarefa in tarefas[len(resultados):]:
+        resultados.append(_gerar(tarefa))
+        if progresso: progresso(len(resultados), len(tarefas))
+    return resultados
+
+def _argumentos():
+    parser = argparse.ArgumentParser(description="Gera relatórios PDF do OpenZoe em lote.")
+    parser.add_argument("--banco", required=True, help="arquivo .db do OpenZoe")
+    parser.add_argument("--saida", required=True, help="pasta onde os PDFs serão gravados")
+    parser.add_argument("--specs", help="JSON com a lista de especificações ({\"sala\": ..., \"data_inicio\": ...})")
+    parser.add_argument("--mes", help="período AAAA-MM (padrão: mês anterior)")
+    parser.add_argument("--por", action="append", choices=["sala", "medico"], default=[],
+                        help="um relatório por sala e/ou por médico no período (pode repetir)")
+    parser.add_argument("--workers", type=int, default=None, help="processos em paralelo")
+    return parser.parse_args()
+
+def main():
+    args = _argumentos()
+    db.abrir_banco(args.banco)
+    db.preparar_banco()
+
+    if args.specs:
+        with open(args.specs, encoding="utf-8") as f:
+            specs = json.load(f)
+    else:
+        if not args.mes:
+            mes_anterior = datetime.date.today().replace(day=1) - datetime.timedelta(days=1)
+            args.mes = mes_anterior.strftime("%Y-%m")
+        data_inicio, data_fim = intervalo_mes(args.mes)
+        specs = specs_por_dimensao(data_inicio, data_fim, args.por or ["sala"])
+
+    resultados = gerar_lote(specs, args.saida, workers=args.workers,
+                            progresso=lambda feitos, total: print(f"{feitos}/{total} relatórios"))
+    erros = [(caminho, erro) for caminho, erro in resultados if erro]
+    for caminho, erro in erros:
+        print(f"Erro ao gerar {caminho}: {erro}")
+    print(f"{len(resultados) - len(erros)} relatórios gerados em {args.saida}, {len(erros)} com erro.")
+    return 1 if erros else 0
+
+if __name__ == "__main__":
+    raise SystemExit(main())
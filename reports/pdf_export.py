@@ -1,6 +1,10 @@
 # reports/pdf_export.py
+import io
 import os
 from fpdf import FPDF
+from core import analytics
+from core import database as db
+from reports import charts_export
 
 class RelatorioPDF(FPDF):
     def header(self):
@@ -24,3 +28,120 @@ class RelatorioPDF(FPDF):
         self.set_font("helvetica", "I", 8)
         self.set_text_color(128, 128, 128)
         self.cell(0, 10, f"Página {self.page_no()}", align="C")
+
+def _cor_dose(pdf, ds):
+    """Cor e peso da fonte da dose na tabela do Top 10, pelas mesmas faixas da interface."""
+    try:
+        valor_dose = float(ds.replace(',', '.'))
+        if valor_dose >= 5000:
+            pdf.set_text_color(255, 0, 0) # Vermelho
+            pdf.set_font("helvetica", "B", 9)
+        elif valor_dose >= 4000:
+            pdf.set_text_color(255, 128, 0) # Laranja
+            pdf.set_font("helvetica", "B", 9)
+        elif valor_dose >= 3000:
+            pdf.set_text_color(204, 153, 0) # Amarelo (Mostarda para leitura no branco)
+            pdf.set_font("helvetica", "B", 9)
+        elif valor_dose >= 2000:
+            pdf.set_text_color(0, 0, 255) # Azul
+            pdf.set_font("helvetica", "B", 9)
+        elif valor_dose >= 1000:
+            pdf.set_text_color(143, 0, 255) # Roxo
+            pdf.set_font("helvetica", "B", 9)
+        else:
+            pdf.set_text_color(0, 0, 0) # Preto padrão
+            pdf.set_font("helvetica", "", 9)
+    except (ValueError, TypeError):
+        pdf.set_text_color(0, 0, 0) # Falha segura (Preto)
+        pdf.set_font("helvetica", "", 9)
+
+def pedidos_graficos(filtros, agregados):
+    """Lista (tipo, dados, modo_multiplo) dos gráficos que entram no relatório desses filtros."""
+    data_inicio, data_fim, n_medico = filtros[0], filtros[1], filtros[4]
+    unico_dia = bool(data_inicio and data_fim and data_inicio == data_fim)
+    unico_medico = bool(n_medico and ";" not in n_medico)
+
+    pedidos = []
+    if not unico_dia:
+        dados, modo = analytics.calcular_evolucao_temporal(*filtros, agregados=agregados)
+        if dados: pedidos.append(("evolucao", dados, modo))
+    if not unico_medico:
+        dados = analytics.calcular_media_medico(*filtros, agregados=agregados)
+        if dados: pedidos.append(("dose_medico", dados, False))
+        dados = analytics.calcular_media_tempo_medico(*filtros, agregados=agregados)
+        if dados: pedidos.append(("tempo_medico", dados, False))
+    dados, modo = analytics.calcular_media_exame(*filtros, agregados=agregados)
+    if dados: pedidos.append(("dose_exame", dados, modo))
+    dados, modo = analytics.calcular_media_tempo_exame(*filtros, agregados=agregados)
+    if dados: pedidos.append(("tempo_exame", dados, modo))
+    return pedidos
+
+def gerar_relatorio_pdf(caminho, filtros, agregados=None):
+    """
+    Monta o relatório em PDF para os filtros (lista de argumentos de db.montar_query_filtros).
+    Os gráficos são desenhados em paralelo e em memória por charts_export.renderizar_graficos.
+    Levanta exceção em caso de erro, para a interface mostrar a mensagem.
+    """
+    data_inicio, data_fim, n_medico, exm = filtros[0], filtros[1], filtros[4], filtros[5]
+
+    conn = db.conectar()
+    cursor = conn.cursor()
+    sql_where, params = db.montar_query_filtros(*filtros)
+    cursor.execute(f"SELECT data, medico, exam, dose_mgy, tempo {sql_where} ORDER BY dose_num DESC LIMIT 10", params)
+    top10_dados = cursor.fetchall()
+    conn.close()
+
+    # Uma única agregação alimenta todos os gráficos do relatório
+    if agregados is None:
+        agregados = analytics.calcular_agregados(*filtros)
+    total_exames = sum(acc[analytics.QTD] for acc in agregados["medico"].values())
+
+    pedidos = pedidos_graficos(filtros, agregados)
+    imagens = charts_export.renderizar_graficos(pedidos, filtros)
+
+    pdf = RelatorioPDF()
+    pdf.add_page()
+
+    pdf.set_font("helvetica", "B", 12)
+    pdf.cell(0, 8, "Filtros Aplicados:", new_x="LMARGIN", new_y="NEXT")
+    pdf.set_font("helvetica", "", 10)
+    pdf.cell(0, 6, f"Período: {data_inicio if data_inicio else 'Início'} a {data_fim if data_fim else 'Hoje'}", new_x="LMARGIN", new_y="NEXT")
+    pdf.cell(0, 6, f"Médico(s): {n_medico if n_medico else 'Todos'}", new_x="LMARGIN", new_y="NEXT")
+    pdf.cell(0, 6, f"Exame: {exm if exm else 'Todos'}", new_x="LMARGIN", new_y="NEXT")
+    pdf.ln(5)
+
+    if data_inicio and data_fim and data_inicio == data_fim:
+        pdf.set_font("helvetica", "B", 14)
+        pdf.set_text_color(0, 100, 0)
+        dfmt = data_inicio[8:10] + "/" + data_inicio[5:7] + "/" + data_inicio[0:4]
+        pdf.cell(0, 10, f"Total de Exames no dia {dfmt}: {total_exames}", new_x="LMARGIN", new_y="NEXT", align="C")
+        pdf.set_text_color(0, 0, 0); pdf.ln(5)
+
+    for tipo, _, _ in pedidos:
+        if tipo not in imagens: continue
+        if pdf.get_y() > 200: pdf.add_page()
+        pdf.image(io.BytesIO(imagens[tipo]), w=180)
+        pdf.ln(5)
+
+    if pdf.get_y() > 200: pdf.add_page()
+    pdf.set_font("helvetica", "B", 12)
+    pdf.cell(0, 10, "Atenção: Top 10 Maiores Doses no Período", new_x="LMARGIN", new_y="NEXT")
+
+    pdf.set_font("helvetica", "B", 10); pdf.set_fill_color(200, 200, 200)
+    pdf.cell(30, 8, "Data", border=1, fill=True); pdf.cell(50, 8, "Médico", border=1, fill=True)
+    pdf.cell(60, 8, "Exame", border=1, fill=True); pdf.cell(25, 8, "Dose", border=1, fill=True)
+    pdf.cell(25, 8, "Tempo", border=1, fill=True, new_x="LMARGIN", new_y="NEXT")
+
+    pdf.set_font("helvetica", "", 9)
+    for row in top10_dados:
+        ds = str(row[3]) if row[3] else "0.0"
+        pdf.cell(30, 8, str(row[0]).split()[0] if row[0] else "N/A", border=1)
+        pdf.cell(50, 8, str(row[1])[:20] if row[1] else "N/A", border=1)
+        pdf.cell(60, 8, str(row[2])[:25] if row[2] else "N/A", border=1)
+        _cor_dose(pdf, ds)
+        pdf.cell(25, 8, ds, border=1)
+        pdf.set_text_color(0, 0, 0); pdf.set_font("helvetica", "", 9)
+        pdf.cell(25, 8, str(row[4])[:8] if row[4] else "N/A", border=1, new_x="LMARGIN", new_y="NEXT")
+
+    pdf.output(caminho)
+    return caminho
@@ -0,0 +1,19 @@
+# tests/conftest.py
+import pytest
+from config import state
+from core import database as db
+from core.cache import limpar_cache
+from benchmarks import sintetico
+
+LINHAS_BANCO = 2000
+
+@pytest.fixture
+def banco(tmp_path):
+    """Banco sintético pequeno (benchmarks/sintetico.py), aberto e com índices; fechado no fim."""
+    caminho = str(tmp_path / "exames.db")
+    sintetico.gerar_banco(caminho, LINHAS_BANCO)
+    limpar_cache()
+    yield caminho
+    db.fechar_conexoes()
+    state.FILE_PATH = ""
+    limpar_cache()
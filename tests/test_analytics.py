@@ -0,0 +1,52 @@
+# tests/test_analytics.py
+import pytest
+
+np = pytest.importorskip("numpy")
+from core import analytics
+
+def _serie(dias, n_series, semente=1):
+    rng = np.random.default_rng(semente)
+    return {
+        "datas": np.datetime64("2020-01-01") + np.arange(dias),
+        "series": [f"{1000 + i}" for i in range(n_series)],
+        "valores": rng.integers(0, 5, size=(dias, n_series)) * (np.arange(n_series) + 1),
+    }
+
+@pytest.mark.parametrize("nivel", [None, "dia", "semana", "mes"])
+@pytest.mark.parametrize("dias, n_series", [(1826, 20), (1826, 1), (3650, 60), (400, 3)])
+def test_pontos_nunca_passam_do_limite(dias, n_series, nivel):
+    serie = _serie(dias, n_series)
+    reduzida = analytics.reduzir_serie(serie, max_pontos=500, nivel=nivel)
+    assert len(reduzida["datas"]) * len(reduzida["series"]) <= 500
+    assert len(reduzida["datas"]) == len(reduzida["ate"]) == reduzida["valores"].shape[0] == reduzida["picos"].shape[0]
+    assert reduzida["valores"].sum() == serie["valores"].sum()
+    assert reduzida["ate"][-1] == serie["datas"][-1]
+
+def test_outros_guarda_os_medicos_com_mais_exames():
+    serie = _serie(1826, 60)
+    reduzida = analytics.reduzir_serie(serie, max_pontos=500)
+    n = 500 // analytics.MIN_PONTOS_SERIE
+    assert len(reduzida["series"]) == n
+    assert reduzida["series"][-1] == "Outros"
+    # As maiores colunas de _serie são as últimas
+    assert reduzida["series"][:-1] == serie["series"][-(n - 1):]
+    # O pico diário de cada grupo é pelo menos a média diária do grupo
+    dias_grupo = (reduzida["ate"] - reduzida["datas"]).astype(int) + 1
+    assert (reduzida["picos"] * dias_grupo[:, None] >= reduzida["valores"]).all()
+
+def test_periodo_curto_fica_por_dia():
+    serie = _serie(30, 4)
+    reduzida = analytics.reduzir_serie(serie, max_pontos=500)
+    assert reduzida["nivel"] == "dia"
+    assert (reduzida["valores"] == serie["valores"]).all()
+    assert reduzida["series"] == serie["series"]
+    assert reduzida["passo"] == 1
+
+def test_passo_diz_quantos_dias_cada_ponto_soma():
+    serie = _serie(1826, 1)
+    reduzida = analytics.reduzir_serie(serie, max_pontos=500, nivel="dia")
+    assert reduzida["nivel"] == "dia"
+    assert reduzida["passo"] == 4
+    dias_grupo = (reduzida["ate"] - reduzida["datas"]).astype(int) + 1
+    assert (dias_grupo[:-1] == reduzida["passo"]).all()
+    assert dias_grupo[-1] <= reduzida["passo"]
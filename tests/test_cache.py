@@ -0,0 +1,70 @@
+# tests/test_cache.py
+import sqlite3
+from core import database as db
+from core import perfil
+from core.cache import estatisticas_cache
+from benchmarks import sintetico
+
+def _filtros(**valores):
+    return [valores.get(campo, "") for campo in db.CAMPOS_FILTRO]
+
+def test_filtro_com_espacos_usa_a_mesma_chave_e_as_mesmas_linhas(banco):
+    sala = sintetico.SALAS[0]
+    aparado = db.carregar_dados_banco(*_filtros(sala=sala), limit=50, offset=0)
+    assert aparado[1] > 0
+
+    nome = "core.database.carregar_dados_banco"
+    acertos = estatisticas_cache()[nome]["acertos"]
+    com_espacos = db.carregar_dados_banco(*_filtros(sala=f" {sala} "), limit=50, offset=0)
+    assert estatisticas_cache()[nome]["acertos"] == acertos + 1
+    assert com_espacos == aparado
+
+def test_filtro_com_espacos_sem_cache_traz_as_mesmas_linhas(banco):
+    filtros = {"sala": sintetico.SALAS[1], "sexo": "F"}
+    com_espacos = db.carregar_dados_banco(*_filtros(**{c: f"  {v} " for c, v in filtros.items()}), limit=50, offset=0)
+    db._dados_alterados()
+    aparado = db.carregar_dados_banco(*_filtros(**filtros), limit=50, offset=0)
+    assert com_espacos[1] > 0
+    assert com_espacos == aparado
+
+def test_id_paciente_com_espacos(banco):
+    linha = db.carregar_dados_banco(*_filtros(), limit=1, offset=0)[0][0]
+    paciente = linha[7]
+    db._dados_alterados()
+    dados, total = db.carregar_dados_banco(*_filtros(id_paciente=f" {paciente}\t"), limit=50, offset=0)
+    assert total >= 1
+    assert all(row[7] == paciente for row in dados)
+
+def test_contagens_respeitam_tamanho_cache(banco, monkeypatch):
+    from config import state
+    monkeypatch.setattr(state, "tamanho_cache", 4)
+    nome = "core.database.contagem"
+    totais = {}
+    for dose in range(0, 2000, 100):
+        totais[dose] = db.carregar_dados_banco(*_filtros(min_dose=dose), limit=1, offset=0)[1]
+        assert estatisticas_cache()[nome]["entradas"] <= 4
+
+    assert len(set(totais.values())) > 4
+
+    # As contagens descartadas do LRU são refeitas com o mesmo valor
+    db._dados_alterados()
+    assert estatisticas_cache()[nome]["entradas"] == 0
+    for dose, total in totais.items():
+        assert db.carregar_dados_banco(*_filtros(min_dose=dose), limit=1, offset=0)[1] == total
+
+def test_escrita_de_outro_processo_descarta_o_cache(banco):
+    sala = sintetico.SALAS[0]
+    antes = db.carregar_dados_banco(*_filtros(sala=sala), limit=1, offset=0)[1]
+    assert db.carregar_dados_banco(*_filtros(sala=sala), limit=1, offset=0)[1] == antes
+
+    # Outra conexão (como cli.py ingest em outro processo) grava no mesmo banco
+    externa = sqlite3.connect(banco)
+    externa.execute("INSERT INTO exames (data, medico, exam, sala) VALUES ('2023-01-02', '1', 'X', ?)", (sala,))
+    externa.commit()
+    externa.close()
+    assert db.carregar_dados_banco(*_filtros(sala=sala), limit=1, offset=0)[1] == antes + 1
+
+def test_perfil_inclui_estatisticas_do_cache(banco):
+    db.carregar_dados_banco(*_filtros(), limit=1, offset=0)
+    db.carregar_dados_banco(*_filtros(), limit=1, offset=0)
+    assert perfil.resumo()["cache"]["core.database.carregar_dados_banco"]["acertos"] >= 1
@@ -0,0 +1,52 @@
+# tests/test_charts_export.py
+import pytest
+from config import state
+from core import analytics
+from core import database as db
+from core.cache import estatisticas_cache, limpar_cache
+from benchmarks import sintetico
+
+charts_export = pytest.importorskip("reports.charts_export")
+pdf_export = pytest.importorskip("reports.pdf_export")
+
+def _filtros(**valores):
+    return [valores.get(campo, "") for campo in db.CAMPOS_FILTRO]
+
+def _renderizar(filtros):
+    agregados = analytics.calcular_agregados(*filtros)
+    return charts_export.renderizar_graficos(pdf_export.pedidos_graficos(filtros, agregados), filtros)
+
+def test_png_do_filtro_com_espacos_e_o_mesmo_do_filtro_aparado(banco, monkeypatch):
+    monkeypatch.setattr(state, "workers_graficos", 1)
+    sala = sintetico.SALAS[0]
+    aparado = _renderizar(_filtros(sala=sala))
+    assert aparado
+
+    # Do cache: a imagem da sala aparada serve para a mesma sala com espaços
+    nome = "reports.charts_export.png"
+    acertos = estatisticas_cache().get(nome, {}).get("acertos", 0)
+    assert _renderizar(_filtros(sala=f" {sala} ")) == aparado
+    assert estatisticas_cache()[nome]["acertos"] == acertos + len(aparado)
+
+    # Desenhado de novo, sem cache, o resultado é o mesmo
+    limpar_cache()
+    assert _renderizar(_filtros(sala=f" {sala} ")) == aparado
+
+def test_png_de_outra_sala_nao_vem_do_cache(banco, monkeypatch):
+    monkeypatch.setattr(state, "workers_graficos", 1)
+    primeira = _renderizar(_filtros(sala=sintetico.SALAS[0]))
+    segunda = _renderizar(_filtros(sala=sintetico.SALAS[1]))
+    assert primeira.keys() == segunda.keys()
+    assert any(primeira[tipo] != segunda[tipo] for tipo in primeira)
+
+def test_graficos_em_processos_usam_spawn(banco, monkeypatch):
+    monkeypatch.setattr(state, "workers_graficos", 2)
+    monkeypatch.setattr(charts_export, "_executor", None)
+    filtros = _filtros(sala=sintetico.SALAS[2])
+    em_processos = _renderizar(filtros)
+    assert charts_export._executor._mp_context.get_start_method() == "spawn"
+    charts_export._executor.shutdown()
+
+    monkeypatch.setattr(state, "workers_graficos", 1)
+    limpar_cache()
+    assert _renderizar(filtros) == em_processos
@@ -0,0 +1,44 @@
+# tests/test_csv_export.py
+import csv
+import os
+import threading
+from core import database as db
+from reports.csv_export import exportar_csv_arquivo
+
+def _filtros(**valores):
+    campos = ["min_d", "max_d", "med", "exm", "min_t", "max_t", "min_dap", "max_dap", "sala", "sexo", "id_pac"]
+    return {campo: valores.get(campo, "") for campo in campos}
+
+def _total_exames():
+    conn = db.conectar()
+    total = conn.execute("SELECT COUNT(*) FROM exames").fetchone()[0]
+    conn.close()
+    return total
+
+def _temporarios(pasta):
+    return [nome for nome in os.listdir(pasta) if nome.endswith(".tmp")]
+
+def test_exporta_todas_as_linhas(banco, tmp_path):
+    caminho = str(tmp_path / "exames.csv")
+    assert exportar_csv_arquivo(caminho, tamanho_bloco=300) == _total_exames()
+    with open(caminho, encoding="utf-8-sig", newline="") as f:
+        assert sum(1 for _ in csv.reader(f, delimiter=";")) == _total_exames() + 1
+    assert not _temporarios(tmp_path)
+
+def test_sem_linhas_nao_cria_arquivo(banco, tmp_path):
+    caminho = str(tmp_path / "vazio.csv")
+    assert exportar_csv_arquivo(caminho, apenas_filtrados=True, inputs_filtros=_filtros(sala="NAO-EXISTE")) == 0
+    assert not os.path.exists(caminho)
+
+def test_cancelado_nao_deixa_arquivo_nem_temporario(banco, tmp_path):
+    caminho = str(tmp_path / "cancelado.csv")
+    with open(caminho, "w") as f: f.write("anterior")
+    cancelar = threading.Event()
+
+    def progresso(escritas, total):
+        if escritas >= 500: cancelar.set()
+
+    exportar_csv_arquivo(caminho, progresso=progresso, cancelar=cancelar, tamanho_bloco=100)
+    # O arquivo que já existia fica como estava
+    with open(caminho) as f: assert f.read() == "anterior"
+    assert not _temporarios(tmp_path)
@@ -0,0 +1,53 @@
+# tests/test_database.py
+import sqlite3
+import pytest
+from core import analytics
+from core import database as db
+
+# Médias do SQL anterior às colunas numéricas: o CAST do texto conta dose vazia como 0
+SQL_MEDIA_ANTIGA = """SELECT medico, AVG(CAST(REPLACE(dose_mgy, ',', '.') AS REAL)), MIN(CAST(REPLACE(dose_mgy, ',', '.') AS REAL)),
+    MAX(CAST(REPLACE(dose_mgy, ',', '.') AS REAL)), COUNT(*) FROM exames GROUP BY medico"""
+
+def _filtros():
+    return [""] * len(db.CAMPOS_FILTRO)
+
+@pytest.fixture
+def banco_com_vazios(banco):
+    # (data, medico, exam, dose, tempo, dap, paciente_id, sexo, sala)
+    registros = [
+        ("2023-02-01", "VAZIOS", "X", "100", "00:10:00", "5", "P1", "F", "A"),
+        ("2023-02-01", "VAZIOS", "X", "", "", "", "P2", "F", "A"),
+        ("2023-02-02", "VAZIOS", "X", "200,5", "00:20:00", "7", "P3", "M", "A"),
+    ]
+    assert db.inserir_exames_lote(registros)[0] == 3
+    return banco
+
+def _conferir_com_sql_antigo():
+    conn = db.conectar()
+    antigas = {linha[0]: linha[1:] for linha in conn.execute(SQL_MEDIA_ANTIGA)}
+    conn.close()
+    medias = {linha[0]: linha[1:] for linha in analytics.calcular_media_medico(*_filtros())}
+    assert medias.keys() == antigas.keys()
+    for medico, valores in medias.items():
+        assert valores == pytest.approx(antigas[medico])
+    return medias
+
+def test_dose_vazia_conta_como_zero(banco_com_vazios):
+    medias = _conferir_com_sql_antigo()
+    assert medias["VAZIOS"] == pytest.approx((300.5 / 3, 0.0, 200.5, 3))
+    tempos = {linha[0]: linha[1:] for linha in analytics.calcular_media_tempo_medico(*_filtros())}
+    assert tempos["VAZIOS"] == pytest.approx((10.0, 0.0, 20.0, 3))
+
+def test_migracao_troca_vazios_nulos_por_zero(banco_com_vazios):
+    # Banco migrado antes da migração 3: vazios gravados como NULL
+    conn = sqlite3.connect(banco_com_vazios)
+    conn.execute("UPDATE exames SET dose_num = NULL, dap_num = NULL, tempo_seg = NULL WHERE medico = 'VAZIOS' AND dose_mgy = ''")
+    conn.execute("PRAGMA user_version = 2")
+    conn.commit()
+    conn.close()
+
+    assert db.aplicar_migracoes()
+    conn = db.conectar()
+    assert conn.execute("SELECT dose_num, dap_num, tempo_seg FROM exames WHERE medico = 'VAZIOS' AND dose_mgy = ''").fetchall() == [(0.0, 0.0, 0.0)]
+    conn.close()
+    assert _conferir_com_sql_antigo()["VAZIOS"] == pytest.approx((300.5 / 3, 0.0, 200.5, 3))
@@ -0,0 +1,93 @@
+# tests/test_dicom_parser.py
+import pytest
+
+pydicom = pytest.importorskip("pydicom")
+from pydicom.dataset import Dataset
+from pydicom.sequence import Sequence
+from core import dicom_parser
+from benchmarks import sintetico
+
+def _percorrer_tudo(conteudo):
+    """Leitura completa de referência (recursiva, sem parada antecipada) dos totais e eventos."""
+    totais, eventos = {}, []
+
+    def visitar(itens, evento):
+        for item in itens:
+            nomes = item.get("ConceptNameCodeSequence")
+            codigo = nomes[0].CodeValue if nomes else None
+            filho = evento
+            if evento is not None:
+                chave = dicom_parser.CAMPOS_EVENTO.get(codigo)
+                if chave is not None and chave not in evento:
+                    evento[chave] = dicom_parser._valor_item(item)
+            elif codigo in dicom_parser.CODIGOS_EVENTO:
+                filho = {"tipo": dicom_parser.CODIGOS_EVENTO[codigo]}
+                eventos.append(filho)
+            elif codigo in dicom_parser.CODIGOS_TOTAIS:
+                valor = dicom_parser._valor_item(item)
+                if valor is not None:
+                    chave, modo = dicom_parser.CODIGOS_TOTAIS[codigo]
+                    totais[chave] = totais.get(chave, 0.0) + valor if modo == "soma" else valor
+            if item.get("ContentSequence"):
+                visitar(item.ContentSequence, filho)
+
+    visitar(conteudo, None)
+    return totais, eventos
+
+class _ItemVigiado(Dataset):
+    """Item de conteúdo que registra se a leitura chegou até ele."""
+    lido = False
+
+    def get(self, *args, **kwargs):
+        type(self).lido = True
+        return super().get(*args, **kwargs)
+
+def _comentario(classe=Dataset):
+    item = classe()
+    item.RelationshipType = "CONTAINS"
+    item.ValueType = "TEXT"
+    item.ConceptNameCodeSequence = Sequence([sintetico._conceito("121106", "Comment")])
+    item.TextValue = "sem observações"
+    return item
+
+@pytest.fixture
+def rdsr(tmp_path):
+    caminho = str(tmp_path / "rdsr.dcm")
+    exame = sintetico.gerar_rdsr(caminho, 1, eventos=4)
+    ds = pydicom.dcmread(caminho)
+    ds.ContentSequence.append(_comentario())
+    ds.save_as(caminho, enforce_file_format=True)
+    return caminho, exame
+
+def test_totais_e_eventos_iguais_a_leitura_completa(rdsr):
+    caminho, _ = rdsr
+    conteudo = pydicom.dcmread(caminho).ContentSequence
+    assert dicom_parser.extrair_conteudo_sr(conteudo, eventos=True) == _percorrer_tudo(conteudo)
+    totais, eventos = _percorrer_tudo(conteudo)
+    assert dicom_parser.extrair_conteudo_sr(conteudo) == (totais, [])
+
+def test_extrair_exame_arquivo_bate_com_o_sr(rdsr):
+    caminho, exame = rdsr
+    _, modalidade, dados, eventos = dicom_parser.extrair_exame_arquivo(caminho)
+    totais, _ = _percorrer_tudo(pydicom.dcmread(caminho).ContentSequence)
+    assert modalidade == "SR"
+    assert dados[3] == round(totais["Dose"] * 1000, 2)
+    assert dados[5] == round(totais["DAP"] * 1e6, 2)
+    assert dados[3] == pytest.approx(exame["dose"] * 1000, abs=0.01)
+    assert len(eventos) == 4
+
+def test_para_depois_do_ultimo_evento():
+    conteudo = Sequence([
+        sintetico._container("113702", "Accumulated X-Ray Dose Data", [
+            sintetico._num("113725", "Dose (RP) Total", 1.5, "Gy"),
+            sintetico._num("113722", "Dose Area Product Total", 0.01, "Gy.m2"),
+            sintetico._num("113730", "Total Fluoro Time", 120, "s"),
+        ]),
+        sintetico._container("113706", "Irradiation Event X-Ray Data", [sintetico._num("113738", "Dose (RP)", 1.5, "Gy")]),
+        sintetico._container("113854", "Source of Dose Information", [_comentario(_ItemVigiado)]),
+    ])
+    _ItemVigiado.lido = False
+    totais, eventos = dicom_parser.extrair_conteudo_sr(conteudo, eventos=True)
+    assert totais == {"Dose": 1.5, "DAP": 0.01, "TempoFluoro": 120.0}
+    assert eventos == [{"tipo": "projecao", "dose_rp": 1.5}]
+    assert not _ItemVigiado.lido
@@ -0,0 +1,102 @@
+# tests/test_importacao.py
+import os
+import pytest
+
+pydicom = pytest.importorskip("pydicom")
+from core import database as db
+from core import dicom_parser
+from benchmarks import sintetico
+
+@pytest.fixture
+def pasta(tmp_path):
+    pasta = tmp_path / "dicom"
+    pasta.mkdir()
+    for i in range(3):
+        sintetico.gerar_rdsr(str(pasta / f"sr{i}.dcm"), i)
+    sintetico.gerar_imagem_ct(str(pasta / "ct.dcm"), 10)
+    # SR sem SOPInstanceUID
+    sem_uid = str(pasta / "sr_sem_uid.dcm")
+    sintetico.gerar_rdsr(sem_uid, 20)
+    ds = pydicom.dcmread(sem_uid)
+    del ds.SOPInstanceUID
+    ds.save_as(sem_uid)
+    (pasta / "leia-me.txt").write_text("não é DICOM")
+    return pasta
+
+@pytest.fixture
+def banco_vazio(tmp_path):
+    db.abrir_banco(str(tmp_path / "importacao.db"))
+    db.preparar_banco()
+    yield
+    db.fechar_conexoes()
+
+def _contar_leituras(monkeypatch):
+    lidos = []
+    original = dicom_parser._ler_arquivo
+    monkeypatch.setattr(dicom_parser, "_ler_arquivo", lambda caminho: lidos.append(os.path.basename(caminho)) or original(caminho))
+    return lidos
+
+def _total_exames():
+    conn = db.conectar()
+    total = conn.execute("SELECT COUNT(*) FROM exames").fetchone()[0]
+    conn.close()
+    return total
+
+def test_reimportacao_nao_reabre_arquivos_descartados(pasta, banco_vazio, monkeypatch):
+    lidos = _contar_leituras(monkeypatch)
+    assert dicom_parser.processar_diretorio_dicom(str(pasta), workers=1) == (4, 0)
+    assert len(lidos) == 6
+
+    lidos.clear()
+    assert dicom_parser.processar_diretorio_dicom(str(pasta), workers=1) == (0, 0)
+    assert lidos == []
+    assert _total_exames() == 4
+
+def test_arquivo_descartado_alterado_e_lido_de_novo(pasta, banco_vazio, monkeypatch):
+    lidos = _contar_leituras(monkeypatch)
+    dicom_parser.processar_diretorio_dicom(str(pasta), workers=1)
+    lidos.clear()
+
+    (pasta / "leia-me.txt").write_text("outro conteúdo, outro tamanho")
+    dicom_parser.processar_diretorio_dicom(str(pasta), workers=1)
+    assert lidos == ["leia-me.txt"]
+
+    conn = db.conectar()
+    motivos = dict(conn.execute("SELECT caminho, motivo FROM arquivos_ignorados").fetchall())
+    conn.close()
+    assert motivos[str(pasta / "leia-me.txt")] == dicom_parser.ETAPA_NAO_DICOM
+    assert motivos[str(pasta / "sr_sem_uid.dcm")] == dicom_parser.ETAPA_SR
+
+def test_leitura_em_processos_usa_spawn(pasta, banco_vazio, monkeypatch):
+    contextos = []
+    original = dicom_parser.ProcessPoolExecutor
+
+    def executor(*args, **kwargs):
+        contextos.append(kwargs["mp_context"].get_start_method())
+        return original(*args, **kwargs)
+
+    monkeypatch.setattr(dicom_parser, "ProcessPoolExecutor", executor)
+    assert dicom_parser.processar_diretorio_dicom(str(pasta), workers=2) == (4, 0)
+    assert contextos == ["spawn"]
+    assert _total_exames() == 4
+
+def test_lote_que_falhou_e_lido_de_novo(pasta, banco_vazio, monkeypatch):
+    # Cópia de um SR no mesmo lote: só conta como repetida se o original for gravado
+    (pasta / "sr0_copia.dcm").write_bytes((pasta / "sr0.dcm").read_bytes())
+    original = db.inserir_exames_lote
+    monkeypatch.setattr(db, "inserir_exames_lote", lambda registros, **opcoes: (0, len(registros), []))
+    assert dicom_parser.processar_diretorio_dicom(str(pasta), workers=1) == (0, 5)
+
+    conn = db.conectar()
+    ignorados = {caminho for (caminho,) in conn.execute("SELECT caminho FROM arquivos_ignorados")}
+    no_manifesto = {caminho for (caminho,) in conn.execute("SELECT caminho FROM arquivos_importados")}
+    conn.close()
+    assert str(pasta / "sr_sem_uid.dcm") not in ignorados
+    assert str(pasta / "leia-me.txt") in ignorados
+    assert no_manifesto == {str(pasta / "ct.dcm")}
+
+    monkeypatch.setattr(db, "inserir_exames_lote", original)
+    lidos = _contar_leituras(monkeypatch)
+    assert dicom_parser.processar_diretorio_dicom(str(pasta), workers=1) == (4, 0)
+    assert sorted(lidos) == ["sr0.dcm", "sr0_copia.dcm", "sr1.dcm", "sr2.dcm", "sr_sem_uid.dcm"]
+    assert _total_exames() == 4
@@ -0,0 +1,17 @@
+# tests/test_indices.py
+import pytest
+from core import database as db
+
+@pytest.mark.parametrize("descricao, filtros, modelo, esperado", db.CONSULTAS_REFERENCIA, ids=[c[0] for c in db.CONSULTAS_REFERENCIA])
+def test_consulta_de_referencia_usa_o_indice(banco, descricao, filtros, modelo, esperado):
+    assert db.preparar_banco() is not False
+    sql_where, params = db.montar_query_filtros(*filtros)
+    conn = db.conectar()
+    plano = " | ".join(linha[3] for linha in conn.execute("EXPLAIN QUERY PLAN " + modelo.format(where=sql_where), params))
+    assert f"INDEX {esperado} " in plano + " ", plano
+
+def test_verificar_indices_sem_falhas(banco):
+    db.preparar_banco()
+    relatorio = db.verificar_indices()
+    assert len(relatorio) == len(db.CONSULTAS_REFERENCIA)
+    assert [descricao for descricao, _, _, usou in relatorio if not usou] == []
@@ -0,0 +1,24 @@
+# tests/test_lote_pdf.py
+import os
+import pytest
+from benchmarks import sintetico
+
+lote_pdf = pytest.importorskip("reports.lote_pdf")
+
+def test_lote_em_processos_usa_spawn(banco, tmp_path, monkeypatch, capsys):
+    contextos = []
+    original = lote_pdf.ProcessPoolExecutor
+
+    def executor(*args, **kwargs):
+        contextos.append(kwargs["mp_context"].get_start_method())
+        return original(*args, **kwargs)
+
+    monkeypatch.setattr(lote_pdf, "ProcessPoolExecutor", executor)
+    data_inicio, data_fim = lote_pdf.intervalo_mes(sintetico.DATA_INICIAL[:7])
+    specs = [{"data_inicio": data_inicio, "data_fim": data_fim, "sala": sala} for sala in sintetico.SALAS[:2]]
+    resultados = lote_pdf.gerar_lote(specs, str(tmp_path / "relatorios"), workers=2)
+
+    assert contextos == ["spawn"]
+    assert "indisponível" not in capsys.readouterr().out
+    assert [erro for _, erro in resultados] == [None, None]
+    assert all(os.path.getsize(caminho) > 0 for caminho, _ in resultados)
@@ -0,0 +1,86 @@
+# tests/test_parquet_io.py
+import os
+import threading
+import pytest
+
+pytest.importorskip("pyarrow")
+from core import database as db
+from core import parquet_io
+from benchmarks import sintetico
+
+UIDS = 10
+
+def _exames():
+    conn = db.conectar()
+    linhas = conn.execute(
+        "SELECT substr(data, 1, 10), medico, exam, dose_num, tempo, dap_num, paciente_id, sexo, sala FROM exames"
+    ).fetchall()
+    conn.close()
+    return sorted(linhas, key=repr)
+
+@pytest.fixture
+def arquivo_parquet(banco, tmp_path):
+    # Alguns exames com SOPInstanceUID (como os importados de DICOM), o resto sem
+    registros = list(sintetico._registros(UIDS, 7, sintetico.MEDICOS, sintetico.EXAMES, sintetico.SALAS, sintetico.DATA_INICIAL, sintetico.DIAS))
+    manifesto = [(sintetico._uid(7, i), f"/dicom/IM{i}.dcm", 100, 1.0, "SR") for i in range(UIDS)]
+    assert db.inserir_exames_lote(registros, manifesto=manifesto)[0] == UIDS
+    caminho = str(tmp_path / "exames.parquet")
+    assert parquet_io.exportar_parquet(caminho) == len(_exames())
+    return caminho, _exames()
+
+def test_ida_e_volta_sem_duplicar(arquivo_parquet, tmp_path):
+    caminho, originais = arquivo_parquet
+    db.abrir_banco(str(tmp_path / "novo.db"))
+    db.preparar_banco()
+
+    inseridos, falhas, ignorados = parquet_io.importar_parquet(caminho)
+    assert (inseridos, falhas, ignorados) == (len(originais), 0, 0)
+    assert _exames() == originais
+
+    # Segunda importação: nada novo, com ou sem UID
+    assert parquet_io.importar_parquet(caminho) == (0, 0, len(originais))
+    assert _exames() == originais
+
+def test_manifesto_sem_entradas_sem_caminho(arquivo_parquet, tmp_path):
+    caminho, _ = arquivo_parquet
+    db.abrir_banco(str(tmp_path / "novo.db"))
+    db.preparar_banco()
+    parquet_io.importar_parquet(caminho)
+
+    arquivos, uids = db.carregar_manifesto()
+    assert None not in arquivos
+    assert len(uids) == UIDS
+    conn = db.conectar()
+    assert conn.execute("SELECT COUNT(*) FROM arquivos_importados WHERE caminho IS NULL").fetchone()[0] == 0
+    assert conn.execute("SELECT DISTINCT caminho FROM arquivos_importados").fetchall() == [(os.path.abspath(caminho),)]
+    conn.close()
+
+def _parquet_anterior(tmp_path):
+    caminho = tmp_path / "anterior.parquet"
+    caminho.write_bytes(b"anterior")
+    return caminho
+
+def test_exportacao_cancelada_mantem_arquivo_anterior(banco, tmp_path):
+    caminho = _parquet_anterior(tmp_path)
+    cancelar = threading.Event()
+
+    def progresso(escritas, total):
+        if escritas >= 500: cancelar.set()
+
+    assert parquet_io.exportar_parquet(str(caminho), progresso=progresso, cancelar=cancelar, linhas_por_grupo=100) == 500
+    assert caminho.read_bytes() == b"anterior"
+    assert not list(tmp_path.glob("*.tmp"))
+
+def test_erro_na_exportacao_mantem_arquivo_anterior(banco, tmp_path, monkeypatch):
+    caminho = _parquet_anterior(tmp_path)
+    chamadas = []
+
+    def converter(valor):
+        chamadas.append(valor)
+        if len(chamadas) > 150: raise ValueError("falha no meio")
+        return None
+
+    monkeypatch.setattr(parquet_io, "_converter_data", converter)
+    assert parquet_io.exportar_parquet(str(caminho), linhas_por_grupo=100) is None
+    assert caminho.read_bytes() == b"anterior"
+    assert not list(tmp_path.glob("*.tmp"))
@@ -1,28 +1,7 @@
 # ui/charts_ui.py
 import flet as ft
 import flet_charts as fch
-
-def criar_tabela_dados():
-    colunas = [
-        ft.DataColumn(ft.Text("ID"), numeric=True), 
-        ft.DataColumn(ft.Text("Data")), 
-        ft.DataColumn(ft.Text("Médico")),
-        ft.DataColumn(ft.Text("Exame")),  
-        ft.DataColumn(ft.Text("Tempo"), numeric=True),
-        ft.DataColumn(ft.Text("ID Paciente"), numeric=True), 
-        ft.DataColumn(ft.Text("Sexo")), 
-        ft.DataColumn(ft.Text("Sala")),
-        ft.DataColumn(ft.Text(fr"DAP (μGym²)"), numeric=True),
-        ft.DataColumn(ft.Text("Dose (mGy)"), numeric=True),
-    ]
-    return ft.DataTable(
-        columns=colunas, 
-        rows=[], 
-        border=ft.Border.all(1, "grey"), 
-        border_radius=ft.BorderRadius.all(10), 
-        vertical_lines=ft.border.BorderSide(1, "grey"), 
-        data_row_max_height=60
-    )
+from core import perfil
 
 def criar_grafico_base(titulo):
     return fch.BarChart(
@@ -97,3 +76,5 @@ def popular_grafico_agrupado(res_dados, grafico, modo_multiplo, cores_base, unit
         teto = max_val * 1.4 if max_val > 0 else 10
         grafico.groups = grupos; grafico.bottom_axis.labels = eixo_x; grafico.max_y = teto
         grafico.left_axis.title.value = f"Valores ({' | '.join(medicos_unicos)})"
+
+perfil.instrumentar(__name__)
@@ -0,0 +1,208 @@
+# ui/tabela_ui.py
+# Só depende do flet: a tabela aparece na primeira tela sem carregar o flet_charts
+# Tabela virtualizada: só existem controles para as linhas visíveis (state.linhas_tabela),
+# criados uma vez e reaproveitados. Ao rolar, a janela de linhas vem do banco em blocos
+# (state.bloco_tabela) e só os valores dos controles mudam; memória e tamanho do update
+# não dependem da quantidade de exames filtrados.
+import threading
+from collections import OrderedDict
+import flet as ft
+from config import state
+from core import database as db
+from core import perfil
+from core.utils import formatar_data, formatar_tempo
+
+# (título, largura em px)
+COLUNAS = [
+    ("ID", 70), ("Data", 100), ("Médico", 170), ("Exame", 180), ("Tempo", 90),
+    ("ID Paciente", 110), ("Sexo", 60), ("Sala", 140), ("DAP (μGym²)", 120), ("Dose (mGy)", 130),
+]
+ALTURA_LINHA = 36
+# Linhas roladas por "clique" da roda do mouse
+LINHAS_POR_ROLAGEM = 3
+BORDA = ft.BorderSide(1, "grey")
+
+def cor_dose(valor_dose):
+    """Cor de alerta da dose (mGy) na tabela, ou None abaixo de 1000 mGy."""
+    if valor_dose >= 5000: return ft.Colors.RED
+    if valor_dose >= 4000: return ft.Colors.ORANGE
+    if valor_dose >= 3000: return ft.Colors.YELLOW
+    if valor_dose >= 2000: return ft.Colors.BLUE
+    if valor_dose >= 1000: return "#8F00FF" # Roxo
+    return None
+
+def _celula(largura, conteudo, ultima=False):
+    return ft.Container(
+        content=conteudo, width=largura, height=ALTURA_LINHA, padding=ft.Padding.symmetric(horizontal=8),
+        alignment=ft.Alignment.CENTER_LEFT, border=None if ultima else ft.Border(right=BORDA),
+    )
+
+def _buscar_bloco(filtros, quantidade, offset, cursor_pagina=None, direcao="proxima"):
+    """Bloco de linhas em ordem de data DESC, rowid DESC: por cursor quando há bloco vizinho, senão por OFFSET."""
+    if cursor_pagina is None:
+        return db.carregar_dados_banco(*filtros, limit=quantidade, offset=offset)
+    return db.carregar_pagina_cursor(*filtros, limit=quantidade, cursor_pagina=cursor_pagina, direcao=direcao)
+
+class TabelaVirtual:
+    """
+    Tabela de exames com janela de linhas reaproveitadas.
+    controle é o que vai na página; recarregar(filtros) troca os filtros e relê a janela atual.
+    ao_abrir(id_exame) é chamado ao clicar no ID.
+    """
+    def __init__(self, ao_abrir, linhas_visiveis=None):
+        self.ao_abrir = ao_abrir
+        self.linhas_visiveis = linhas_visiveis or state.linhas_tabela
+        self.filtros = None
+        self.inicio = 0
+        self.total = 0
+        self._blocos = OrderedDict()  # índice do bloco -> linhas (LRU pequeno, limpo a cada recarregar)
+        self._trava = threading.Lock()
+
+        self._linhas = [self._criar_linha() for _ in range(self.linhas_visiveis)]
+        altura = self.linhas_visiveis * ALTURA_LINHA
+        cabecalho = ft.Row(
+            [_celula(largura, ft.Text(titulo, weight="bold"), i == len(COLUNAS) - 1) for i, (titulo, largura) in enumerate(COLUNAS)],
+            spacing=0,
+        )
+        corpo = ft.GestureDetector(
+            content=ft.Column([linha["controle"] for linha in self._linhas], spacing=0, height=altura),
+            on_scroll=self._rolar_mouse,
+        )
+        self.barra = ft.Slider(min=0, max=1, value=0, width=altura, disabled=True, on_change=self._rolar_barra)
+        self.txt_posicao = ft.Text("Nenhum exame")
+        self.controle = ft.Row([
+            ft.Container(
+                content=ft.Column([cabecalho, ft.Divider(height=1, color="grey"), corpo], spacing=0),
+                border=ft.Border.all(1, "grey"), border_radius=ft.BorderRadius.all(10),
+            ),
+            ft.RotatedBox(quarter_turns=1, content=self.barra),
+        ], vertical_alignment=ft.CrossAxisAlignment.START)
+
+    def _criar_linha(self):
+        """Controles de uma linha; preenchidos por _preencher a cada rolagem."""
+        textos = [ft.Text("", selectable=True, no_wrap=True) for _ in COLUNAS]
+        textos[0] = ft.Text("", weight="bold", color=ft.Colors.PRIMARY, tooltip="Ver eventos de irradiação")
+        icone_dose = ft.Icon(ft.Icons.WARNING_AMBER_ROUNDED, size=16, visible=False)
+        id_celula = _celula(COLUNAS[0][1], textos[0])
+        id_celula.on_click = lambda e: self.ao_abrir(e.control.data) if e.control.data is not None else None
+        celulas = [id_celula]
+        for i, (_, largura) in enumerate(COLUNAS[1:], start=1):
+            conteudo = ft.Row([icone_dose, textos[i]], spacing=5) if i == len(COLUNAS) - 1 else textos[i]
+            celulas.append(_celula(largura, conteudo, i == len(COLUNAS) - 1))
+        controle = ft.Container(ft.Row(celulas, spacing=0), height=ALTURA_LINHA, border=ft.Border(bottom=BORDA), visible=False)
+        return {"controle": controle, "id": id_celula, "textos": textos, "icone_dose": icone_dose}
+
+    def _preencher(self, linha, row):
+        if row is None:
+            linha["controle"].visible = False
+            linha["id"].data = None
+            return
+        try:
+            valor_dose = float(str(row[4]).replace(',', '.'))
+        except (ValueError, TypeError):
+            valor_dose = 0.0
+        cor = cor_dose(valor_dose)
+
+        valores = [
+            str(row[0]),
+            formatar_data(row[1]),
+            str(row[2])[:20] if row[2] else "",
+            str(row[3]) if row[3] else "",
+            str(formatar_tempo(row[5])) if row[5] else "",
+            str(row[7]) if row[7] else "",
+            str(row[8]) if row[8] else "",
+            str(row[9]) if row[9] else "",
+            str(float(row[6])) if row[6] else "",
+            str(row[4]) if row[4] else "",
+        ]
+        for texto, valor in zip(linha["textos"], valores):
+            texto.value = valor
+        texto_dose = linha["textos"][-1]
+        texto_dose.color = cor
+        texto_dose.weight = "bold" if cor else None
+        linha["icone_dose"].visible = cor is not None
+        linha["icone_dose"].color = cor
+        linha["id"].data = row[0]
+        linha["controle"].visible = True
+
+    def _bloco(self, indice):
+        """Linhas do bloco; usa o cursor do bloco vizinho em memória para não pagar o OFFSET."""
+        if indice in self._blocos:
+            self._blocos.move_to_end(indice)
+            return self._blocos[indice]
+        tamanho = state.bloco_tabela
+        anterior, seguinte = self._blocos.get(indice - 1), self._blocos.get(indice + 1)
+        if anterior and len(anterior) == tamanho:
+            dados, self.total = _buscar_bloco(self.filtros, tamanho, 0, (anterior[-1][1], anterior[-1][0]), "proxima")
+        elif seguinte:
+            dados, self.total = _buscar_bloco(self.filtros, tamanho, 0, (seguinte[0][1], seguinte[0][0]), "anterior")
+        else:
+            dados, self.total = _buscar_bloco(self.filtros, tamanho, indice * tamanho)
+        self._blocos[indice] = dados
+        while len(self._blocos) > state.blocos_tabela:
+            self._blocos.popitem(last=False)
+        return dados
+
+    def _janela(self):
+        """Linhas de inicio até inicio + linhas_visiveis (no máximo dois blocos)."""
+        tamanho = state.bloco_tabela
+        fim = self.inicio + self.linhas_visiveis
+        linhas = []
+        for indice in range(self.inicio // tamanho, (fim - 1) // tamanho + 1):
+            linhas.extend(self._bloco(indice))
+        deslocamento = self.inicio - (self.inicio // tamanho) * tamanho
+        return linhas[deslocamento:deslocamento + self.linhas_visiveis]
+
+    def _mostrar(self, atualizar=True):
+        with self._trava:
+            fase = perfil.inicio_fase()
+            if self.filtros is None: return
+            dados = self._janela()
+            # A contagem pode ter mudado (edição ou importação): volta para dentro do resultado
+            ultimo_inicio = max(0, self.total - self.linhas_visiveis)
+            if self.inicio > ultimo_inicio:
+                self.inicio = ultimo_inicio
+                dados = self._janela()
+            perfil.fim_fase("tabela.consulta", fase)
+
+            fase = perfil.inicio_fase()
+            for i, linha in enumerate(self._linhas):
+                self._preencher(linha, dados[i] if i < len(dados) else None)
+            self.barra.max = max(1, ultimo_inicio)
+            self.barra.value = self.inicio
+            self.barra.disabled = ultimo_inicio == 0
+            if self.total:
+                self.txt_posicao.value = f"Linhas {self.inicio + 1}–{self.inicio + len(dados)} de {self.total}"
+            else:
+                self.txt_posicao.value = "Nenhum exame"
+            perfil.fim_fase("tabela.montar_linhas", fase)
+
+            if atualizar:
+                fase = perfil.inicio_fase()
+                self.controle.update()
+                self.txt_posicao.update()
+                perfil.fim_fase("tabela.update", fase)
+
+    def recarregar(self, filtros):
+        """Aplica os filtros e relê a janela atual (blocos em memória descartados)."""
+        self.filtros = list(filtros)
+        self._blocos.clear()
+        self._mostrar()
+
+    def voltar_ao_inicio(self):
+        """Próximo recarregar começa na primeira linha (filtros novos)."""
+        self.inicio = 0
+
+    def ir_para(self, inicio):
+        inicio = max(0, min(int(inicio), self.total - self.linhas_visiveis))
+        if inicio == self.inicio: return
+        self.inicio = inicio
+        self._mostrar()
+
+    def _rolar_mouse(self, e):
+        if not e.scroll_delta or not e.scroll_delta.y: return
+        passo = LINHAS_POR_ROLAGEM if e.scroll_delta.y > 0 else -LINHAS_POR_ROLAGEM
+        self.ir_para(self.inicio + passo)
+
+    def _rolar_barra(self, e):
+        self.ir_para(round(e.control.value))